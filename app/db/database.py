@@ -1,31 +1,60 @@
-"""Database session management."""
+"""Database session management.
 
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+Движок и фабрика сессий создаются при первом обращении, а не при импорте:
+импорт модулей не читает настройки и не трогает БД, старт бота не ждёт пула.
+"""
+
+from typing import AsyncGenerator, Optional
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
 
 from app.config import get_settings
 
 
-settings = get_settings()
+_engine: Optional[AsyncEngine] = None
+_session_maker: Optional[async_sessionmaker[AsyncSession]] = None
+
+
+def get_engine() -> AsyncEngine:
+    """Async engine (created on first use)."""
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            get_settings().database_url,
+            echo=False,  # Set to True for SQL query logging
+            future=True
+        )
+    return _engine
+
 
-# Create async engine
-engine = create_async_engine(
-    settings.database_url,
-    echo=False,  # Set to True for SQL query logging
-    future=True
-)
+def get_session_maker() -> async_sessionmaker[AsyncSession]:
+    """Session factory bound to the lazy engine."""
+    global _session_maker
+    if _session_maker is None:
+        _session_maker = async_sessionmaker(
+            get_engine(),
+            class_=AsyncSession,
+            expire_on_commit=False
+        )
+    return _session_maker
 
-# Create session factory
-async_session_maker = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+
+def async_session_maker() -> AsyncSession:
+    """New session: `async with async_session_maker() as session` (как у sessionmaker)."""
+    return get_session_maker()()
+
+
+async def dispose_engine() -> None:
+    """Close pooled connections (on shutdown)."""
+    global _engine, _session_maker
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_maker = None
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     """Get database session.
-    
+
     Yields:
         AsyncSession: Database session
     """
@@ -3,7 +3,22 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import BigInteger, String, Text, ForeignKey, DateTime, Enum, UniqueConstraint
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 import enum
 
@@ -94,6 +109,21 @@ class Film(Base):
     """Film/series model."""
     
     __tablename__ = "films"
+    __table_args__ = (
+        # Нечёткий поиск по названию (pg_trgm); на SQLite — обычный индекс
+        Index(
+            "ix_films_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_films_title_original_trgm",
+            "title_original",
+            postgresql_using="gin",
+            postgresql_ops={"title_original": "gin_trgm_ops"},
+        ),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     external_id: Mapped[str] = mapped_column(String(50), index=True)
@@ -113,35 +143,77 @@ class Film(Base):
         "GroupFilm",
         back_populates="film"
     )
-    recommendation_rows_as_source: Mapped[list["FilmRecommendationCache"]] = relationship(
-        "FilmRecommendationCache",
-        back_populates="source_film",
+
+
+class RecommendedFilmCard(Base):
+    """Компактная карточка рекомендованного фильма из ответа TMDB recommendations.
+
+    Одна строка на (external_id, media_type) для всех источников — /relative строит
+    карточки из БД без get_details.
+    """
+
+    __tablename__ = "recommended_film_cards"
+
+    external_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    media_type: Mapped[str] = mapped_column(String(10), primary_key=True)
+    title: Mapped[str] = mapped_column(String(500))
+    title_original: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    year: Mapped[Optional[int]] = mapped_column(nullable=True)
+    overview: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Только путь TMDB (/abc.jpg), без базового URL картинок
+    poster_path: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class FilmRecommendationSource(Base):
+    """Состояние кэша рекомендаций по фильму-источнику: когда обновлялся и запрошен ли вне очереди."""
+
+    __tablename__ = "film_recommendation_sources"
+
+    film_id: Mapped[int] = mapped_column(ForeignKey("films.id"), primary_key=True)
+    # None — ещё ни разу не загружали (в т.ч. пустой ответ TMDB тоже фиксирует время)
+    fetched_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, index=True)
+    # Фильм только что добавили/отметили просмотренным — обновить в ближайший тик
+    requested_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # Ошибки TMDB подряд и время, раньше которого источник не повторяем (экспоненциальная пауза)
+    failure_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    retry_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # Рекомендации TMDB в порядке ответа (позиция = индекс): id одним массивом
+    # и битовая маска типов (бит i = 1 — i-я рекомендация сериал, иначе фильм)
+    recommended_ids: Mapped[Optional[list[int]]] = mapped_column(
+        JSON().with_variant(postgresql.ARRAY(Integer), "postgresql"), nullable=True
     )
+    recommended_tv_mask: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
 
 
-class FilmRecommendationCache(Base):
-    """Кэш TMDB recommendations: для каждого film_id (источник) — список рекомендованных id."""
+class FilmDetailsCache(Base):
+    """Кэш карточек TMDB (get_details) с временем загрузки — для TTL и stale-while-revalidate."""
 
-    __tablename__ = "film_recommendation_cache"
+    __tablename__ = "film_details_cache"
     __table_args__ = (
         UniqueConstraint(
-            "source_film_id",
-            "recommended_external_id",
-            "recommended_media_type",
-            name="uq_film_recommendation_source_rec",
+            "source",
+            "external_id",
+            "media_type",
+            "language",
+            name="uq_film_details_cache_key",
         ),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    source_film_id: Mapped[int] = mapped_column(ForeignKey("films.id"), index=True)
-    recommended_external_id: Mapped[str] = mapped_column(String(50))
-    recommended_media_type: Mapped[str] = mapped_column(String(10))
-    # Порядок в ответе TMDB (0 = самый релевантный) — для взвешивания при агрегации
-    position: Mapped[int] = mapped_column(default=0)
+    source: Mapped[str] = mapped_column(String(50))
+    external_id: Mapped[str] = mapped_column(String(50))
+    media_type: Mapped[str] = mapped_column(String(10))
+    language: Mapped[str] = mapped_column(String(10))
+    title: Mapped[str] = mapped_column(String(500))
+    title_original: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    year: Mapped[Optional[int]] = mapped_column(nullable=True)
+    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    poster_url: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    duration: Mapped[Optional[str]] = mapped_column(String(10), nullable=True)
+    director: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     fetched_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
-    source_film: Mapped["Film"] = relationship("Film", back_populates="recommendation_rows_as_source")
-
 
 class GroupFilm(Base):
     """Association between group and film."""
@@ -182,3 +254,73 @@ class Watched(Base):
     # Relationships
     group_film: Mapped["GroupFilm"] = relationship("GroupFilm", back_populates="watched")
     marked_by_user: Mapped["User"] = relationship("User")
+
+
+class TmdbCatalogEntry(Base):
+    """Локальный каталог из ежедневных выгрузок TMDB (movie_ids / tv_series_ids).
+
+    Только id, оригинальное название и популярность — для поиска id без запроса к API.
+    """
+
+    __tablename__ = "tmdb_catalog"
+    __table_args__ = (
+        # Нечёткий и префиксный поиск (LIKE 'abc%') по оригинальному названию
+        Index(
+            "ix_tmdb_catalog_original_title_trgm",
+            "original_title",
+            postgresql_using="gin",
+            postgresql_ops={"original_title": "gin_trgm_ops"},
+        ),
+    )
+
+    tmdb_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    media_type: Mapped[str] = mapped_column(String(10), primary_key=True)
+    original_title: Mapped[str] = mapped_column(String(500))
+    popularity: Mapped[float] = mapped_column(Float, default=0.0)
+    adult: Mapped[bool] = mapped_column(Boolean, default=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class TorrentSearchCache(Base):
+    """Результаты поиска раздач Prowlarr (список TorrentResult) по нормализованному запросу."""
+
+    __tablename__ = "torrent_search_cache"
+
+    query: Mapped[str] = mapped_column(String(500), primary_key=True)
+    results: Mapped[list] = mapped_column(JSON)
+    fetched_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class TorrentListMessage(Base):
+    """Список раздач, показанный в сообщении: кнопки «#N» ссылаются на позиции в нём."""
+
+    __tablename__ = "torrent_list_messages"
+    __table_args__ = (Index("ix_torrent_list_messages_created_at", "created_at"),)
+
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    message_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    results: Mapped[list] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class TorrentFile(Base):
+    """.torrent по info-hash: file_id Telegram после первой отправки (байты — на диске)."""
+
+    __tablename__ = "torrent_files"
+
+    info_hash: Mapped[str] = mapped_column(String(40), primary_key=True)
+    size_bytes: Mapped[int] = mapped_column(Integer)
+    telegram_file_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class TorrentFileUrl(Base):
+    """Ссылка скачивания Prowlarr (SHA-1 от URL, в нём apikey) → info-hash её .torrent."""
+
+    __tablename__ = "torrent_file_urls"
+
+    url_hash: Mapped[str] = mapped_column(String(40), primary_key=True)
+    info_hash: Mapped[str] = mapped_column(
+        ForeignKey("torrent_files.info_hash", ondelete="CASCADE"), index=True
+    )
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
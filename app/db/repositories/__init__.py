@@ -7,6 +7,11 @@ from app.db.repositories.film import FilmRepository
 from app.db.repositories.group_film import GroupFilmRepository
 from app.db.repositories.watched import WatchedRepository
 from app.db.repositories.recommendation_cache import FilmRecommendationCacheRepository
+from app.db.repositories.details_cache import FilmDetailsCacheRepository
+from app.db.repositories.tmdb_catalog import TmdbCatalogRepository
+from app.db.repositories.torrent_search_cache import TorrentSearchCacheRepository
+from app.db.repositories.torrent_list import TorrentListRepository
+from app.db.repositories.torrent_file import TorrentFileRepository
 
 __all__ = [
     "UserRepository",
@@ -16,4 +21,9 @@ __all__ = [
     "GroupFilmRepository",
     "WatchedRepository",
     "FilmRecommendationCacheRepository",
+    "FilmDetailsCacheRepository",
+    "TmdbCatalogRepository",
+    "TorrentSearchCacheRepository",
+    "TorrentListRepository",
+    "TorrentFileRepository",
 ]
@@ -0,0 +1,77 @@
+"""Кэш карточек TMDB (get_details) по ключу (source, external_id, media_type, language)."""
+
+from datetime import datetime
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import FilmDetailsCache
+from app.services.dto import FilmSearchResult
+
+_CARD_FIELDS = (
+    "title",
+    "title_original",
+    "year",
+    "description",
+    "poster_url",
+    "duration",
+    "director",
+)
+
+
+class FilmDetailsCacheRepository:
+    """CRUD по film_details_cache без commit (вызывающий фиксирует транзакцию)."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+
+    async def get(
+        self,
+        source: str,
+        external_id: str,
+        media_type: str,
+        language: str,
+    ) -> FilmDetailsCache | None:
+        result = await self._session.execute(
+            select(FilmDetailsCache).where(
+                and_(
+                    FilmDetailsCache.source == source,
+                    FilmDetailsCache.external_id == external_id,
+                    FilmDetailsCache.media_type == media_type,
+                    FilmDetailsCache.language == language,
+                )
+            )
+        )
+        return result.scalar_one_or_none()
+
+    async def upsert(
+        self,
+        details: FilmSearchResult,
+        language: str,
+        fetched_at: datetime | None = None,
+    ) -> FilmDetailsCache:
+        """Записать карточку (новая строка или обновление существующей)."""
+        ts = fetched_at or datetime.utcnow()
+        row = await self.get(details.source, details.external_id, details.media_type, language)
+        if row is None:
+            row = FilmDetailsCache(
+                source=details.source,
+                external_id=details.external_id,
+                media_type=details.media_type,
+                language=language,
+            )
+            self._session.add(row)
+        for field in _CARD_FIELDS:
+            setattr(row, field, getattr(details, field))
+        row.fetched_at = ts
+        await self._session.flush()
+        return row
+
+    @staticmethod
+    def to_result(row: FilmDetailsCache) -> FilmSearchResult:
+        return FilmSearchResult(
+            external_id=row.external_id,
+            source=row.source,
+            media_type=row.media_type,
+            **{field: getattr(row, field) for field in _CARD_FIELDS},
+        )
@@ -2,11 +2,12 @@
 
 from typing import Optional, TYPE_CHECKING
 
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import Film
 from app.db.repositories.base import BaseRepository
+from app.utils.trigram import similarity, trigrams
 
 if TYPE_CHECKING:
     from app.schemas import FilmCreate as FilmCreateSchema
@@ -41,6 +42,55 @@ class FilmRepository(BaseRepository[Film]):
         )
         return result.scalar_one_or_none()
 
+    async def search_by_title(
+        self,
+        query: str,
+        source: str = "tmdb",
+        limit: int = 5,
+        min_score: float = 0.3,
+    ) -> list[tuple[Film, float]]:
+        """Нечёткий поиск по title/title_original: (фильм, сходство 0..1) по убыванию.
+
+        На Postgres — pg_trgm (GIN-индексы ix_films_title_trgm / ix_films_title_original_trgm),
+        на прочих СУБД — то же сходство, посчитанное в процессе.
+        """
+        dialect = self.session.bind.dialect.name if self.session.bind else ""
+        if dialect == "postgresql":
+            score = func.greatest(
+                func.similarity(Film.title, query),
+                func.similarity(func.coalesce(Film.title_original, ""), query),
+            ).label("score")
+            result = await self.session.execute(
+                select(Film, score)
+                .where(Film.source == source)
+                .where(or_(Film.title.op("%")(query), Film.title_original.op("%")(query)))
+                .order_by(score.desc(), Film.id)
+                .limit(limit)
+            )
+            return [(film, float(s)) for film, s in result.all() if s >= min_score]
+
+        query_trgm = trigrams(query)
+        rows = await self.session.execute(
+            select(Film.id, Film.title, Film.title_original).where(Film.source == source)
+        )
+        scored: list[tuple[float, int]] = []
+        for film_id, title, title_original in rows.all():
+            s = max(
+                similarity(query_trgm, trigrams(title)),
+                similarity(query_trgm, trigrams(title_original or "")),
+            )
+            if s >= min_score:
+                scored.append((s, film_id))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        scored = scored[:limit]
+        if not scored:
+            return []
+        films = await self.session.execute(
+            select(Film).where(Film.id.in_([film_id for _, film_id in scored]))
+        )
+        by_id = {film.id: film for film in films.scalars().all()}
+        return [(by_id[film_id], s) for s, film_id in scored if film_id in by_id]
+
     async def find_by_external(
         self,
         session: AsyncSession,
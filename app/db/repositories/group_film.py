@@ -154,6 +154,15 @@ class GroupFilmRepository(BaseRepository[GroupFilm]):
         result = await self.session.execute(select(GroupFilm.film_id).distinct())
         return [int(x[0]) for x in result.all()]
 
+    async def distinct_films_in_use(self) -> list[Film]:
+        """Фильмы, которые есть хотя бы в одной группе, одним запросом (фон кэша рекомендаций)."""
+        result = await self.session.execute(
+            select(Film)
+            .where(Film.id.in_(select(GroupFilm.film_id).distinct()))
+            .order_by(Film.id)
+        )
+        return list(result.scalars().all())
+
     async def list_group_external_keys(self, group_id: int) -> set[tuple[str, str]]:
         """Пары (external_id, media_type) фильмов уже в списке группы."""
         result = await self.session.execute(
@@ -1,55 +1,231 @@
-"""Кэш рекомендаций TMDB по film_id источника."""
+"""Кэш рекомендаций TMDB по film_id источника.
 
-from datetime import datetime
+Список рекомендаций источника хранится одной строкой film_recommendation_sources:
+массив TMDB id (позиция = индекс) и битовая маска типов (movie/tv).
+"""
 
-from sqlalchemy import delete, select
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import FilmRecommendationCache
+from app.db.models import (
+    Film,
+    FilmRecommendationSource,
+    GroupFilm,
+    RecommendedFilmCard,
+)
+from app.services.dto import FilmSearchResult
+from app.utils.tmdb_images import poster_url, tmdb_poster_path
+
+# Карточка в /relative показывает ~300 символов описания — больше не храним
+CARD_OVERVIEW_MAX_LEN = 400
+
+
+def encode_media_types(media_types: list[str]) -> bytes:
+    """Битовая маска: бит i (младший бит байта i // 8) = 1, если i-я рекомендация — сериал."""
+    mask = bytearray((len(media_types) + 7) // 8)
+    for i, media_type in enumerate(media_types):
+        if media_type == "tv":
+            mask[i // 8] |= 1 << (i % 8)
+    return bytes(mask)
+
+
+def decode_media_types(mask: bytes | None, count: int) -> list[str]:
+    mask = mask or b""
+    return [
+        "tv" if i // 8 < len(mask) and mask[i // 8] >> (i % 8) & 1 else "movie"
+        for i in range(count)
+    ]
 
 
 class FilmRecommendationCacheRepository:
-    """CRUD по film_recommendation_cache без commit (вызывающий фиксирует транзакцию)."""
+    """CRUD по film_recommendation_sources и recommended_film_cards без commit (вызывающий фиксирует транзакцию)."""
 
     def __init__(self, session: AsyncSession) -> None:
         self._session = session
 
-    async def delete_for_source(self, source_film_id: int) -> None:
-        await self._session.execute(
-            delete(FilmRecommendationCache).where(
-                FilmRecommendationCache.source_film_id == source_film_id
-            )
-        )
-
     async def replace_for_source(
         self,
         source_film_id: int,
-        recommendations: list[tuple[str, str]],
+        recommendations: list[FilmSearchResult],
         fetched_at: datetime | None = None,
     ) -> None:
-        """Удалить старые строки источника и вставить новый набор (ext_id, media_type)."""
+        """Записать новый список рекомендаций источника и обновить карточки кандидатов."""
         ts = fetched_at or datetime.utcnow()
-        await self.delete_for_source(source_film_id)
-        for position, (ext_id, media_type) in enumerate(recommendations):
-            self._session.add(
-                FilmRecommendationCache(
-                    source_film_id=source_film_id,
-                    recommended_external_id=ext_id,
-                    recommended_media_type=media_type,
-                    position=position,
-                    fetched_at=ts,
-                )
-            )
+        await self._upsert_cards(recommendations, ts)
+        await self._upsert_source_state(
+            source_film_id,
+            {
+                "fetched_at": ts,
+                "requested_at": None,
+                "failure_count": 0,
+                "retry_at": None,
+                "recommended_ids": [int(rec.external_id) for rec in recommendations],
+                "recommended_tv_mask": encode_media_types(
+                    [rec.media_type for rec in recommendations]
+                ),
+            },
+        )
         await self._session.flush()
 
-    async def list_for_source_film_ids(
+    async def lists_for_source_film_ids(
         self, source_film_ids: list[int]
-    ) -> list[FilmRecommendationCache]:
+    ) -> dict[int, list[tuple[str, str]]]:
+        """
+        {film_id источника: [(external_id, media_type), ...] в порядке TMDB} — только
+        колонки, без ORM-объектов на каждую рекомендацию.
+        """
         if not source_film_ids:
-            return []
+            return {}
+        state = FilmRecommendationSource
+        result = await self._session.execute(
+            select(state.film_id, state.recommended_ids, state.recommended_tv_mask)
+            .where(state.film_id.in_(source_film_ids))
+            .where(state.recommended_ids.is_not(None))
+        )
+        lists: dict[int, list[tuple[str, str]]] = {}
+        for film_id, ids, mask in result.all():
+            types = decode_media_types(mask, len(ids))
+            lists[film_id] = [(str(ext_id), mt) for ext_id, mt in zip(ids, types, strict=True)]
+        return lists
+
+    async def cards_for(
+        self, keys: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], FilmSearchResult]:
+        """Карточки кандидатов по (external_id, media_type) одним запросом."""
+        if not keys:
+            return {}
+        card = RecommendedFilmCard
         result = await self._session.execute(
-            select(FilmRecommendationCache).where(
-                FilmRecommendationCache.source_film_id.in_(source_film_ids)
+            select(card).where(tuple_(card.external_id, card.media_type).in_(keys))
+        )
+        return {
+            (c.external_id, c.media_type): self._card_to_result(c)
+            for c in result.scalars().all()
+        }
+
+    async def request_refresh(self, source_film_id: int, requested_at: datetime | None = None) -> None:
+        """Поставить источник в начало очереди фонового обновления."""
+        await self._upsert_source_state(
+            source_film_id, {"requested_at": requested_at or datetime.utcnow()}
+        )
+
+    async def record_failure(
+        self,
+        source_film_id: int,
+        *,
+        backoff: timedelta,
+        max_backoff: timedelta,
+        max_failures: int,
+        failed_at: datetime | None = None,
+    ) -> FilmRecommendationSource:
+        """Ошибка TMDB по источнику: пауза backoff·2^(n-1) (не больше max_backoff) до повтора.
+
+        После max_failures ошибок подряд внеочередной запрос снимается — источник
+        дальше ждёт как обычный, без приоритета.
+        """
+        ts = failed_at or datetime.utcnow()
+        state = await self._session.get(FilmRecommendationSource, source_film_id)
+        if state is None:
+            state = FilmRecommendationSource(film_id=source_film_id, failure_count=0)
+            self._session.add(state)
+        state.failure_count = (state.failure_count or 0) + 1
+        state.retry_at = ts + min(max_backoff, backoff * 2 ** (state.failure_count - 1))
+        if state.failure_count >= max_failures:
+            state.requested_at = None
+        await self._session.flush()
+        return state
+
+    async def due_source_films(
+        self, stale_before: datetime, limit: int, now: datetime | None = None
+    ) -> list[Film]:
+        """
+        Фильмы из group_films, чей кэш пора обновить: запрошенные вне очереди,
+        ни разу не загруженные, затем самые старые (fetched_at < stale_before).
+        Источники на паузе после ошибки (retry_at > now) пропускаются, а после неё
+        идут после тех, что ещё не падали, — вечно падающие не занимают лимит тика.
+        """
+        in_use = select(GroupFilm.film_id).distinct()
+        state = FilmRecommendationSource
+        result = await self._session.execute(
+            select(Film)
+            .outerjoin(state, state.film_id == Film.id)
+            .where(Film.id.in_(in_use))
+            .where(Film.source == "tmdb")
+            .where(
+                or_(
+                    state.requested_at.is_not(None),
+                    state.fetched_at.is_(None),
+                    state.fetched_at < stale_before,
+                )
+            )
+            .where(or_(state.retry_at.is_(None), state.retry_at <= (now or datetime.utcnow())))
+            .order_by(
+                func.coalesce(state.failure_count, 0).asc(),
+                state.requested_at.is_(None),
+                state.requested_at.asc(),
+                state.fetched_at.asc().nulls_first(),
+                Film.id,
             )
+            .limit(limit)
         )
         return list(result.scalars().all())
+
+    async def _upsert_cards(self, recommendations: list[FilmSearchResult], ts: datetime) -> None:
+        if not recommendations:
+            return
+        by_key = {(r.external_id, r.media_type): self._compact_card(r, ts) for r in recommendations}
+        stmt = self._insert(RecommendedFilmCard).values(list(by_key.values()))
+        await self._session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["external_id", "media_type"],
+                set_={
+                    col: stmt.excluded[col]
+                    for col in ("title", "title_original", "year", "overview", "poster_path", "updated_at")
+                },
+            )
+        )
+
+    @staticmethod
+    def _compact_card(rec: FilmSearchResult, ts: datetime) -> dict[str, Any]:
+        overview = rec.description
+        if overview and len(overview) > CARD_OVERVIEW_MAX_LEN:
+            overview = overview[:CARD_OVERVIEW_MAX_LEN]
+        return {
+            "external_id": rec.external_id,
+            "media_type": rec.media_type,
+            "title": rec.title,
+            "title_original": rec.title_original,
+            "year": rec.year,
+            "overview": overview or None,
+            # Храним только путь TMDB: чужой URL не влезет в String(100) и сорвёт пачку
+            "poster_path": tmdb_poster_path(rec.poster_url),
+            "updated_at": ts,
+        }
+
+    @staticmethod
+    def _card_to_result(card: RecommendedFilmCard) -> FilmSearchResult:
+        return FilmSearchResult(
+            external_id=card.external_id,
+            source="tmdb",
+            title=card.title,
+            title_original=card.title_original,
+            year=card.year,
+            description=card.overview,
+            poster_url=poster_url(card.poster_path),
+            media_type=card.media_type,
+        )
+
+    def _insert(self, table: Any) -> Any:
+        dialect = self._session.bind.dialect.name if self._session.bind else ""
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        return insert(table)
+
+    async def _upsert_source_state(self, source_film_id: int, values: dict[str, Any]) -> None:
+        stmt = self._insert(FilmRecommendationSource).values(film_id=source_film_id, **values)
+        await self._session.execute(
+            stmt.on_conflict_do_update(index_elements=["film_id"], set_=values)
+        )
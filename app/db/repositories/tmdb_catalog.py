@@ -0,0 +1,71 @@
+"""Локальный каталог TMDB из ежедневных выгрузок id."""
+
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import TmdbCatalogEntry
+
+# Предел bind-параметров в одном запросе у Postgres/asyncpg
+_MAX_BIND_PARAMS = 32767
+
+
+class TmdbCatalogRepository:
+    """Пакетный upsert и поиск по tmdb_catalog без commit (вызывающий фиксирует транзакцию)."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+
+    async def upsert_many(self, rows: list[dict[str, Any]]) -> None:
+        """
+        Вставить/обновить строки (ключ — tmdb_id + media_type). Многострочный
+        INSERT режется на куски, чтобы не превысить предел bind-параметров Postgres.
+        """
+        if not rows:
+            return
+        dialect = self._session.bind.dialect.name if self._session.bind else ""
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        chunk_size = max(1, _MAX_BIND_PARAMS // len(rows[0]))
+        for start in range(0, len(rows), chunk_size):
+            stmt = insert(TmdbCatalogEntry).values(rows[start : start + chunk_size])
+            await self._session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["tmdb_id", "media_type"],
+                    set_={
+                        col: stmt.excluded[col]
+                        for col in ("original_title", "popularity", "adult", "updated_at")
+                    },
+                )
+            )
+
+    async def search(
+        self,
+        query: str,
+        media_type: str | None = None,
+        limit: int = 10,
+    ) -> list[TmdbCatalogEntry]:
+        """
+        Кандидаты по оригинальному названию: на Postgres — pg_trgm (`%`), иначе —
+        префикс без учёта регистра. Сортировка по сходству, затем по популярности.
+        """
+        stmt = select(TmdbCatalogEntry)
+        if media_type is not None:
+            stmt = stmt.where(TmdbCatalogEntry.media_type == media_type)
+        dialect = self._session.bind.dialect.name if self._session.bind else ""
+        if dialect == "postgresql":
+            stmt = stmt.where(TmdbCatalogEntry.original_title.op("%")(query)).order_by(
+                func.similarity(TmdbCatalogEntry.original_title, query).desc(),
+                TmdbCatalogEntry.popularity.desc(),
+            )
+        else:
+            stmt = stmt.where(
+                func.lower(TmdbCatalogEntry.original_title).like(f"{query.lower()}%")
+            ).order_by(TmdbCatalogEntry.popularity.desc())
+        result = await self._session.execute(stmt.limit(limit))
+        return list(result.scalars().all())
+
+    async def count(self) -> int:
+        result = await self._session.execute(select(func.count()).select_from(TmdbCatalogEntry))
+        return int(result.scalar_one())
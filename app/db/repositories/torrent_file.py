@@ -0,0 +1,53 @@
+"""Кэш .torrent: info-hash → file_id Telegram и ссылка скачивания → info-hash."""
+
+import hashlib
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import TorrentFile, TorrentFileUrl
+
+
+def download_url_hash(download_url: str) -> str:
+    """Ключ ссылки скачивания: сам URL содержит apikey Prowlarr и бывает длинным."""
+    return hashlib.sha1(download_url.encode("utf-8")).hexdigest()
+
+
+class TorrentFileRepository:
+    """CRUD по torrent_files / torrent_file_urls без commit (вызывающий фиксирует транзакцию)."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+
+    async def get(self, info_hash: str) -> TorrentFile | None:
+        return await self._session.get(TorrentFile, info_hash)
+
+    async def get_by_url(self, download_url: str) -> TorrentFile | None:
+        result = await self._session.execute(
+            select(TorrentFile)
+            .join(TorrentFileUrl, TorrentFileUrl.info_hash == TorrentFile.info_hash)
+            .where(TorrentFileUrl.url_hash == download_url_hash(download_url))
+        )
+        return result.scalar_one_or_none()
+
+    async def upsert(self, info_hash: str, size_bytes: int, download_url: str) -> TorrentFile:
+        """Запись файла (file_id, если уже был, сохраняется) и привязка к ссылке."""
+        row = await self.get(info_hash)
+        if row is None:
+            row = TorrentFile(info_hash=info_hash, size_bytes=size_bytes)
+            self._session.add(row)
+        row.size_bytes = size_bytes
+        url_hash = download_url_hash(download_url)
+        link = await self._session.get(TorrentFileUrl, url_hash)
+        if link is None:
+            self._session.add(TorrentFileUrl(url_hash=url_hash, info_hash=info_hash))
+        else:
+            link.info_hash = info_hash
+        await self._session.flush()
+        return row
+
+    async def set_file_id(self, info_hash: str, file_id: str | None) -> None:
+        row = await self.get(info_hash)
+        if row is not None:
+            row.telegram_file_id = file_id
+            await self._session.flush()
@@ -0,0 +1,45 @@
+"""Списки раздач по сообщениям (chat_id, message_id) — переживают перезапуск бота."""
+
+from datetime import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import TorrentListMessage
+from app.services.dto import TorrentResult
+
+
+class TorrentListRepository:
+    """CRUD по torrent_list_messages без commit (вызывающий фиксирует транзакцию)."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+
+    async def get(self, chat_id: int, message_id: int) -> TorrentListMessage | None:
+        return await self._session.get(TorrentListMessage, (chat_id, message_id))
+
+    async def upsert(
+        self,
+        chat_id: int,
+        message_id: int,
+        torrents: list[TorrentResult],
+        created_at: datetime | None = None,
+    ) -> TorrentListMessage:
+        row = await self.get(chat_id, message_id)
+        if row is None:
+            row = TorrentListMessage(chat_id=chat_id, message_id=message_id)
+            self._session.add(row)
+        row.results = [torrent.model_dump() for torrent in torrents]
+        row.created_at = created_at or datetime.utcnow()
+        await self._session.flush()
+        return row
+
+    async def delete_older_than(self, before: datetime) -> int:
+        result = await self._session.execute(
+            delete(TorrentListMessage).where(TorrentListMessage.created_at < before)
+        )
+        return result.rowcount or 0
+
+    @staticmethod
+    def to_results(row: TorrentListMessage) -> list[TorrentResult]:
+        return [TorrentResult.model_validate(item) for item in row.results or []]
@@ -0,0 +1,38 @@
+"""Кэш поиска раздач Prowlarr по нормализованному запросу."""
+
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import TorrentSearchCache
+from app.services.dto import TorrentResult
+
+
+class TorrentSearchCacheRepository:
+    """CRUD по torrent_search_cache без commit (вызывающий фиксирует транзакцию)."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self._session = session
+
+    async def get(self, query: str) -> TorrentSearchCache | None:
+        return await self._session.get(TorrentSearchCache, query)
+
+    async def upsert(
+        self,
+        query: str,
+        torrents: list[TorrentResult],
+        fetched_at: datetime | None = None,
+    ) -> TorrentSearchCache:
+        """Записать список раздач (новая строка или замена существующей)."""
+        row = await self.get(query)
+        if row is None:
+            row = TorrentSearchCache(query=query)
+            self._session.add(row)
+        row.results = [torrent.model_dump() for torrent in torrents]
+        row.fetched_at = fetched_at or datetime.utcnow()
+        await self._session.flush()
+        return row
+
+    @staticmethod
+    def to_results(row: TorrentSearchCache) -> list[TorrentResult]:
+        return [TorrentResult.model_validate(item) for item in row.results or []]
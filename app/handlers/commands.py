@@ -6,12 +6,13 @@ from aiogram.filters import Command
 from aiogram.types import CallbackQuery, Message, User as TgUser
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import get_settings
 from app.services.user_group import UserGroupService
 from app.services.recommendation_service import (
     RecommendationService,
     RelativeOutcomeKind,
 )
-from app.services.tmdb import TMDBFilmSearch
+from app.services.providers import get_film_search
 from app.handlers.film_cards import send_film_search_result_cards
 from app.keyboards.inline import build_main_menu_keyboard
 
@@ -43,7 +44,13 @@ async def run_relative_suggestions(
         )
         return
 
-    rec = RecommendationService(session, TMDBFilmSearch())
+    settings = get_settings()
+    rec = RecommendationService(
+        session,
+        get_film_search(),
+        hydration_concurrency=settings.relative_hydration_concurrency,
+        hydration_timeout_sec=settings.relative_hydration_timeout_sec,
+    )
     outcome = await rec.build_relative_suggestions(membership.group.id)
 
     if outcome.kind == RelativeOutcomeKind.NO_WATCHED:
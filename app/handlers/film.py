@@ -1,24 +1,47 @@
 """Film search and confirmation handlers."""
 
 import logging
+import time
+from datetime import timedelta
+from typing import Optional
 from aiogram import Router, F, Bot
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message, CallbackQuery, InputMediaPhoto, BufferedInputFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.user_group import UserGroupService
-from app.services.film import FilmService
+from app.services.film import FilmService, enrich_film_details
 from app.services.group_film import GroupFilmService
 from app.services.notification import NotificationService
-from app.services.tmdb import TMDBFilmSearch
+from app.services.torrent_cache import schedule_torrent_prefetch, wait_for_torrent_prefetch
+from app.services.recommendation_refresh import (
+    schedule_recommendation_prime,
+    store_recommendations,
+)
+from app.services.providers import (
+    get_film_search,
+    get_prowlarr_service,
+    get_torrent_file_cache,
+    get_torrent_list_store,
+    get_torrent_search_cache,
+)
+from app.services.dto import FilmSearchResult, TorrentResult
 from app.services.prowlarr import ProwlarrService
-from app.services.dto import FilmCreate
 from app.handlers.film_cards import send_film_search_result_cards
 from app.keyboards.inline import (
+    CALLBACK_DATA_MAX_BYTES,
     build_film_confirm_keyboard,
+    build_search_more_keyboard,
+    build_download_search_data,
     build_torrent_list_keyboard,
-    get_download_search_from_cache,
+    parse_download_search_data,
 )
 from app.config import get_settings
+from app.db.database import async_session_maker
+from app.db.repositories import FilmRepository
+from app.utils.background import background_tasks
+from app.utils.bencode import BencodeError
+from app.utils.callback_payload import FilmRef
 
 
 logger = logging.getLogger(__name__)
@@ -53,13 +76,44 @@ async def search_film(message: Message, session: AsyncSession):
         )
         return
     
-    # Search films
-    search_provider = TMDBFilmSearch()
-    film_service = FilmService(session, search_provider)
-    
+    # Сначала — фильмы, уже известные боту; TMDB только если локально не уверены
+    settings = get_settings()
+    film_service = FilmService(session, get_film_search())
+    local_results, best_score = await film_service.search_local(
+        query, min_score=settings.local_search_min_score
+    )
+    if local_results and best_score >= settings.local_search_confident_score:
+        await send_film_search_result_cards(
+            message,
+            local_results,
+            intro_line=f"📚 Найдено в библиотеке: {len(local_results)}\n",
+            intro_reply_markup=build_search_more_keyboard(),
+        )
+        return
+
+    await _send_tmdb_search_results(message, film_service, query, local_results)
+
+
+async def _send_tmdb_search_results(
+    message: Message,
+    film_service: FilmService,
+    query: str,
+    local_fallback: list[FilmSearchResult] | None = None,
+) -> None:
+    """Поиск в TMDB и карточки результатов; если TMDB недоступен — локальные совпадения."""
     results = await film_service.search_films(query, language="ru")
     
     # Check for API error
+    if results is None and local_fallback:
+        await send_film_search_result_cards(
+            message,
+            local_fallback,
+            intro_line=(
+                "⚠️ TMDB сейчас недоступен, показаны совпадения из библиотеки: "
+                f"{len(local_fallback)}\n"
+            ),
+        )
+        return
     if results is None:
         await message.answer(
             "❌ Не удалось выполнить поиск. Возможно, проблемы с подключением к базе данных фильмов.\n"
@@ -82,6 +136,25 @@ async def search_film(message: Message, session: AsyncSession):
     )
 
 
+@router.callback_query(F.data == "search_tmdb")
+async def callback_search_tmdb(callback: CallbackQuery, session: AsyncSession):
+    """Искать в TMDB запрос, по которому показаны локальные результаты.
+
+    Args:
+        callback: Callback query
+        session: Database session
+    """
+    original = callback.message.reply_to_message if callback.message else None
+    if not original or not original.text:
+        await callback.answer("❌ Не удалось определить запрос", show_alert=True)
+        return
+
+    await callback.answer()
+    await callback.message.edit_reply_markup(reply_markup=None)
+    film_service = FilmService(session, get_film_search())
+    await _send_tmdb_search_results(callback.message, film_service, original.text.strip())
+
+
 @router.callback_query(F.data.startswith("confirm_film:"))
 async def confirm_film(callback: CallbackQuery, session: AsyncSession, bot: Bot):
     """Handle film confirmation.
@@ -118,46 +191,53 @@ async def confirm_film(callback: CallbackQuery, session: AsyncSession, bot: Bot)
     
     group = membership.group
     
-    # Get film details
-    search_provider = TMDBFilmSearch()
+    # Local-first: известный фильм берём из БД без запроса к TMDB
+    search_provider = get_film_search()
     film_service = FilmService(session, search_provider)
-    
-    film_details = await film_service.get_film_details(external_id, media_type)
-    if not film_details:
+
+    resolved = await film_service.resolve_film_data(external_id, media_type)
+    if not resolved:
         await callback.answer("❌ Не удалось загрузить данные фильма", show_alert=True)
         return
-    
-    logger.info(
-        "Film details from TMDB: duration=%r director=%r",
-        getattr(film_details, "duration", None),
-        getattr(film_details, "director", None),
-    )
-    
-    # Add film to group
+
     group_film_service = GroupFilmService(session, film_service)
-    
-    film_data = FilmCreate(
-        external_id=film_details.external_id,
-        source=film_details.source,
-        title=film_details.title,
-        title_original=film_details.title_original,
-        year=film_details.year,
-        description=film_details.description,
-        poster_url=film_details.poster_url,
-        duration=film_details.duration,
-        director=film_details.director,
-        media_type=film_details.media_type,
-    )
-    
+
     try:
         group_film = await group_film_service.add_film_to_group(
             group_id=group.id,
-            film_data=film_data,
+            film_data=resolved.film,
             added_by_user_id=db_user.id
         )
         
         await callback.message.edit_reply_markup(reply_markup=None)
         await callback.answer("✅ Фильм добавлен в список группы!")
+
+        # Рекомендации пришли одним запросом с деталями — кладём в кэш сразу;
+        # неполной карточке догружаем детали и рекомендации одним фоновым запросом
+        settings = get_settings()
+        film_id = group_film.film_id
+        if resolved.recommendations is not None:
+            await store_recommendations(
+                session,
+                film_id,
+                resolved.recommendations,
+                max_per_source=settings.recommendation_max_per_source,
+            )
+        elif resolved.needs_enrichment:
+            background_tasks.spawn(
+                enrich_film_details(
+                    async_session_maker,
+                    search_provider,
+                    film_id,
+                    pages=settings.recommendation_pages,
+                    max_per_source=settings.recommendation_max_per_source,
+                ),
+                key=("film_enrich", film_id),
+                name=f"film-enrich-{film_id}",
+            )
+        else:
+            schedule_recommendation_prime(film_id)
+        schedule_torrent_prefetch(group.id, resolved.film.title, resolved.film.year)
         
         # Notify group members
         members = await user_service.get_group_members(group.id)
@@ -181,32 +261,54 @@ async def confirm_film(callback: CallbackQuery, session: AsyncSession, bot: Bot)
         await callback.answer("❌ Ошибка при добавлении фильма", show_alert=True)
 
 
-# Storage for torrent search results (temporary, per callback)
-# Format: {message_id: [TorrentResult, ...]}
-_torrent_cache: dict[int, list] = {}
-
-
-@router.callback_query(F.data.startswith("download_search:"))
+@router.callback_query(
+    F.data.startswith("download_search:") | F.data.startswith("download_refresh:")
+)
 async def callback_download_search(callback: CallbackQuery, session: AsyncSession):
-    """Search for torrents via Prowlarr.
+    """Search for torrents via Prowlarr (recent results are served from the DB cache).
     
     Args:
         callback: Callback query
         session: Database session
     """
-    # Parse callback data: download_search:id (cached) or download_search:title:year (legacy)
-    cached = get_download_search_from_cache(callback.data)
-    if cached:
-        title, year = cached
+    # download_refresh:<payload> — та же кнопка «Скачать», но мимо кэша результатов
+    force_refresh = callback.data.startswith("download_refresh:")
+    refresh_data = None
+
+    # Parse callback data: download_search:<payload> (TMDB id) or download_search:title:year (legacy)
+    ref = parse_download_search_data(callback.data)
+    if ref:
+        resolved = await _resolve_download_title(session, ref)
+        if not resolved:
+            await callback.answer("❌ Не удалось загрузить данные фильма", show_alert=True)
+            return
+        title, year = resolved
+        refresh_data = build_download_search_data(
+            ref.external_id, ref.media_type, ref.year, title, refresh=True
+        )
     else:
         parts = callback.data.split(":", 2)
         if len(parts) != 3:
-            await callback.answer("❌ Ошибка данных", show_alert=True)
+            # Кнопки старого формата ссылались на кэш в памяти, который не пережил перезапуск
+            await callback.answer(
+                "❌ Кнопка устарела — найдите фильм заново", show_alert=True
+            )
             return
         title = parts[1]
         year_str = parts[2]
-        year = int(year_str) if year_str and year_str != "0" else None
-    
+        year = int(year_str) if year_str.isdigit() and year_str != "0" else None
+        refresh_data = "download_refresh:" + callback.data.split(":", 1)[1]
+        if len(refresh_data.encode("utf-8")) > CALLBACK_DATA_MAX_BYTES:
+            refresh_data = None
+    
+    torrent_search_cache = get_torrent_search_cache()
+    if not force_refresh:
+        hit = await torrent_search_cache.get(title, year)
+        if hit:
+            await callback.answer()
+            await _send_cached_torrent_list(callback.message, title, year, hit, refresh_data)
+            return
+
     # Отвечаем на callback сразу: у Telegram лимит ~10–30 сек, долгий поиск в Prowlarr
     # истекает позже — второй answer() даёт "query is too old". Один ответ в начале.
     await callback.answer("🔍 Ищу раздачи...")
@@ -217,15 +319,34 @@ async def callback_download_search(callback: CallbackQuery, session: AsyncSessio
         "Как только раздачи будут найдены — я пришлю сюда список."
     )
     
-    # Initialize Prowlarr service
+    # Фоновый поиск после добавления фильма уже идёт — ждём его, а не запускаем второй
+    if not force_refresh and await wait_for_torrent_prefetch(title, year):
+        hit = await torrent_search_cache.get(title, year)
+        if hit:
+            try:
+                await search_status_message.delete()
+            except Exception as e:
+                logger.warning(f"Failed to delete search status message: {e}")
+            await _send_cached_torrent_list(callback.message, title, year, hit, refresh_data)
+            return
+
+    prowlarr = get_prowlarr_service()
     settings = get_settings()
-    prowlarr = ProwlarrService(
-        base_url=settings.prowlarr_url,
-        api_key=settings.prowlarr_api_key
-    )
+
+    if settings.prowlarr_parallel_search:
+        torrents = await _search_torrents_progressive(
+            search_status_message,
+            prowlarr,
+            title,
+            year,
+            edit_interval_sec=settings.prowlarr_progress_edit_interval_sec,
+        )
+        await torrent_search_cache.store(title, year, torrents)
+        return
     
     # Search torrents
     torrents = await prowlarr.search_torrents(title, year, limit=10)
+    await torrent_search_cache.store(title, year, torrents)
     
     # Удаляем служебное сообщение о поиске (если оно ещё существует)
     try:
@@ -244,12 +365,134 @@ async def callback_download_search(callback: CallbackQuery, session: AsyncSessio
         )
         return
     
-    # Build message with detailed list
+    keyboard = build_torrent_list_keyboard(torrents)
+
+    sent_message = await callback.message.answer(
+        text=_format_torrent_list(title, year, torrents),
+        parse_mode="HTML",
+        reply_markup=keyboard
+    )
+
+    # Cache torrents for exact list message with inline buttons
+    await get_torrent_list_store().put(
+        sent_message.chat.id, sent_message.message_id, torrents
+    )
+
+
+async def _resolve_download_title(
+    session: AsyncSession, ref: FilmRef
+) -> Optional[tuple[str, Optional[int]]]:
+    """Название и год для поиска раздач: из БД, иначе из TMDB (кэш деталей)."""
+    film = await FilmRepository(session).get_by_external_id(
+        ref.external_id, "tmdb", ref.media_type
+    )
+    if film:
+        return film.title, ref.year or film.year
+    details = await get_film_search().get_details(ref.external_id, ref.media_type)
+    if details:
+        return details.title, ref.year or details.year
+    return None
+
+
+async def _send_cached_torrent_list(
+    message: Message,
+    title: str,
+    year: Optional[int],
+    hit: tuple[list[TorrentResult], timedelta],
+    refresh_data: Optional[str],
+) -> None:
+    """Send a cached list with its age and a "search again" button."""
+    torrents, age = hit
+    sent_message = await message.answer(
+        text=_format_torrent_list(title, year, torrents, age=age),
+        parse_mode="HTML",
+        reply_markup=build_torrent_list_keyboard(torrents, refresh_data),
+    )
+    await get_torrent_list_store().put(
+        sent_message.chat.id, sent_message.message_id, torrents
+    )
+
+
+async def _search_torrents_progressive(
+    status_message: Message,
+    prowlarr: ProwlarrService,
+    title: str,
+    year: Optional[int],
+    edit_interval_sec: float,
+) -> list[TorrentResult]:
+    """Edit the search status message with a growing list as indexers answer.
+
+    Args:
+        status_message: "Search started" message to turn into the list
+        prowlarr: Prowlarr service
+        title: Film title
+        year: Release year
+        edit_interval_sec: Minimal interval between intermediate edits
+
+    Returns:
+        Final ranked list (empty if nothing found)
+    """
+    torrents: list[TorrentResult] = []
+    last_edit = 0.0
+    async for snapshot in prowlarr.search_torrents_progressive(title, year, limit=10):
+        torrents = snapshot
+        if time.monotonic() - last_edit >= edit_interval_sec:
+            await _show_torrent_list(status_message, title, year, torrents, pending=True)
+            last_edit = time.monotonic()
+
+    if not torrents:
+        try:
+            await status_message.edit_text(
+                "😕 Раздачи не найдены.\n"
+                "Попробуйте другой фильм или проверьте настройки Prowlarr."
+            )
+        except Exception as e:
+            logger.warning(f"Failed to edit search status message: {e}")
+        return torrents
+
+    await _show_torrent_list(status_message, title, year, torrents, pending=False)
+    return torrents
+
+
+async def _show_torrent_list(
+    message: Message,
+    title: str,
+    year: Optional[int],
+    torrents: list[TorrentResult],
+    pending: bool,
+) -> None:
+    """Put the current list with buttons into the message and cache it for them."""
+    # Кэш обновляем вместе с кнопками: номер на кнопке всегда указывает на показанный список;
+    # в БД пишем только итоговый
+    await get_torrent_list_store().put(
+        message.chat.id, message.message_id, torrents, persist=not pending
+    )
+    try:
+        await message.edit_text(
+            text=_format_torrent_list(title, year, torrents, pending=pending),
+            parse_mode="HTML",
+            reply_markup=build_torrent_list_keyboard(torrents),
+        )
+    except Exception as e:
+        # В т.ч. "message is not modified", если индексатор не изменил верх списка
+        logger.debug(f"Failed to edit torrent list message: {e}")
+
+
+def _format_torrent_list(
+    title: str,
+    year: Optional[int],
+    torrents: list[TorrentResult],
+    pending: bool = False,
+    age: Optional[timedelta] = None,
+) -> str:
+    """HTML list of releases for the torrent list message (age — for cached results)."""
     text = f"📥 <b>Найдено раздач:</b> {len(torrents)}\n\n"
     text += f"<b>{title}</b>"
     if year:
         text += f" ({year})"
     text += "\n\n"
+    if age is not None:
+        text += f"🕒 <i>Результаты поиска {_format_age(age)} назад</i>\n\n"
     
     # Add detailed list
     for idx, torrent in enumerate(torrents, 1):
@@ -259,6 +502,10 @@ async def callback_download_search(callback: CallbackQuery, session: AsyncSessio
         if torrent.resolution:
             text += f"{torrent.resolution} · "
         
+        # Codec, HDR, audio, source (parsed from the title)
+        if torrent.tags:
+            text += f"{' '.join(torrent.tags)} · "
+
         # Size and seeders
         text += f"{torrent.size_gb} GB · 👥 {torrent.seeders}\n"
         
@@ -271,18 +518,19 @@ async def callback_download_search(callback: CallbackQuery, session: AsyncSessio
         else:
             text += f"   <i>{torrent.indexer}</i>\n\n"
     
+    if pending:
+        text += "⏳ Опрашиваю остальные трекеры — список ещё пополнится.\n"
     text += "Нажмите на номер раздачи для скачивания:"
-    
-    keyboard = build_torrent_list_keyboard(torrents)
-    
-    sent_message = await callback.message.answer(
-        text=text,
-        parse_mode="HTML",
-        reply_markup=keyboard
-    )
+    return text
 
-    # Cache torrents for exact list message with inline buttons
-    _torrent_cache[sent_message.message_id] = torrents
+
+def _format_age(age: timedelta) -> str:
+    minutes = int(age.total_seconds() // 60)
+    if minutes < 1:
+        return "меньше минуты"
+    if minutes < 60:
+        return f"{minutes} мин"
+    return f"{minutes // 60} ч {minutes % 60} мин"
 
 
 @router.callback_query(F.data.startswith("download_release:"))
@@ -306,17 +554,10 @@ async def callback_download_release(
     
     idx = int(parts[1])
     
-    # Get torrent from cache
-    message_id = callback.message.message_id
-    
-    torrents = _torrent_cache.get(message_id)
-
-    # Backward-compatible fallback for older cached entries
-    if torrents is None:
-        for cached_msg_id, cached_torrents in _torrent_cache.items():
-            if abs(cached_msg_id - message_id) < 100:
-                torrents = cached_torrents
-                break
+    # Get torrent list of this exact message
+    torrents = await get_torrent_list_store().get(
+        callback.message.chat.id, callback.message.message_id
+    )
     
     if not torrents or idx >= len(torrents):
         await callback.answer("❌ Раздача не найдена в кэше", show_alert=True)
@@ -342,12 +583,8 @@ async def callback_download_release(
     group_id = membership.group.id
     logger.info(f"Download request from group_id={group_id}, user_id={user.id}")
     
-    # Initialize Prowlarr service
     settings = get_settings()
-    prowlarr = ProwlarrService(
-        base_url=settings.prowlarr_url,
-        api_key=settings.prowlarr_api_key
-    )
+    prowlarr = get_prowlarr_service()
     
     # Check if this group can auto-download via Prowlarr
     if settings.download_group_id and group_id == settings.download_group_id:
@@ -389,7 +626,34 @@ async def callback_download_release(
         logger.info(f"Manual download mode for group {group_id}")
         await callback.answer("📥 Получаю ссылку...")
         
-        torrent_data, magnet_url = await prowlarr.download_torrent_file(torrent.magnet_url)
+        caption = (
+            f"📦 <b>{torrent.title[:200]}</b>\n\n"
+            f"<b>Источник:</b> {torrent.indexer}\n"
+            f"<b>Размер:</b> {torrent.size_gb} GB\n"
+            f"<b>Сиды:</b> {torrent.seeders}"
+        )
+
+        # Тот же .torrent уже отправляли — пересылаем по file_id, без Prowlarr и загрузки
+        torrent_files = get_torrent_file_cache()
+        cached = await torrent_files.lookup(torrent.magnet_url, torrent.info_hash)
+        if cached and cached.file_id:
+            try:
+                await bot.send_document(
+                    chat_id=callback.message.chat.id,
+                    document=cached.file_id,
+                    caption=caption,
+                    parse_mode="HTML"
+                )
+                return
+            except TelegramBadRequest as e:
+                logger.warning(f"Cached torrent file_id rejected, re-uploading: {e}")
+                await torrent_files.set_file_id(cached.info_hash, None)
+
+        torrent_data = await torrent_files.read(cached.info_hash) if cached else None
+        from_disk = torrent_data is not None
+        magnet_url = None
+        if torrent_data is None:
+            torrent_data, magnet_url = await prowlarr.download_torrent_file(torrent.magnet_url)
         
         if torrent_data:
             # Send torrent file
@@ -405,19 +669,22 @@ async def callback_download_release(
             )
             
             # Send torrent file
-            caption = (
-                f"📦 <b>{torrent.title[:200]}</b>\n\n"
-                f"<b>Источник:</b> {torrent.indexer}\n"
-                f"<b>Размер:</b> {torrent.size_gb} GB\n"
-                f"<b>Сиды:</b> {torrent.seeders}"
-            )
-            
-            await bot.send_document(
+            sent = await bot.send_document(
                 chat_id=callback.message.chat.id,
                 document=input_file,
                 caption=caption,
                 parse_mode="HTML"
             )
+
+            file_id = sent.document.file_id if sent.document else None
+            if from_disk:
+                if file_id:
+                    await torrent_files.set_file_id(cached.info_hash, file_id)
+            else:
+                try:
+                    await torrent_files.store(torrent.magnet_url, torrent_data, file_id)
+                except BencodeError as e:
+                    logger.warning(f"Torrent file not cached (not bencoded): {e}")
         elif magnet_url:
             # Send magnet link as text
             text = (
@@ -2,7 +2,7 @@
 
 import logging
 
-from aiogram.types import Message
+from aiogram.types import InlineKeyboardMarkup, Message
 
 from app.keyboards.inline import build_film_confirm_keyboard
 from app.services.dto import FilmSearchResult
@@ -14,11 +14,19 @@ async def send_film_search_result_cards(
     message: Message,
     results: list[FilmSearchResult],
     intro_line: str,
+    intro_reply_markup: InlineKeyboardMarkup | None = None,
 ) -> None:
-    """Текст + постер + клавиатура «Подтвердить» / «Скачать» для каждого результата."""
+    """Текст + постер + клавиатура «Подтвердить» / «Скачать» для каждого результата.
+
+    С intro_reply_markup вступление отправляется ответом на message — так кнопки
+    под ним могут прочитать исходный запрос из reply_to_message.
+    """
     if not results:
         return
-    await message.answer(intro_line)
+    if intro_reply_markup is not None:
+        await message.reply(intro_line, reply_markup=intro_reply_markup)
+    else:
+        await message.answer(intro_line)
     for i, result in enumerate(results):
         text = f"<b>{result.title}</b>"
         if result.year:
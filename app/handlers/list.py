@@ -10,7 +10,8 @@ from app.services.user_group import UserGroupService
 from app.services.film import FilmService
 from app.services.group_film import GroupFilmService
 from app.services.notification import NotificationService
-from app.services.tmdb import TMDBFilmSearch
+from app.services.recommendation_refresh import schedule_recommendation_prime
+from app.services.providers import get_film_search
 from app.keyboards.inline import build_film_list_keyboard, build_film_detail_keyboard
 from app.config import get_settings
 from app.telegram_text import (
@@ -107,7 +108,7 @@ async def show_film_list(
     logger.info(f"List command from group_id={group.id}, user_id={user.id}")
     
     # Get films
-    search_provider = TMDBFilmSearch()
+    search_provider = get_film_search()
     film_service = FilmService(session, search_provider)
     group_film_service = GroupFilmService(session, film_service)
     
@@ -189,7 +190,7 @@ async def callback_film_detail(callback: CallbackQuery, session: AsyncSession):
     group_film_id = int(callback.data.split(":")[1])
     
     # Get film
-    search_provider = TMDBFilmSearch()
+    search_provider = get_film_search()
     film_service = FilmService(session, search_provider)
     group_film_service = GroupFilmService(session, film_service)
     
@@ -204,8 +205,10 @@ async def callback_film_detail(callback: CallbackQuery, session: AsyncSession):
     keyboard = build_film_detail_keyboard(
         group_film_id, 
         is_watched, 
-        film.title, 
-        film.year
+        film.external_id,
+        film.media_type,
+        film.year,
+        film.title
     )
 
     text_caption = _build_film_detail_text(film, is_watched, TELEGRAM_CAPTION_MAX_LEN)
@@ -268,7 +271,7 @@ async def callback_mark_watched(callback: CallbackQuery, session: AsyncSession,
     group = membership.group
     
     # Mark as watched
-    search_provider = TMDBFilmSearch()
+    search_provider = get_film_search()
     film_service = FilmService(session, search_provider)
     group_film_service = GroupFilmService(session, film_service)
     
@@ -286,8 +289,10 @@ async def callback_mark_watched(callback: CallbackQuery, session: AsyncSession,
         keyboard = build_film_detail_keyboard(
             group_film_id, 
             is_watched=True, 
-            film_title=film.title, 
-            film_year=film.year
+            film_external_id=film.external_id,
+            film_media_type=film.media_type,
+            film_year=film.year,
+            film_title=film.title
         )
         
         try:
@@ -309,6 +314,7 @@ async def callback_mark_watched(callback: CallbackQuery, session: AsyncSession,
             logger.error(f"Error updating message: {e}")
         
         await callback.answer("✅ Фильм отмечен как просмотренный!")
+        schedule_recommendation_prime(film.id)
         
         # Notify group members
         members = await user_service.get_group_members(group.id)
@@ -6,15 +6,11 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from app.db.models import GroupFilm
 from app.services.dto import FilmSearchResult, TorrentResult
+from app.utils.callback_payload import FilmRef, pack_film_ref, unpack_film_ref
 
 # Telegram limit: callback_data max 64 bytes
 CALLBACK_DATA_MAX_BYTES = 64
 
-# Cache for download_search: {id: (title, year)} — avoids long titles in callback_data
-_download_search_cache: dict[int, tuple[str, Optional[int]]] = {}
-_download_search_counter = 0
-
-
 def _truncate_callback_data(data: str, max_bytes: int = CALLBACK_DATA_MAX_BYTES) -> str:
     """Truncate string to fit within Telegram callback_data limit (64 bytes)."""
     encoded = data.encode("utf-8")
@@ -23,27 +19,42 @@ def _truncate_callback_data(data: str, max_bytes: int = CALLBACK_DATA_MAX_BYTES)
     return encoded[:max_bytes].decode("utf-8", errors="ignore")
 
 
-def register_download_search(title: str, year: Optional[int]) -> str:
-    """Register (title, year) in cache and return short callback_data.
-    
-    Use this instead of putting full title in callback_data (64 byte limit).
+def build_download_search_data(
+    external_id: str,
+    media_type: str,
+    year: Optional[int],
+    title: str = "",
+    refresh: bool = False,
+) -> str:
+    """callback_data кнопки «Скачать»: 'download_search:<payload>' (см. callback_payload).
+
+    Название в кнопку не кладём — хендлер берёт его из БД/TMDB по id,
+    поэтому серверный кэш кнопок не нужен. refresh=True — 'download_refresh:<payload>',
+    тот же поиск мимо кэша результатов. Если id не числовой (не TMDB) —
+    прежний формат 'download_search:<title>:<year>' с урезанным названием.
     """
-    global _download_search_counter
-    _download_search_counter = (_download_search_counter + 1) % 100000
-    _download_search_cache[_download_search_counter] = (title, year)
-    return f"download_search:{_download_search_counter}"
+    prefix = "download_refresh" if refresh else "download_search"
+    try:
+        payload = pack_film_ref(FilmRef(int(external_id), media_type, year))
+    except ValueError:
+        return _legacy_download_search_data(prefix, title, year)
+    return f"{prefix}:{payload}"
 
 
-def get_download_search_from_cache(callback_data: str) -> Optional[tuple[str, Optional[int]]]:
-    """Get (title, year) from cache by callback_data like 'download_search:12345'."""
+def _legacy_download_search_data(prefix: str, title: str, year: Optional[int]) -> str:
+    # ":" — разделитель полей; место под год оставляем и для более длинного download_refresh
+    suffix = f":{year or 0}"
+    budget = CALLBACK_DATA_MAX_BYTES - len("download_refresh:") - len(suffix)
+    safe_title = _truncate_callback_data(title.replace(":", " ").strip(), budget)
+    return f"{prefix}:{safe_title}{suffix}"
+
+
+def parse_download_search_data(callback_data: str) -> Optional[FilmRef]:
+    """FilmRef из 'download_search:<payload>' / 'download_refresh:<payload>'; None — чужой формат."""
     parts = callback_data.split(":", 2)
     if len(parts) != 2:
         return None
-    try:
-        cache_id = int(parts[1])
-        return _download_search_cache.get(cache_id)
-    except ValueError:
-        return None
+    return unpack_film_ref(parts[1])
 
 
 def build_main_menu_keyboard(has_group: bool) -> InlineKeyboardMarkup:
@@ -70,6 +81,18 @@ def build_main_menu_keyboard(has_group: bool) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def build_search_more_keyboard() -> InlineKeyboardMarkup:
+    """Кнопка «искать в TMDB» под результатами локального поиска.
+
+    Запрос не кладётся в callback_data: хендлер берёт его из reply_to_message.
+    """
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="🌐 Искать в TMDB", callback_data="search_tmdb")
+    )
+    return builder.as_markup()
+
+
 def build_film_confirm_keyboard(
     result: FilmSearchResult,
     index: int
@@ -90,8 +113,10 @@ def build_film_confirm_keyboard(
         InlineKeyboardButton(text="✅ Подтвердить", callback_data=callback_data)
     )
     
-    # Add download button (use cache — title can exceed 64 bytes)
-    download_data = register_download_search(result.title, result.year)
+    # Add download button (id instead of title — title can exceed 64 bytes)
+    download_data = build_download_search_data(
+        result.external_id, result.media_type, result.year, result.title
+    )
     builder.row(
         InlineKeyboardButton(text="📥 Скачать", callback_data=download_data)
     )
@@ -161,16 +186,20 @@ def build_film_list_keyboard(
 def build_film_detail_keyboard(
     group_film_id: int,
     is_watched: bool,
-    film_title: str,
-    film_year: Optional[int] = None
+    film_external_id: str,
+    film_media_type: str = "movie",
+    film_year: Optional[int] = None,
+    film_title: str = ""
 ) -> InlineKeyboardMarkup:
     """Build keyboard for film detail view.
     
     Args:
         group_film_id: Group film ID
         is_watched: Whether film is already watched
-        film_title: Film title for magnet search
+        film_external_id: TMDB ID for the download button
+        film_media_type: Media type ('movie' or 'tv')
         film_year: Film year for magnet search
+        film_title: Film title (used only when the ID is not numeric)
         
     Returns:
         Inline keyboard with Watched and Magnet buttons
@@ -185,8 +214,10 @@ def build_film_detail_keyboard(
             )
         )
     
-    # Add download button (use cache — title can exceed 64 bytes)
-    download_data = register_download_search(film_title, film_year)
+    # Add download button (id instead of title — title can exceed 64 bytes)
+    download_data = build_download_search_data(
+        film_external_id, film_media_type, film_year, film_title
+    )
     builder.row(
         InlineKeyboardButton(text="📥 Скачать", callback_data=download_data)
     )
@@ -199,12 +230,15 @@ def build_film_detail_keyboard(
 
 
 def build_torrent_list_keyboard(
-    torrents: list[TorrentResult]
+    torrents: list[TorrentResult],
+    refresh_callback_data: Optional[str] = None,
 ) -> InlineKeyboardMarkup:
     """Build keyboard with torrent list.
     
     Args:
         torrents: List of torrent results
+        refresh_callback_data: Callback data of the "search again" button
+            (shown for cached results)
         
     Returns:
         Inline keyboard with numbered buttons (3-5 per row)
@@ -226,4 +260,9 @@ def build_torrent_list_keyboard(
         row_buttons = buttons[i:i+5]
         builder.row(*row_buttons)
     
+    if refresh_callback_data:
+        builder.row(
+            InlineKeyboardButton(text="🔄 Искать заново", callback_data=refresh_callback_data)
+        )
+
     return builder.as_markup()
@@ -2,17 +2,23 @@
 
 import asyncio
 import logging
-import httpx
+from datetime import timedelta
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 
 from app.config import get_settings
-from app.db.database import async_session_maker
+from app.db.database import async_session_maker, dispose_engine
 from app.middlewares.db import DatabaseMiddleware
 from app.handlers import commands, group, member, film, list as list_handler
-from app.services.recommendation_refresh import refresh_recommendation_cache_for_all_sources
-from app.services.tmdb import TMDBFilmSearch
+from app.services.http_clients import close_http_clients, init_http_clients
+from app.services.recommendation_refresh import (
+    FailureBackoff,
+    refresh_due_recommendation_sources,
+)
+from app.services.providers import get_tmdb_search
+from app.services.readiness import ensure_ready, run_startup_probes
+from app.utils.background import background_tasks
 
 
 # Configure logging
@@ -23,68 +29,67 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def test_tmdb_connection():
-    """Test TMDB API connection at startup."""
-    settings = get_settings()
-    headers = {
-        "Authorization": f"Bearer {settings.tmdb_api_key}",
-        "accept": "application/json"
-    }
-    
+async def set_bot_commands(bot: Bot) -> None:
+    """Меню команд — в фоне: polling не ждёт ответа Telegram."""
     try:
-        logger.info("Testing TMDB API connection...")
-        if settings.proxy_url:
-            logger.info(f"Using proxy: {settings.proxy_url}")
-        
-        # Создаем клиент с прокси если указан
-        client_kwargs = {"timeout": 10.0}
-        if settings.proxy_url:
-            client_kwargs["proxy"] = settings.proxy_url
-        
-        async with httpx.AsyncClient(**client_kwargs) as client:
-            response = await client.get(
-                "https://api.themoviedb.org/3/configuration",
-                headers=headers
-            )
-            response.raise_for_status()
-            logger.info("✅ TMDB API connection successful!")
-            return True
-    except httpx.ConnectError as e:
-        logger.error(f"❌ TMDB connection error (check network/DNS/proxy): {e}")
-        return False
-    except httpx.HTTPStatusError as e:
-        logger.error(f"❌ TMDB auth error {e.response.status_code}: Check your TMDB_API_KEY")
-        logger.error(f"Response: {e.response.text}")
-        return False
+        await bot.set_my_commands([
+            BotCommand(command="start", description="Главное меню"),
+            BotCommand(command="list", description="Список фильмов группы"),
+            BotCommand(command="relative", description="Похожие на просмотренное"),
+        ])
     except Exception as e:
-        logger.error(f"❌ TMDB test failed: {type(e).__name__}: {e}")
-        return False
+        logger.warning(f"Failed to set bot commands: {e}")
 
 
 async def recommendation_cache_background_loop() -> None:
-    """Периодически обновляет film_recommendation_cache (не блокирует polling)."""
+    """Инкрементально обновляет film_recommendation_sources (не блокирует polling).
+
+    Каждый тик берёт ограниченную пачку источников: запрошенные вне очереди,
+    ни разу не загруженные и те, чей кэш старше recommendation_cache_interval_hours.
+    """
     settings = get_settings()
     logger.info(
-        "Фон кэша рекомендаций: задача запущена, первый прогон через %s с "
-        "(далее каждые %s ч)",
+        "Фон кэша рекомендаций: задача запущена, первый тик через %s с "
+        "(далее каждые %s с, до %s источников; TTL кэша %s ч)",
         settings.recommendation_initial_delay_sec,
+        settings.recommendation_refresh_tick_sec,
+        settings.recommendation_refresh_batch_limit,
         settings.recommendation_cache_interval_hours,
     )
     await asyncio.sleep(settings.recommendation_initial_delay_sec)
-    search = TMDBFilmSearch()
-    interval_sec = max(3600.0, settings.recommendation_cache_interval_hours * 3600)
+    search = get_tmdb_search()
+    ttl = timedelta(hours=settings.recommendation_cache_interval_hours)
+    failure_policy = FailureBackoff(
+        backoff=timedelta(hours=settings.recommendation_failure_backoff_hours),
+        max_backoff=timedelta(hours=settings.recommendation_failure_max_backoff_hours),
+        max_failures=settings.recommendation_failure_max_failures,
+    )
     while True:
+        if search.breaker is not None and search.breaker.is_open:
+            # TMDB недоступен — не долбим его; /relative работает на старом кэше
+            logger.info("Фон кэша рекомендаций: circuit TMDB разомкнут, тик пропущен")
+            await asyncio.sleep(settings.recommendation_refresh_tick_sec)
+            continue
+        if not await ensure_ready("tmdb", settings):
+            logger.info("Фон кэша рекомендаций: TMDB не готов (readiness), тик пропущен")
+            await asyncio.sleep(settings.recommendation_refresh_tick_sec)
+            continue
         try:
             async with async_session_maker() as session:
-                await refresh_recommendation_cache_for_all_sources(
+                await refresh_due_recommendation_sources(
                     session,
                     search,
-                    delay_between_requests_sec=settings.recommendation_tmdb_delay_sec,
+                    ttl=ttl,
+                    limit=settings.recommendation_refresh_batch_limit,
+                    concurrency=settings.recommendation_refresh_concurrency,
+                    batch_size=settings.recommendation_refresh_batch_size,
+                    pages=settings.recommendation_pages,
+                    max_per_source=settings.recommendation_max_per_source,
+                    failure_policy=failure_policy,
                 )
-                await session.commit()
         except Exception:
             logger.exception("Фоновое обновление кэша рекомендаций завершилось с ошибкой")
-        await asyncio.sleep(interval_sec)
+        await asyncio.sleep(settings.recommendation_refresh_tick_sec)
 
 
 async def main():
@@ -92,8 +97,8 @@ async def main():
     # Load settings
     settings = get_settings()
     
-    # Test TMDB connection
-    await test_tmdb_connection()
+    # Long-lived HTTP pools for TMDB/Prowlarr (closed on shutdown)
+    init_http_clients(settings)
     
     # Initialize bot and dispatcher
     bot = Bot(token=settings.bot_token)
@@ -110,14 +115,14 @@ async def main():
     dp.include_router(member.router)
     dp.include_router(film.router)  # Общий обработчик текста - последним!
     
-    # Set bot commands menu
-    await bot.set_my_commands([
-        BotCommand(command="start", description="Главное меню"),
-        BotCommand(command="list", description="Список фильмов группы"),
-        BotCommand(command="relative", description="Похожие на просмотренное"),
-    ])
-
-    asyncio.create_task(recommendation_cache_background_loop())
+    # Polling стартует сразу; проверки зависимостей, меню команд и фон кэша — параллельно
+    background_tasks.spawn(run_startup_probes(settings), key="startup_probes", name="startup-probes")
+    background_tasks.spawn(set_bot_commands(bot), key="set_my_commands", name="set-my-commands")
+    background_tasks.spawn(
+        recommendation_cache_background_loop(),
+        key="recommendation_refresh",
+        name="recommendation-refresh",
+    )
 
     # Start polling
     logger.info("Starting bot...")
@@ -125,6 +130,9 @@ async def main():
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
         await bot.session.close()
+        await background_tasks.cancel_all()
+        await close_http_clients()
+        await dispose_engine()
 
 
 if __name__ == "__main__":
@@ -1,9 +1,10 @@
 """Base classes for services."""
 
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Optional
 
-from app.services.dto import FilmSearchResult
+from app.services.dto import FilmBundle, FilmSearchResult
 
 
 class BaseFilmSearchProvider(ABC):
@@ -31,8 +32,9 @@ class BaseFilmSearchProvider(ABC):
         self,
         external_id: str,
         media_type: str,
-    ) -> Optional[list[tuple[str, str]]]:
-        """TMDB recommendations: список (external_id, media_type) или None при ошибке API."""
+        pages: int = 1,
+    ) -> Optional[list[FilmSearchResult]]:
+        """TMDB recommendations (до `pages` страниц): краткие карточки или None при ошибке API."""
         pass
     
     @abstractmethod
@@ -51,3 +53,31 @@ class BaseFilmSearchProvider(ABC):
             Film details or None if not found
         """
         pass
+
+    async def fetch_bundle(
+        self,
+        external_id: str,
+        media_type: Optional[str],
+        pages: int = 1,
+    ) -> Optional[FilmBundle]:
+        """Details and recommendations of one film together.
+
+        The default issues both requests concurrently; providers with a batched
+        endpoint override it with a single call.
+
+        Args:
+            external_id: External film ID
+            media_type: 'movie', 'tv' or None if unknown
+            pages: Recommendation pages to fetch
+
+        Returns:
+            Bundle or None if details are unavailable
+        """
+        media_type = media_type or "movie"
+        details, recommendations = await asyncio.gather(
+            self.get_details(external_id, media_type),
+            self.fetch_recommendations(external_id, media_type, pages),
+        )
+        if details is None:
+            return None
+        return FilmBundle(details=details, recommendations=recommendations)
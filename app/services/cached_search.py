@@ -0,0 +1,156 @@
+"""Кэширующая обёртка над провайдером поиска фильмов.
+
+search: результаты /search/multi — в ограниченном LRU/TTL-кэше процесса по нормализованному
+запросу и языку; пустой ответ кэшируется на короткое время (опечатки, повторы).
+
+fetch_bundle: пакетный запрос всегда идёт в провайдер (нужны свежие рекомендации),
+карточка из ответа сохраняется в film_details_cache.
+
+get_details: карточки хранятся в film_details_cache (Postgres). Свежая запись отдаётся
+сразу; устаревшая — тоже сразу, а обновление из TMDB уходит в фон (stale-while-revalidate);
+если провайдер недоступен, отдаём любую сохранённую запись.
+"""
+
+import logging
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repositories import FilmDetailsCacheRepository
+from app.services.base import BaseFilmSearchProvider
+from app.services.dto import FilmBundle, FilmSearchResult
+from app.services.metrics import metrics
+from app.utils.background import BackgroundTasks, background_tasks
+from app.utils.query import normalize_search_query
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class CachedFilmSearch(BaseFilmSearchProvider):
+    """Провайдер-декоратор: кэш карточек в БД перед внешним API."""
+
+    def __init__(
+        self,
+        inner: BaseFilmSearchProvider,
+        session_factory: Callable[[], AsyncSession],
+        *,
+        details_fresh_ttl: timedelta,
+        details_stale_ttl: timedelta,
+        search_cache_size: int = 1000,
+        search_cache_ttl_sec: float = 1800.0,
+        search_negative_ttl_sec: float = 120.0,
+        language: str = "ru",
+        source: str = "tmdb",
+        tasks: BackgroundTasks | None = None,
+    ) -> None:
+        self._inner = inner
+        self._search_cache: TTLCache[tuple[str, str], list[FilmSearchResult]] = TTLCache(
+            maxsize=search_cache_size, ttl=search_cache_ttl_sec
+        )
+        self._search_negative_ttl = search_negative_ttl_sec
+        self._session_factory = session_factory
+        self._fresh_ttl = details_fresh_ttl
+        self._stale_ttl = max(details_stale_ttl, details_fresh_ttl)
+        self._language = language
+        self._source = source
+        self._tasks = tasks or background_tasks
+
+    @property
+    def inner(self) -> BaseFilmSearchProvider:
+        return self._inner
+
+    async def search(
+        self,
+        query: str,
+        language: str = "ru"
+    ) -> Optional[list[FilmSearchResult]]:
+        key = (normalize_search_query(query), language)
+        cached = self._search_cache.get(key)
+        if cached is not None:
+            metrics.incr("search_cache.hit")
+            return list(cached)
+
+        metrics.incr("search_cache.miss")
+        results = await self._inner.search(query, language)
+        if results is None:
+            # Ошибку API не кэшируем — следующий запрос снова пойдёт в TMDB
+            return None
+        ttl = None if results else self._search_negative_ttl
+        self._search_cache.set(key, list(results), ttl=ttl)
+        return results
+
+    async def fetch_recommendations(
+        self,
+        external_id: str,
+        media_type: str,
+        pages: int = 1,
+    ) -> Optional[list[FilmSearchResult]]:
+        return await self._inner.fetch_recommendations(external_id, media_type, pages)
+
+    async def fetch_bundle(
+        self,
+        external_id: str,
+        media_type: Optional[str],
+        pages: int = 1,
+    ) -> Optional[FilmBundle]:
+        bundle = await self._inner.fetch_bundle(external_id, media_type, pages)
+        if bundle is not None:
+            await self._store(bundle.details)
+        return bundle
+
+    async def get_details(
+        self,
+        external_id: str,
+        media_type: str
+    ) -> Optional[FilmSearchResult]:
+        async with self._session_factory() as session:
+            row = await FilmDetailsCacheRepository(session).get(
+                self._source, external_id, media_type, self._language
+            )
+            cached = FilmDetailsCacheRepository.to_result(row) if row else None
+            age = datetime.utcnow() - row.fetched_at if row else None
+
+        if cached is not None and age <= self._fresh_ttl:
+            metrics.incr("details_cache.hit")
+            return cached
+
+        if cached is not None and age <= self._stale_ttl:
+            metrics.incr("details_cache.stale")
+            self._tasks.spawn(
+                self._refresh(external_id, media_type),
+                key=("details_refresh", self._source, external_id, media_type),
+                name=f"details_refresh:{external_id}",
+            )
+            return cached
+
+        metrics.incr("details_cache.miss")
+        fresh = await self._refresh(external_id, media_type)
+        if fresh is None and cached is not None:
+            logger.warning(
+                "details cache: провайдер недоступен, отдаём запись возрастом %s для %s/%s",
+                age,
+                media_type,
+                external_id,
+            )
+            return cached
+        return fresh
+
+    async def _refresh(self, external_id: str, media_type: str) -> Optional[FilmSearchResult]:
+        details = await self._inner.get_details(external_id, media_type)
+        if details is None:
+            return None
+        await self._store(details)
+        return details
+
+    async def _store(self, details: FilmSearchResult) -> None:
+        async with self._session_factory() as session:
+            try:
+                await FilmDetailsCacheRepository(session).upsert(details, self._language)
+                await session.commit()
+            except IntegrityError:
+                # Параллельный запрос уже вставил ту же карточку — это не ошибка
+                await session.rollback()
@@ -25,6 +25,17 @@ class FilmSearchResult(BaseModel):
     )
 
 
+class FilmBundle(BaseModel):
+    """Film details plus recommendations fetched in one provider round trip."""
+
+    details: FilmSearchResult
+    recommendations: Optional[list[FilmSearchResult]] = Field(
+        default=None,
+        description="Recommendations; None if the provider did not return them",
+    )
+    recommendation_pages: int = Field(default=1, description="Total recommendation pages")
+
+
 class FilmCreate(BaseModel):
     """DTO for creating a film in database."""
     
@@ -40,6 +51,20 @@ class FilmCreate(BaseModel):
     media_type: str = "movie"
 
 
+class ResolvedFilm(BaseModel):
+    """Film data resolved for adding to a group."""
+
+    film: FilmCreate
+    needs_enrichment: bool = Field(
+        default=False,
+        description="Local row lacks detail fields and should be enriched in background",
+    )
+    recommendations: Optional[list[FilmSearchResult]] = Field(
+        default=None,
+        description="Recommendations fetched together with details (new films only)",
+    )
+
+
 class TorrentResult(BaseModel):
     """Torrent search result from Prowlarr."""
     
@@ -51,7 +76,16 @@ class TorrentResult(BaseModel):
     seeders: int = Field(default=0, description="Number of seeders")
     magnet_url: str = Field(description="Magnet link or download URL")
     resolution: Optional[str] = Field(default=None, description="Video resolution (e.g., 1080p)")
+    tags: list[str] = Field(
+        default_factory=list,
+        description="Codec/HDR/audio/source labels parsed from the title",
+    )
+    score: float = Field(default=0.0, description="Ranking score (higher is better)")
     info_url: Optional[str] = Field(default=None, description="Link to tracker page")
+    info_hash: Optional[str] = Field(
+        default=None,
+        description="BitTorrent info-hash, if the indexer reports it",
+    )
     search_query: Optional[str] = Field(
         default=None,
         description="Original query used in Prowlarr search",
@@ -2,16 +2,137 @@
 
 import logging
 from typing import Optional
+from collections.abc import Callable
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.repositories import FilmRepository
-from app.db.models import Film
+from app.db.repositories import FilmRecommendationCacheRepository, FilmRepository
+from app.db.models import Film, FilmRecommendationSource
 from app.services.base import BaseFilmSearchProvider
-from app.services.dto import FilmSearchResult, FilmCreate
+from app.services.dto import FilmSearchResult, FilmCreate, ResolvedFilm
+from app.services.recommendation_refresh import MAX_RECOMMENDATIONS_PER_SOURCE
 
 
 logger = logging.getLogger(__name__)
 
+# Fields fetched only from the details endpoint (search results don't carry them)
+DETAIL_FIELDS = ("duration", "director")
+
+
+def film_to_create(film: Film) -> FilmCreate:
+    """Build FilmCreate from an existing Film row."""
+    return FilmCreate(
+        external_id=film.external_id,
+        source=film.source,
+        title=film.title,
+        title_original=film.title_original,
+        year=film.year,
+        description=film.description,
+        poster_url=film.poster_url,
+        duration=film.duration,
+        director=film.director,
+        media_type=film.media_type,
+    )
+
+
+def details_to_create(details: FilmSearchResult) -> FilmCreate:
+    """Build FilmCreate from provider details."""
+    return FilmCreate(
+        external_id=details.external_id,
+        source=details.source,
+        title=details.title,
+        title_original=details.title_original,
+        year=details.year,
+        description=details.description,
+        poster_url=details.poster_url,
+        duration=details.duration,
+        director=details.director,
+        media_type=details.media_type,
+    )
+
+
+def film_to_search_result(film: Film) -> FilmSearchResult:
+    """Build FilmSearchResult from a Film row (local catalog search)."""
+    return FilmSearchResult(
+        external_id=film.external_id,
+        source=film.source,
+        title=film.title,
+        title_original=film.title_original,
+        year=film.year,
+        description=film.description,
+        poster_url=film.poster_url,
+        media_type=film.media_type,
+        duration=film.duration,
+        director=film.director,
+    )
+
+
+def is_film_complete(film: Film) -> bool:
+    """Whether a Film row has everything the details endpoint would add.
+
+    TMDB TV shows have no "Director" in credits crew, so the director is not
+    required for them (otherwise every confirm would re-run enrichment).
+    """
+    fields = ("duration",) if film.media_type == "tv" else DETAIL_FIELDS
+    return all(getattr(film, field) for field in fields)
+
+
+async def enrich_film_details(
+    session_factory: Callable[[], AsyncSession],
+    search_provider: BaseFilmSearchProvider,
+    film_id: int,
+    *,
+    pages: int = 1,
+    max_per_source: int = MAX_RECOMMENDATIONS_PER_SOURCE,
+) -> None:
+    """Fill missing detail fields of a Film row (runs in background, own session).
+
+    If the film has no cached recommendations yet, details and recommendations
+    come from one bundled provider call and both are stored.
+
+    Args:
+        session_factory: Session factory for a fresh session
+        search_provider: Film search provider
+        film_id: Film ID
+        pages: Recommendation pages to fetch with the bundle
+        max_per_source: Max recommendations stored for the film
+    """
+    # Сессия не держится на время запроса к TMDB: читаем, закрываем, пишем в новой
+    async with session_factory() as session:
+        film = await session.get(Film, film_id)
+        if film is None or is_film_complete(film):
+            return
+        external_id, media_type = film.external_id, film.media_type
+        state = await session.get(FilmRecommendationSource, film_id)
+        need_recommendations = state is None or state.fetched_at is None
+    recommendations: Optional[list[FilmSearchResult]] = None
+    if need_recommendations:
+        bundle = await search_provider.fetch_bundle(external_id, media_type, pages)
+        details = bundle.details if bundle else None
+        recommendations = bundle.recommendations if bundle else None
+    else:
+        details = await search_provider.get_details(external_id, media_type)
+    if details is None:
+        logger.warning("Film enrichment: no details for film_id=%s", film_id)
+        return
+    async with session_factory() as session:
+        film = await session.get(Film, film_id)
+        if film is None:
+            return
+        changed = False
+        for field in ("title_original", "year", "description", "poster_url", *DETAIL_FIELDS):
+            value = getattr(details, field)
+            if value and not getattr(film, field):
+                setattr(film, field, value)
+                changed = True
+        if recommendations is not None:
+            await FilmRecommendationCacheRepository(session).replace_for_source(
+                film_id, recommendations[:max_per_source]
+            )
+            changed = True
+        if changed:
+            await session.commit()
+            logger.info("Film enrichment: film_id=%s updated", film_id)
+
 
 class FilmService:
     """Service for film operations."""
@@ -48,6 +169,27 @@ class FilmService:
         logger.info(f"Searching films: '{query}' (language: {language})")
         return await self.search_provider.search(query, language)
     
+    async def search_local(
+        self,
+        query: str,
+        limit: int = 5,
+        min_score: float = 0.3,
+    ) -> tuple[list[FilmSearchResult], float]:
+        """Fuzzy search over films already known to the bot (no provider call).
+
+        Args:
+            query: Search query
+            limit: Max number of results
+            min_score: Minimal trigram similarity to include a film
+
+        Returns:
+            Tuple of (results ordered by similarity, best similarity or 0.0)
+        """
+        found = await self.film_repo.search_by_title(query, limit=limit, min_score=min_score)
+        best = found[0][1] if found else 0.0
+        logger.info("Local search '%s': %d results, best score %.2f", query, len(found), best)
+        return [film_to_search_result(film) for film, _ in found], best
+
     async def get_or_create_film(self, film_data: FilmCreate) -> Film:
         """Get existing film or create new one.
         
@@ -81,6 +223,44 @@ class FilmService:
             media_type=film_data.media_type,
         )
     
+    async def resolve_film_data(
+        self,
+        external_id: str,
+        media_type: str,
+        source: str = "tmdb",
+    ) -> Optional[ResolvedFilm]:
+        """Resolve film data local-first.
+
+        An existing row is used as is, without a provider round trip; for an
+        unknown film details and recommendations come from one bundled call.
+
+        Args:
+            external_id: External film ID
+            media_type: Media type ('movie' or 'tv')
+            source: Provider name
+
+        Returns:
+            Resolved film or None if not found
+        """
+        existing = await self.film_repo.get_by_external_id(
+            external_id=external_id,
+            source=source,
+            media_type=media_type,
+        )
+        if existing:
+            return ResolvedFilm(
+                film=film_to_create(existing),
+                needs_enrichment=not is_film_complete(existing),
+            )
+
+        bundle = await self.search_provider.fetch_bundle(external_id, media_type)
+        if not bundle:
+            return None
+        return ResolvedFilm(
+            film=details_to_create(bundle.details),
+            recommendations=bundle.recommendations,
+        )
+
     async def get_film_details(
         self,
         external_id: str,
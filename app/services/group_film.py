@@ -4,7 +4,11 @@ import logging
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.repositories import GroupFilmRepository, WatchedRepository
+from app.db.repositories import (
+    FilmRecommendationCacheRepository,
+    GroupFilmRepository,
+    WatchedRepository,
+)
 from app.db.models import GroupFilm, Film
 from app.services.dto import FilmCreate
 from app.services.film import FilmService
@@ -30,6 +34,7 @@ class GroupFilmService:
         self.session = session
         self.group_film_repo = GroupFilmRepository(session)
         self.watched_repo = WatchedRepository(session)
+        self.recommendation_cache_repo = FilmRecommendationCacheRepository(session)
         self.film_service = film_service
     
     async def add_film_to_group(
@@ -64,11 +69,13 @@ class GroupFilmService:
         
         # Add to group
         logger.info(f"Adding film {film.id} to group {group_id}")
-        return await self.group_film_repo.add_film_to_group(
+        group_film = await self.group_film_repo.add_film_to_group(
             group_id=group_id,
             film_id=film.id,
             added_by_user_id=added_by_user_id
         )
+        await self._request_recommendations(film.id)
+        return group_film
     
     async def get_group_films(
         self,
@@ -136,6 +143,19 @@ class GroupFilmService:
             group_film_id=group_film_id,
             marked_by_user_id=marked_by_user_id
         )
+        group_film = await self.group_film_repo.get_by_id(group_film_id)
+        if group_film:
+            await self._request_recommendations(group_film.film_id)
+
+    async def _request_recommendations(self, film_id: int) -> None:
+        """Поставить фильм в начало очереди обновления кэша рекомендаций."""
+        try:
+            await self.recommendation_cache_repo.request_refresh(film_id)
+            await self.session.commit()
+        except Exception as e:
+            # Не мешаем добавлению/отметке: фильм подхватит обычный тик
+            await self.session.rollback()
+            logger.warning(f"Failed to request recommendations refresh for film {film_id}: {e}")
     
     async def is_watched(self, group_film_id: int) -> bool:
         """Check if film is marked as watched.
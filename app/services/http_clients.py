@@ -0,0 +1,87 @@
+"""Долгоживущие пулы HTTP-соединений к внешним API (TMDB, Prowlarr).
+
+Один httpx.AsyncClient на апстрим: keep-alive, опционально HTTP/2, лимиты пула из Settings.
+Клиенты создаются при старте (app.main) и закрываются при остановке; заголовки
+авторизации передаются на каждый запрос, чтобы ключи не уходили на чужие хосты.
+"""
+
+import importlib.util
+import logging
+
+import httpx
+
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+TMDB_TIMEOUT_SEC = 10.0
+# Поиск по нескольким индексам в Prowlarr может занимать 60–90+ сек
+PROWLARR_TIMEOUT_SEC = 90.0
+
+
+class HttpClients:
+    """Пулы соединений по апстримам."""
+
+    def __init__(self, settings: Settings) -> None:
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_sec,
+        )
+        http2 = settings.http2_enabled and self._h2_available()
+        if settings.proxy_url:
+            logger.info("HTTP-пул TMDB будет использовать прокси: %s", settings.proxy_url)
+        self.tmdb = httpx.AsyncClient(
+            timeout=TMDB_TIMEOUT_SEC,
+            limits=limits,
+            http2=http2,
+            proxy=settings.proxy_url,
+        )
+        self.prowlarr = httpx.AsyncClient(
+            timeout=PROWLARR_TIMEOUT_SEC,
+            limits=limits,
+            http2=http2,
+        )
+        logger.info(
+            "HTTP-пулы созданы: max_connections=%s keepalive=%s http2=%s",
+            settings.http_max_connections,
+            settings.http_max_keepalive_connections,
+            http2,
+        )
+
+    @staticmethod
+    def _h2_available() -> bool:
+        if importlib.util.find_spec("h2") is not None:
+            return True
+        logger.warning(
+            "HTTP2_ENABLED=true, но пакет h2 не установлен (pip install 'httpx[http2]') — используем HTTP/1.1"
+        )
+        return False
+
+    async def aclose(self) -> None:
+        await self.tmdb.aclose()
+        await self.prowlarr.aclose()
+
+
+_clients: HttpClients | None = None
+
+
+def init_http_clients(settings: Settings | None = None) -> HttpClients:
+    """Создать пулы (один раз при старте приложения)."""
+    global _clients
+    if _clients is None:
+        _clients = HttpClients(settings or get_settings())
+    return _clients
+
+
+def get_http_clients() -> HttpClients:
+    """Общие клиенты; создаются лениво, если init_http_clients ещё не вызывали (скрипты)."""
+    return _clients or init_http_clients()
+
+
+async def close_http_clients() -> None:
+    """Закрыть пулы при остановке приложения."""
+    global _clients
+    if _clients is not None:
+        await _clients.aclose()
+        _clients = None
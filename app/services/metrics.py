@@ -0,0 +1,46 @@
+"""Простые in-process метрики: счётчики и значения (gauge) по имени.
+
+Экспортёра нет: snapshot() пишется в лог фоновыми задачами и доступен для отладки.
+"""
+
+import threading
+from collections import Counter
+
+
+class Metrics:
+    """Потокобезопасный реестр счётчиков и gauge-значений."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Counter[str] = Counter()
+        self._gauges: dict[str, float] = {}
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name]
+            return self._counters.get(name, 0)
+
+    def snapshot(self, prefix: str = "") -> dict[str, float]:
+        with self._lock:
+            out: dict[str, float] = {
+                k: v for k, v in self._counters.items() if k.startswith(prefix)
+            }
+            out.update({k: v for k, v in self._gauges.items() if k.startswith(prefix)})
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+
+
+metrics = Metrics()
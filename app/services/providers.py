@@ -0,0 +1,157 @@
+"""Общие экземпляры внешних провайдеров на процесс.
+
+Хендлеры и фоновые задачи берут провайдеры отсюда, а не создают на каждый апдейт:
+так кэши и состояние (пулы, счётчики) живут всё время работы бота.
+"""
+
+from datetime import timedelta
+
+from app.config import get_settings
+from app.services.base import BaseFilmSearchProvider
+from app.services.cached_search import CachedFilmSearch
+from app.services.prowlarr import ProwlarrService
+from app.services.tmdb import TMDBFilmSearch
+from app.services.torrent_cache import TorrentSearchCache
+from app.services.torrent_files import TorrentFileCache
+from app.services.torrent_lists import TorrentListStore
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.rate_limiter import TokenBucketLimiter
+from app.utils.retry import RetryPolicy
+
+_tmdb_search: TMDBFilmSearch | None = None
+_film_search: CachedFilmSearch | None = None
+_prowlarr: ProwlarrService | None = None
+_torrent_search_cache: TorrentSearchCache | None = None
+_torrent_lists: TorrentListStore | None = None
+_torrent_files: TorrentFileCache | None = None
+
+
+def get_tmdb_search() -> TMDBFilmSearch:
+    """TMDB без кэшей, но с общим на процесс rate limiter (фон и хендлеры делят квоту)
+    и circuit breaker (при недоступности TMDB запросы отклоняются сразу)."""
+    global _tmdb_search
+    if _tmdb_search is None:
+        settings = get_settings()
+        _tmdb_search = TMDBFilmSearch(
+            limiter=TokenBucketLimiter(
+                rate=settings.tmdb_rate_limit_per_sec,
+                burst=settings.tmdb_rate_limit_burst,
+                max_concurrency=settings.tmdb_max_concurrency,
+            ),
+            breaker=CircuitBreaker(
+                "tmdb",
+                failure_threshold=settings.tmdb_circuit_failure_threshold,
+                reset_timeout_sec=settings.tmdb_circuit_reset_timeout_sec,
+            ),
+            retry_policies={
+                "search": _tmdb_retry("tmdb.search", settings.tmdb_retry_interactive_deadline_sec),
+                "details": _tmdb_retry("tmdb.details", settings.tmdb_retry_interactive_deadline_sec),
+                "recommendations": _tmdb_retry(
+                    "tmdb.recommendations", settings.tmdb_retry_background_deadline_sec
+                ),
+            },
+        )
+    return _tmdb_search
+
+
+def _tmdb_retry(name: str, deadline_sec: float) -> RetryPolicy:
+    settings = get_settings()
+    return RetryPolicy(
+        name,
+        max_attempts=settings.tmdb_retry_max_attempts,
+        base_delay_sec=settings.tmdb_retry_base_delay_sec,
+        max_delay_sec=settings.tmdb_retry_max_delay_sec,
+        deadline_sec=deadline_sec,
+    )
+
+
+def get_film_search() -> BaseFilmSearchProvider:
+    """Провайдер для хендлеров: TMDB за кэшем поиска (память) и карточек (БД)."""
+    global _film_search
+    if _film_search is None:
+        from app.db.database import async_session_maker
+
+        settings = get_settings()
+        _film_search = CachedFilmSearch(
+            get_tmdb_search(),
+            async_session_maker,
+            details_fresh_ttl=timedelta(hours=settings.tmdb_details_cache_ttl_hours),
+            details_stale_ttl=timedelta(hours=settings.tmdb_details_cache_stale_hours),
+            search_cache_size=settings.tmdb_search_cache_size,
+            search_cache_ttl_sec=settings.tmdb_search_cache_ttl_sec,
+            search_negative_ttl_sec=settings.tmdb_search_negative_ttl_sec,
+            language=TMDBFilmSearch.DETAILS_LANGUAGE,
+        )
+    return _film_search
+
+
+def get_prowlarr_service() -> ProwlarrService:
+    """Prowlarr с общим single-flight для одинаковых поисков и повторами GET."""
+    global _prowlarr
+    if _prowlarr is None:
+        settings = get_settings()
+        _prowlarr = ProwlarrService(
+            base_url=settings.prowlarr_url,
+            api_key=settings.prowlarr_api_key,
+            search_retry=RetryPolicy(
+                "prowlarr.search",
+                max_attempts=settings.prowlarr_retry_max_attempts,
+                deadline_sec=settings.prowlarr_retry_deadline_sec,
+                retry_on_timeout=False,
+            ),
+            download_retry=RetryPolicy(
+                "prowlarr.download",
+                max_attempts=settings.prowlarr_retry_max_attempts,
+                deadline_sec=settings.prowlarr_retry_deadline_sec,
+            ),
+            indexer_timeout_sec=settings.prowlarr_indexer_timeout_sec,
+            indexers_ttl_sec=settings.prowlarr_indexers_ttl_sec,
+            scoring=settings.release_scoring,
+            candidate_pool=settings.prowlarr_candidate_pool,
+            max_torrent_bytes=int(settings.torrent_file_max_mb * 1024 * 1024),
+        )
+    return _prowlarr
+
+
+def get_torrent_search_cache() -> TorrentSearchCache:
+    """Кэш результатов поиска раздач в БД (переживает перезапуск)."""
+    global _torrent_search_cache
+    if _torrent_search_cache is None:
+        from app.db.database import async_session_maker
+
+        _torrent_search_cache = TorrentSearchCache(
+            async_session_maker,
+            ttl=timedelta(hours=get_settings().torrent_search_cache_ttl_hours),
+        )
+    return _torrent_search_cache
+
+
+def get_torrent_list_store() -> TorrentListStore:
+    """Списки раздач под сообщениями (память + опционально БД)."""
+    global _torrent_lists
+    if _torrent_lists is None:
+        from app.db.database import async_session_maker
+
+        settings = get_settings()
+        _torrent_lists = TorrentListStore(
+            maxsize=settings.torrent_list_cache_size,
+            ttl=timedelta(hours=settings.torrent_list_ttl_hours),
+            session_factory=async_session_maker if settings.torrent_list_persist else None,
+            persist_ttl=timedelta(days=settings.torrent_list_persist_days),
+        )
+    return _torrent_lists
+
+
+def get_torrent_file_cache() -> TorrentFileCache:
+    """.torrent по info-hash: file_id Telegram в БД, байты на диске."""
+    global _torrent_files
+    if _torrent_files is None:
+        from app.db.database import async_session_maker
+
+        settings = get_settings()
+        _torrent_files = TorrentFileCache(
+            directory=settings.torrent_file_cache_dir,
+            max_bytes=int(settings.torrent_file_cache_max_mb * 1024 * 1024),
+            session_factory=async_session_maker,
+        )
+    return _torrent_files
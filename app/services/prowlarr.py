@@ -1,33 +1,97 @@
 """Prowlarr API service for torrent search."""
 
+import asyncio
 import logging
-import re
+import time
+from collections.abc import AsyncIterator
 from typing import Optional
 import httpx
 
 from app.services.dto import TorrentResult
+from app.services.http_clients import get_http_clients
+from app.utils.release import ReleaseScoring, parse_release
+from app.utils.retry import RetryPolicy
+from app.utils.single_flight import SingleFlight
 
 
 logger = logging.getLogger(__name__)
 
 
+class _TorrentTooLarge(Exception):
+    """.torrent больше max_torrent_bytes — ответ индексатора не похож на торрент-файл."""
+
+
 class ProwlarrService:
     """Service for interacting with Prowlarr API."""
     
-    def __init__(self, base_url: str, api_key: str):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        client: Optional[httpx.AsyncClient] = None,
+        search_retry: Optional[RetryPolicy] = None,
+        download_retry: Optional[RetryPolicy] = None,
+        indexer_timeout_sec: float = 30.0,
+        indexers_ttl_sec: float = 300.0,
+        scoring: Optional[ReleaseScoring] = None,
+        candidate_pool: int = 100,
+        max_torrent_bytes: int = 10 * 1024 * 1024,
+    ):
         """Initialize Prowlarr service.
         
         Args:
             base_url: Prowlarr base URL (e.g., http://prowlarr:9696)
             api_key: Prowlarr API key
+            client: Pooled HTTP client; defaults to the shared Prowlarr pool
+                (timeout 90 s — поиск по нескольким индексам может занимать 60–90+ сек)
+            search_retry: Retry policy for GET /api/v1/search (None — one attempt)
+            download_retry: Retry policy for .torrent downloads (None — one attempt)
+            indexer_timeout_sec: Per-indexer timeout of the parallel search
+            indexers_ttl_sec: How long the enabled indexer list is reused
+            scoring: Release ranking weights (defaults of ReleaseScoring)
+            candidate_pool: Releases requested from Prowlarr before ranking;
+                the display limit is applied only after scoring
+            max_torrent_bytes: Larger .torrent downloads are aborted mid-stream
         """
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
-        # Поиск по нескольким индексам в Prowlarr может занимать 60–90+ сек
-        self.timeout = 90.0
+        self._client = client
+        self._search_retry = search_retry
+        self._download_retry = download_retry
+        # Одинаковые поиски («Скачать» у нескольких участников) ждут один ответ Prowlarr
+        self._flight: SingleFlight[tuple[str, int], list[TorrentResult]] = SingleFlight("prowlarr")
+        # То же для параллельного поиска — по (запрос, индексатор, лимит)
+        self._indexer_flight: SingleFlight[tuple[str, int, int], list[TorrentResult]] = (
+            SingleFlight("prowlarr.indexer")
+        )
+        self._indexer_timeout_sec = indexer_timeout_sec
+        self._indexers_ttl_sec = indexers_ttl_sec
+        self._indexers: list[tuple[int, str]] = []
+        self._indexers_fetched_at: Optional[float] = None
+        self._scoring = scoring or ReleaseScoring()
+        self._candidate_pool = candidate_pool
+        self._max_torrent_bytes = max_torrent_bytes
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Long-lived pooled client (keep-alive between searches and downloads)."""
+        return self._client or get_http_clients().prowlarr
 
-    async def _search_raw_releases(self, query: str, limit: int = 100) -> list[dict]:
-        """Perform raw interactive search in Prowlarr."""
+    async def _get_with_retry(
+        self, policy: Optional[RetryPolicy], url: str, **kwargs
+    ) -> httpx.Response:
+        """Idempotent GET, retried on transient errors when a policy is set."""
+        if policy is None:
+            return await self.client.get(url, **kwargs)
+        return await policy.run(lambda: self.client.get(url, **kwargs))
+
+    async def _search_raw_releases(
+        self,
+        query: str,
+        limit: int = 100,
+        indexer_ids: Optional[list[int]] = None,
+    ) -> list[dict]:
+        """Perform raw interactive search in Prowlarr (all indexers or given ones)."""
         params = [
             ("query", query),
             ("type", "search"),
@@ -35,86 +99,30 @@ class ProwlarrService:
             ("categories", "5000"),  # TV
             ("limit", str(limit)),
         ]
+        params.extend(("indexerIds", str(indexer_id)) for indexer_id in indexer_ids or [])
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(
-                f"{self.base_url}/api/v1/search",
-                params=params,
-                headers={"X-Api-Key": self.api_key},
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data if isinstance(data, list) else []
+        response = await self._get_with_retry(
+            self._search_retry,
+            f"{self.base_url}/api/v1/search",
+            params=params,
+            headers={"X-Api-Key": self.api_key},
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data if isinstance(data, list) else []
 
     async def _push_release(self, guid: str, indexer_id: int) -> httpx.Response:
         """Push single release to Prowlarr download client pipeline."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            return await client.post(
-                f"{self.base_url}/api/v1/search/bulk",
-                json=[{
-                    "guid": guid,
-                    "indexerId": indexer_id
-                }],
-                headers={
-                    "X-Api-Key": self.api_key
-                }
-            )
-    
-    def _extract_resolution(self, title: str) -> Optional[str]:
-        """Extract resolution from release title.
-        
-        Args:
-            title: Release title
-            
-        Returns:
-            Resolution string (e.g., '1080p', '2160p') or None
-        """
-        # Normalize title to uppercase for easier matching
-        title_upper = title.upper()
-        
-        # Check for 4K / 2160p
-        if re.search(r'\b(2160P|4K|UHD)\b', title_upper):
-            return '2160p'
-        
-        # Check for 1080p
-        if re.search(r'\b(1080P|FULLHD|FHD|1920X1080)\b', title_upper):
-            return '1080p'
-        
-        # Check for 720p
-        if re.search(r'\b(720P|HD|1280X720)\b', title_upper):
-            return '720p'
-        
-        # Check for 480p / SD
-        if re.search(r'\b(480P|SD|DVD)\b', title_upper):
-            return '480p'
-        
-        return None
-    
-    def _filter_by_quality(self, torrents: list[TorrentResult]) -> list[TorrentResult]:
-        """Filter torrents to keep only 720p and higher.
-        
-        Args:
-            torrents: List of torrent results
-            
-        Returns:
-            Filtered list
-        """
-        quality_order = {'2160p': 3, '1080p': 2, '720p': 1, '480p': 0}
-        min_quality = quality_order.get('720p', 1)  # Changed to 720p minimum
-        
-        filtered = []
-        for torrent in torrents:
-            # If resolution is not detected, include it by default
-            # (it might be HD but we couldn't parse it from the title)
-            if not torrent.resolution:
-                filtered.append(torrent)
-            else:
-                quality = quality_order.get(torrent.resolution, 2)  # Default to 1080p if unknown
-                if quality >= min_quality:
-                    filtered.append(torrent)
-        
-        logger.info(f"Filtered: {len(filtered)}/{len(torrents)} torrents passed (min quality: 720p)")
-        return filtered
+        return await self.client.post(
+            f"{self.base_url}/api/v1/search/bulk",
+            json=[{
+                "guid": guid,
+                "indexerId": indexer_id
+            }],
+            headers={
+                "X-Api-Key": self.api_key
+            }
+        )
     
     async def search_torrents(
         self,
@@ -124,66 +132,35 @@ class ProwlarrService:
     ) -> list[TorrentResult]:
         """Search for torrents using Prowlarr.
         
+        Concurrent searches for the same query share one Prowlarr request.
+        
         Args:
             title: Film title
             year: Release year
             limit: Maximum number of results to return
             
         Returns:
-            List of torrent results sorted by seeders (descending)
+            List of torrent results ranked by score, seeders breaking ties (descending)
         """
         # Build search query
         query = title
         if year:
             query = f"{title} {year}"
         
+        torrents = await self._flight.do(
+            (query, limit),
+            lambda: self._search_torrents(query, limit),
+        )
+        return list(torrents)
+    
+    async def _search_torrents(self, query: str, limit: int) -> list[TorrentResult]:
+        """Single Prowlarr search: parse, filter by quality, rank by score (seeders break ties)."""
         logger.info(f"Searching Prowlarr for: {query}")
         
         try:
-            data = await self._search_raw_releases(query, limit=limit)
+            data = await self._search_raw_releases(query, limit=max(limit, self._candidate_pool))
             logger.info(f"Prowlarr returned {len(data)} results")
-                
-            # Parse results
-            torrents = []
-            for item in data:
-                # Extract download link (magnet or torrent file URL)
-                download_link = None
-                
-                if item.get("magnetUrl"):
-                    download_link = item["magnetUrl"]
-                elif item.get("downloadUrl"):
-                    download_link = item["downloadUrl"]
-                
-                if not download_link:
-                    continue
-                
-                # Extract resolution
-                title_str = item.get("title", "")
-                resolution = self._extract_resolution(title_str)
-                
-                torrent = TorrentResult(
-                    guid=item.get("guid", ""),
-                    indexer_id=item.get("indexerId", 0),
-                    title=title_str,
-                    indexer=item.get("indexer", "Unknown"),
-                    size=item.get("size", 0),
-                    seeders=item.get("seeders", 0),
-                    magnet_url=download_link,
-                    resolution=resolution,
-                    info_url=item.get("infoUrl"),
-                    search_query=query,
-                )
-                
-                torrents.append(torrent)
-            
-            # Filter by quality (1080p+)
-            torrents = self._filter_by_quality(torrents)
-            
-            # Sort by seeders (descending)
-            torrents.sort(key=lambda x: x.seeders, reverse=True)
-            
-            # Limit results
-            result = torrents[:limit]
+            result = self._rank(self._parse_releases(data, query), limit)
             
             logger.info(
                 f"Returning {len(result)} torrents (filtered and sorted)"
@@ -192,14 +169,192 @@ class ProwlarrService:
             return result
                 
         except httpx.HTTPError as e:
-            msg = str(e) or repr(e)
-            if isinstance(e, httpx.HTTPStatusError):
-                msg = f"status={e.response.status_code} body={e.response.text[:200]!r}"
-            logger.error("Prowlarr API error: %s", msg)
+            logger.error("Prowlarr API error: %s", self._describe_error(e))
             return []
         except Exception as e:
             logger.error(f"Unexpected error searching Prowlarr: {e}")
             return []
+
+    async def search_torrents_progressive(
+        self,
+        title: str,
+        year: Optional[int] = None,
+        limit: int = 10,
+    ) -> AsyncIterator[list[TorrentResult]]:
+        """Search every enabled indexer in parallel, yielding the growing ranked list.
+
+        Each indexer gets its own request (indexerIds) and timeout, so the first
+        list arrives as soon as the fastest indexer answers. A new snapshot is
+        yielded whenever an indexer adds releases; a slow or failing indexer is
+        logged and skipped. Without an indexer list falls back to one aggregate
+        search.
+
+        Args:
+            title: Film title
+            year: Release year
+            limit: Maximum number of results per snapshot
+
+        Yields:
+            Ranked (filtered, by score, then seeders) snapshots of results so far
+        """
+        query = f"{title} {year}" if year else title
+        indexers = await self._get_indexers()
+        if not indexers:
+            yield await self.search_torrents(title, year, limit)
+            return
+
+        logger.info("Searching Prowlarr for: %s (%d indexers in parallel)", query, len(indexers))
+        started = time.monotonic()
+        tasks = {
+            asyncio.create_task(self._search_indexer(query, indexer_id, name, limit)): name
+            for indexer_id, name in indexers
+        }
+        found: dict[tuple[int, str], TorrentResult] = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                torrents = await next_done
+                added = 0
+                for torrent in torrents:
+                    key = (torrent.indexer_id, torrent.guid)
+                    if key not in found:
+                        found[key] = torrent
+                        added += 1
+                if added:
+                    yield self._rank(list(found.values()), limit)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(
+            "Prowlarr parallel search '%s' finished in %.1fs: %d releases",
+            query,
+            time.monotonic() - started,
+            len(found),
+        )
+
+    async def _search_indexer(
+        self, query: str, indexer_id: int, name: str, limit: int
+    ) -> list[TorrentResult]:
+        """One indexer; concurrent identical searches share one request to it."""
+        torrents = await self._indexer_flight.do(
+            (query, indexer_id, limit),
+            lambda: self._fetch_indexer(query, indexer_id, name, limit),
+        )
+        return list(torrents)
+
+    async def _fetch_indexer(
+        self, query: str, indexer_id: int, name: str, limit: int
+    ) -> list[TorrentResult]:
+        """One indexer with its own timeout; any error gives an empty list."""
+        started = time.monotonic()
+        try:
+            data = await asyncio.wait_for(
+                self._search_raw_releases(
+                    query, limit=max(limit, self._candidate_pool), indexer_ids=[indexer_id]
+                ),
+                self._indexer_timeout_sec,
+            )
+            torrents = self._parse_releases(data, query)
+        except TimeoutError:
+            logger.warning(
+                "Prowlarr indexer %s: no answer in %.0fs, skipped", name, self._indexer_timeout_sec
+            )
+            return []
+        except httpx.HTTPError as e:
+            logger.warning("Prowlarr indexer %s error: %s", name, self._describe_error(e))
+            return []
+        except Exception as e:
+            # Битый JSON или неожиданный формат одного индексатора не рушит весь поиск
+            logger.warning("Prowlarr indexer %s: unexpected error: %r", name, e)
+            return []
+        logger.info(
+            "Prowlarr indexer %s: %d results in %.1fs", name, len(data), time.monotonic() - started
+        )
+        return torrents
+
+    async def _get_indexers(self) -> list[tuple[int, str]]:
+        """Enabled indexers (id, name), cached for indexers_ttl_sec; [] on error."""
+        now = time.monotonic()
+        if (
+            self._indexers_fetched_at is not None
+            and now - self._indexers_fetched_at < self._indexers_ttl_sec
+        ):
+            return self._indexers
+        try:
+            response = await self._get_with_retry(
+                self._search_retry,
+                f"{self.base_url}/api/v1/indexer",
+                headers={"X-Api-Key": self.api_key},
+            )
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning("Prowlarr indexer list unavailable: %s", e)
+            return []
+        self._indexers = [
+            (item["id"], item.get("name") or str(item["id"]))
+            for item in (data if isinstance(data, list) else [])
+            if item.get("enable", True) and item.get("id") is not None
+        ]
+        self._indexers_fetched_at = now
+        return self._indexers
+
+    def _parse_releases(self, data: list[dict], query: str) -> list[TorrentResult]:
+        """Prowlarr releases → scored TorrentResult.
+
+        Items without a link and releases rejected by the scoring (below the
+        minimal resolution, CAM) are skipped.
+        """
+        torrents = []
+        rejected = 0
+        for item in data:
+            # Extract download link (magnet or torrent file URL)
+            download_link = item.get("magnetUrl") or item.get("downloadUrl")
+            if not download_link:
+                continue
+            
+            title_str = item.get("title", "")
+            size = item.get("size", 0)
+            seeders = item.get("seeders", 0)
+            info = parse_release(title_str, size)
+            if not self._scoring.accepts(info):
+                rejected += 1
+                continue
+            torrents.append(
+                TorrentResult(
+                    guid=item.get("guid", ""),
+                    indexer_id=item.get("indexerId", 0),
+                    title=title_str,
+                    indexer=item.get("indexer", "Unknown"),
+                    size=size,
+                    seeders=seeders,
+                    magnet_url=download_link,
+                    resolution=info.resolution,
+                    tags=info.tags,
+                    score=self._scoring.score(info, seeders, size),
+                    info_url=item.get("infoUrl"),
+                    info_hash=item.get("infoHash") or None,
+                    search_query=query,
+                )
+            )
+        if rejected:
+            logger.info(
+                "Filtered: %d/%d releases passed (min quality: %s)",
+                len(torrents),
+                len(torrents) + rejected,
+                self._scoring.min_resolution,
+            )
+        return torrents
+
+    def _rank(self, torrents: list[TorrentResult], limit: int) -> list[TorrentResult]:
+        """Best `limit` releases by score (seeders break ties)."""
+        return sorted(torrents, key=lambda t: (t.score, t.seeders), reverse=True)[:limit]
+
+    @staticmethod
+    def _describe_error(e: httpx.HTTPError) -> str:
+        if isinstance(e, httpx.HTTPStatusError):
+            return f"status={e.response.status_code} body={e.response.text[:200]!r}"
+        return str(e) or repr(e)
     
     async def push_to_download_client(
         self,
@@ -299,6 +454,40 @@ class ProwlarrService:
             logger.error(f"Unexpected error pushing to download client: {e}")
             return False
     
+    async def _fetch_torrent(self, download_url: str) -> httpx.Response:
+        """GET без перехода по редиректам; тело читается потоком не больше max_torrent_bytes.
+
+        Редирект или ошибка возвращаются без чтения тела. Успешный ответ — новый
+        Response с уже распакованным телом (без Content-Encoding/Length).
+
+        Raises:
+            _TorrentTooLarge: тело больше предела (по Content-Length или по факту)
+        """
+        async with self.client.stream("GET", download_url, follow_redirects=False) as response:
+            if response.is_redirect or response.is_error:
+                return response
+            declared = response.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > self._max_torrent_bytes:
+                raise _TorrentTooLarge(f"Content-Length {declared} > {self._max_torrent_bytes}")
+            chunks = []
+            received = 0
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > self._max_torrent_bytes:
+                    raise _TorrentTooLarge(f"body exceeds {self._max_torrent_bytes} bytes")
+                chunks.append(chunk)
+        headers = [
+            (name, value)
+            for name, value in response.headers.multi_items()
+            if name.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        return httpx.Response(
+            response.status_code,
+            headers=headers,
+            content=b"".join(chunks),
+            request=response.request,
+        )
+
     async def download_torrent_file(
         self,
         download_url: str
@@ -317,30 +506,34 @@ class ProwlarrService:
         logger.info(f"Downloading torrent file from: {download_url[:60]}...")
         
         try:
-            async with httpx.AsyncClient(
-                timeout=self.timeout,
-                follow_redirects=False  # Don't follow redirects automatically
-            ) as client:
-                response = await client.get(download_url)
-                
-                # Check if it's a redirect to magnet link
-                if response.status_code in (301, 302, 303, 307, 308):
-                    redirect_url = response.headers.get("Location", "")
-                    if redirect_url.startswith("magnet:"):
-                        logger.info(f"Download URL redirects to magnet link")
-                        return (None, redirect_url)
-                
-                response.raise_for_status()
-                
-                # Check if response is actually a torrent file
-                content_type = response.headers.get("content-type", "")
-                if "torrent" in content_type or response.content.startswith(b"d8:announce"):
-                    logger.info(f"Successfully downloaded torrent file ({len(response.content)} bytes)")
-                    return (response.content, None)
-                else:
-                    logger.warning(f"Response doesn't look like a torrent file (content-type: {content_type})")
-                    return (None, None)
+            if self._download_retry is None:
+                response = await self._fetch_torrent(download_url)
+            else:
+                response = await self._download_retry.run(
+                    lambda: self._fetch_torrent(download_url)
+                )
+            
+            # Check if it's a redirect to magnet link
+            if response.status_code in (301, 302, 303, 307, 308):
+                redirect_url = response.headers.get("Location", "")
+                if redirect_url.startswith("magnet:"):
+                    logger.info(f"Download URL redirects to magnet link")
+                    return (None, redirect_url)
+            
+            response.raise_for_status()
+            
+            # Check if response is actually a torrent file
+            content_type = response.headers.get("content-type", "")
+            if "torrent" in content_type or response.content.startswith(b"d8:announce"):
+                logger.info(f"Successfully downloaded torrent file ({len(response.content)} bytes)")
+                return (response.content, None)
+            else:
+                logger.warning(f"Response doesn't look like a torrent file (content-type: {content_type})")
+                return (None, None)
                 
+        except _TorrentTooLarge as e:
+            logger.warning("Torrent download aborted: %s", e)
+            return (None, None)
         except httpx.HTTPError as e:
             logger.error(f"Error downloading torrent file: {e}")
             return (None, None)
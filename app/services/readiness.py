@@ -0,0 +1,188 @@
+"""Готовность внешних зависимостей (TMDB, Prowlarr, БД).
+
+Проверки запускаются в фоне после старта polling и не задерживают обработку
+апдейтов; результат — в логах, метриках readiness.<name> (1/0) и в `readiness`.
+Фоновая работа (тик кэша рекомендаций, предварительный поиск раздач) спрашивает
+`ensure_ready` и пропускается, пока зависимость недоступна; неуспешная проверка
+повторяется не чаще readiness_recheck_sec, так что после восстановления работа
+возобновляется сама. Хендлеры пользователей не блокируются.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+
+import httpx
+from pydantic import BaseModel
+from sqlalchemy import text
+
+from app.config import Settings, get_settings
+from app.services.http_clients import get_http_clients
+from app.services.metrics import metrics
+from app.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyStatus(BaseModel):
+    """Результат последней проверки зависимости."""
+
+    ok: bool
+    detail: str = ""
+    duration_sec: float = 0.0
+    checked_at: datetime
+
+
+class Readiness:
+    """Последний статус каждой зависимости; None — ещё не проверяли."""
+
+    def __init__(self) -> None:
+        self._status: dict[str, DependencyStatus] = {}
+
+    def set(self, name: str, ok: bool, detail: str = "", duration_sec: float = 0.0) -> None:
+        self._status[name] = DependencyStatus(
+            ok=ok, detail=detail, duration_sec=duration_sec, checked_at=datetime.utcnow()
+        )
+        metrics.set_gauge(f"readiness.{name}", 1 if ok else 0)
+
+    def get(self, name: str) -> DependencyStatus | None:
+        return self._status.get(name)
+
+    def is_ready(self, name: str) -> bool:
+        status = self._status.get(name)
+        return status is not None and status.ok
+
+    def snapshot(self) -> dict[str, DependencyStatus]:
+        return dict(self._status)
+
+    def clear(self) -> None:
+        self._status.clear()
+
+
+readiness = Readiness()
+
+
+async def probe_tmdb(settings: Settings) -> str:
+    """GET /configuration через общий пул TMDB (прокси из настроек)."""
+    if settings.proxy_url:
+        logger.info("TMDB probe: через прокси %s", settings.proxy_url)
+    response = await get_http_clients().tmdb.get(
+        "https://api.themoviedb.org/3/configuration",
+        headers={
+            "Authorization": f"Bearer {settings.tmdb_api_key}",
+            "accept": "application/json",
+        },
+    )
+    if response.status_code in (401, 403):
+        raise RuntimeError(f"HTTP {response.status_code}: проверьте TMDB_API_KEY")
+    response.raise_for_status()
+    return "ok"
+
+
+async def probe_prowlarr(settings: Settings) -> str:
+    response = await get_http_clients().prowlarr.get(
+        f"{settings.prowlarr_url.rstrip('/')}/api/v1/health",
+        headers={"X-Api-Key": settings.prowlarr_api_key},
+    )
+    response.raise_for_status()
+    issues = response.json() if response.content else []
+    return f"ok, предупреждений: {len(issues)}" if isinstance(issues, list) else "ok"
+
+
+async def probe_database(settings: Settings) -> str:
+    from app.db.database import async_session_maker
+
+    async with async_session_maker() as session:
+        await session.execute(text("SELECT 1"))
+    return "ok"
+
+
+PROBES: dict[str, Callable[[Settings], Awaitable[str]]] = {
+    "tmdb": probe_tmdb,
+    "prowlarr": probe_prowlarr,
+    "database": probe_database,
+}
+
+
+async def _run_probe(
+    name: str,
+    probe: Callable[[Settings], Awaitable[str]],
+    settings: Settings,
+    timeout_sec: float,
+    state: Readiness,
+) -> None:
+    started = time.monotonic()
+    try:
+        detail = await asyncio.wait_for(probe(settings), timeout_sec)
+    except Exception as e:
+        duration = time.monotonic() - started
+        detail = (
+            f"нет ответа за {timeout_sec:.0f}s"
+            if isinstance(e, TimeoutError)
+            else f"{type(e).__name__}: {e}"
+        )
+        if isinstance(e, httpx.ConnectError):
+            detail += " (проверьте сеть/DNS/прокси)"
+        state.set(name, False, detail, duration)
+        logger.error("❌ %s недоступен (%.2fs): %s", name, duration, detail)
+        return
+    duration = time.monotonic() - started
+    state.set(name, True, detail, duration)
+    logger.info("✅ %s доступен (%.2fs): %s", name, duration, detail)
+
+
+async def run_startup_probes(
+    settings: Settings | None = None,
+    *,
+    probes: dict[str, Callable[[Settings], Awaitable[str]]] | None = None,
+    state: Readiness | None = None,
+) -> Readiness:
+    """Проверить все зависимости параллельно, каждую — не дольше startup_probe_timeout_sec."""
+    settings = settings or get_settings()
+    state = state or readiness
+    await asyncio.gather(
+        *(
+            _run_probe(name, probe, settings, settings.startup_probe_timeout_sec, state)
+            for name, probe in (probes or PROBES).items()
+        )
+    )
+    return state
+
+
+# Одновременные ensure_ready одной зависимости ждут одну повторную проверку
+_recheck: SingleFlight[str, None] = SingleFlight("readiness")
+
+
+async def ensure_ready(
+    name: str,
+    settings: Settings | None = None,
+    *,
+    probes: dict[str, Callable[[Settings], Awaitable[str]]] | None = None,
+    state: Readiness | None = None,
+    clock: Callable[[], datetime] = datetime.utcnow,
+) -> bool:
+    """Можно ли сейчас нагружать зависимость фоновой работой.
+
+    True — последняя проверка успешна или проверок ещё не было (не блокируем до
+    первой). После неуспешной проверки старше readiness_recheck_sec зависимость
+    перепроверяется; до тех пор — False.
+    """
+    state = state or readiness
+    status = state.get(name)
+    if status is None or status.ok:
+        return True
+    settings = settings or get_settings()
+    age = (clock() - status.checked_at).total_seconds()
+    if age < settings.readiness_recheck_sec:
+        return False
+    probe = (probes or PROBES).get(name)
+    if probe is None:
+        return False
+    await _recheck.do(
+        name,
+        lambda: _run_probe(name, probe, settings, settings.startup_probe_timeout_sec, state),
+    )
+    return state.is_ready(name)
+
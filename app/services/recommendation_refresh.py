@@ -1,81 +1,309 @@
-"""Фоновое обновление кэша film_recommendation_cache."""
+"""Фоновое обновление кэша рекомендаций (film_recommendation_sources и recommended_film_cards)."""
 
 import asyncio
+import contextlib
 import logging
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
 
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import Film
+from app.db.models import Film, FilmRecommendationSource
 from app.db.repositories import FilmRecommendationCacheRepository, GroupFilmRepository
-from app.services.tmdb import TMDBFilmSearch
+from app.services.base import BaseFilmSearchProvider
+from app.services.dto import FilmSearchResult
+from app.services.metrics import metrics
+from app.utils.background import BackgroundTasks, background_tasks
+from app.utils.rate_limiter import background_priority
 
 logger = logging.getLogger(__name__)
 
-# В кэш кладём только верхушку списка TMDB — хвост даёт шум и «одинаковые блокбастеры».
+# По умолчанию в кэш кладём только верхушку списка TMDB — хвост даёт шум и «одинаковые
+# блокбастеры»; глубину задают recommendation_pages / recommendation_max_per_source.
 MAX_RECOMMENDATIONS_PER_SOURCE = 15
 
+# Одновременных «затравок» кэша по событиям (добавили/посмотрели) — recommendation_prime_concurrency
+_prime_semaphore: asyncio.Semaphore | None = None
+
+
+class FailureBackoff(BaseModel):
+    """Пауза перед повтором источника после ошибки TMDB (удваивается с каждой ошибкой подряд)."""
+
+    backoff: timedelta = timedelta(hours=1)
+    max_backoff: timedelta = timedelta(days=7)
+    # После стольких ошибок подряд внеочередной запрос (requested_at) снимается
+    max_failures: int = 3
+
+
+class RecommendationRefreshReport(BaseModel):
+    """Итог прогона обновления кэша рекомендаций."""
+
+    total: int = 0
+    updated: int = 0
+    failed: int = 0
+    skipped_non_tmdb: int = 0
+    duration_sec: float = 0.0
+
+    @property
+    def sources_per_sec(self) -> float:
+        processed = self.updated + self.failed
+        return processed / self.duration_sec if self.duration_sec > 0 else 0.0
+
 
 async def refresh_recommendation_cache_for_all_sources(
     session: AsyncSession,
-    search: TMDBFilmSearch,
-    delay_between_requests_sec: float = 0.35,
-) -> tuple[int, int]:
+    search: BaseFilmSearchProvider,
+    *,
+    concurrency: int = 4,
+    batch_size: int = 50,
+    pages: int = 1,
+    max_per_source: int = MAX_RECOMMENDATIONS_PER_SOURCE,
+) -> RecommendationRefreshReport:
     """
-    Для каждого film_id из group_films (уникально) подтянуть recommendations в кэш.
+    Для каждого фильма из group_films (уникально) подтянуть recommendations в кэш.
 
-    Returns:
-        (обработано источников, пропущено из-за ошибок TMDB)
+    Фильмы загружаются одним запросом; запросы к TMDB выполняют `concurrency` воркеров
+    (темп задаёт общий rate limiter, полоса — фоновая), а запись в БД идёт в этой
+    корутине пачками по `batch_size` источников — по транзакции на пачку.
     """
-    gf_repo = GroupFilmRepository(session)
-    cache_repo = FilmRecommendationCacheRepository(session)
-    film_ids = await gf_repo.distinct_film_ids_in_use()
-    ok = 0
-    failed = 0
-    skipped_non_tmdb = 0
-
+    films = await GroupFilmRepository(session).distinct_films_in_use()
     logger.info(
-        "recommendation cache refresh: уникальных film_id в списках групп: %s",
-        len(film_ids),
+        "recommendation cache refresh: уникальных фильмов в списках групп: %s (воркеров: %s)",
+        len(films),
+        concurrency,
     )
-    if not film_ids:
+    if not films:
         logger.info(
             "recommendation cache refresh: нечего обновлять — в group_films нет записей"
         )
-        return 0, 0
+        return RecommendationRefreshReport()
+    return await _refresh_sources(
+        session,
+        search,
+        films,
+        concurrency=concurrency,
+        batch_size=batch_size,
+        pages=pages,
+        max_per_source=max_per_source,
+    )
 
-    for fid in film_ids:
-        film = await session.get(Film, fid)
-        if not film:
-            continue
+
+async def refresh_due_recommendation_sources(
+    session: AsyncSession,
+    search: BaseFilmSearchProvider,
+    *,
+    ttl: timedelta,
+    limit: int,
+    concurrency: int = 4,
+    batch_size: int = 50,
+    pages: int = 1,
+    max_per_source: int = MAX_RECOMMENDATIONS_PER_SOURCE,
+    failure_policy: FailureBackoff | None = None,
+) -> RecommendationRefreshReport:
+    """
+    Инкрементальный тик: обновить не больше `limit` источников, которым это нужно —
+    запрошенные вне очереди (добавили/посмотрели), ни разу не загруженные,
+    затем те, чей fetched_at старше `ttl`. Ошибка TMDB ставит источник на паузу
+    (failure_policy), чтобы вечно падающие id не занимали каждый тик.
+    """
+    films = await FilmRecommendationCacheRepository(session).due_source_films(
+        stale_before=datetime.utcnow() - ttl,
+        limit=limit,
+    )
+    if not films:
+        return RecommendationRefreshReport()
+    logger.info(
+        "recommendation cache tick: к обновлению %s источников (лимит %s)",
+        len(films),
+        limit,
+    )
+    return await _refresh_sources(
+        session,
+        search,
+        films,
+        concurrency=concurrency,
+        batch_size=batch_size,
+        pages=pages,
+        max_per_source=max_per_source,
+        failure_policy=failure_policy,
+    )
+
+
+async def _refresh_sources(
+    session: AsyncSession,
+    search: BaseFilmSearchProvider,
+    films: list[Film],
+    *,
+    concurrency: int,
+    batch_size: int,
+    pages: int,
+    max_per_source: int,
+    failure_policy: FailureBackoff | None = None,
+) -> RecommendationRefreshReport:
+    failure_policy = failure_policy or FailureBackoff()
+    started = time.monotonic()
+    report = RecommendationRefreshReport(total=len(films))
+
+    sources: list[tuple[int, str, str]] = []
+    for film in films:
         if (film.source or "").lower() != "tmdb":
-            skipped_non_tmdb += 1
+            report.skipped_non_tmdb += 1
             continue
         media_type = (film.media_type or "movie").strip() or "movie"
-        recs = await search.fetch_recommendations(film.external_id, media_type)
+        sources.append((film.id, film.external_id, media_type))
+
+    work: asyncio.Queue[tuple[int, str, str]] = asyncio.Queue()
+    for item in sources:
+        work.put_nowait(item)
+    results: asyncio.Queue[tuple[int, str, str, list[FilmSearchResult] | None]] = asyncio.Queue()
+
+    async def worker() -> None:
+        while True:
+            try:
+                fid, external_id, media_type = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                recs = await search.fetch_recommendations(external_id, media_type, pages)
+            except Exception:
+                logger.exception("recommendation cache: film_id=%s — ошибка запроса", fid)
+                recs = None
+            await results.put((fid, external_id, media_type, recs))
+
+    cache_repo = FilmRecommendationCacheRepository(session)
+    with background_priority():
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        pending_in_batch = 0
+        for _ in range(len(sources)):
+            fid, external_id, media_type, recs = await results.get()
+            if recs is None:
+                report.failed += 1
+                logger.warning(
+                    "recommendation cache: film_id=%s external_id=%s type=%s — TMDB error, старый кэш для источника не трогаем, повтор после паузы",
+                    fid,
+                    external_id,
+                    media_type,
+                )
+                await cache_repo.record_failure(
+                    fid,
+                    backoff=failure_policy.backoff,
+                    max_backoff=failure_policy.max_backoff,
+                    max_failures=failure_policy.max_failures,
+                )
+            else:
+                recs = recs[:max_per_source]
+                await cache_repo.replace_for_source(fid, recs)
+                report.updated += 1
+                if not recs:
+                    logger.debug(
+                        "recommendation cache: film_id=%s — TMDB вернул 0 рекомендаций, кэш очищен",
+                        fid,
+                    )
+            pending_in_batch += 1
+            if pending_in_batch >= batch_size:
+                await session.commit()
+                pending_in_batch = 0
+        if pending_in_batch:
+            await session.commit()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    report.duration_sec = time.monotonic() - started
+    metrics.set_gauge("recommendation_refresh.duration_sec", report.duration_sec)
+    metrics.set_gauge("recommendation_refresh.sources_per_sec", report.sources_per_sec)
+    logger.info(
+        "recommendation cache refresh finished: updated=%s failed_tmdb=%s skipped_non_tmdb=%s "
+        "duration=%.1fs throughput=%.2f sources/s",
+        report.updated,
+        report.failed,
+        report.skipped_non_tmdb,
+        report.duration_sec,
+        report.sources_per_sec,
+    )
+    return report
+
+
+async def prime_recommendations(
+    session_factory: Callable[[], AsyncSession],
+    search: BaseFilmSearchProvider,
+    film_id: int,
+    *,
+    pages: int = 1,
+    max_per_source: int = MAX_RECOMMENDATIONS_PER_SOURCE,
+    semaphore: asyncio.Semaphore | None = None,
+) -> bool:
+    """
+    Загрузить рекомендации одного фильма сразу после добавления/отметки «просмотрен»,
+    если их ещё нет в кэше. True — кэш записан.
+
+    Сессия не держится на время запроса к TMDB (лимитер и повторы — это секунды):
+    чтение и запись идут в отдельных коротких сессиях.
+    """
+    async with semaphore or contextlib.nullcontext():
+        async with session_factory() as session:
+            film = await session.get(Film, film_id)
+            if film is None or (film.source or "").lower() != "tmdb":
+                return False
+            state = await session.get(FilmRecommendationSource, film_id)
+            if state is not None and state.fetched_at is not None:
+                return False
+            external_id = film.external_id
+            media_type = (film.media_type or "movie").strip() or "movie"
+        with background_priority():
+            recs = await search.fetch_recommendations(external_id, media_type, pages)
         if recs is None:
-            failed += 1
-            logger.warning(
-                "recommendation cache: film_id=%s external_id=%s type=%s — TMDB error, старый кэш для источника не трогаем",
-                fid,
-                film.external_id,
-                media_type,
-            )
-            await asyncio.sleep(delay_between_requests_sec)
-            continue
-        recs = recs[:MAX_RECOMMENDATIONS_PER_SOURCE]
-        await cache_repo.replace_for_source(fid, recs)
-        ok += 1
-        if not recs:
-            logger.debug(
-                "recommendation cache: film_id=%s — TMDB вернул 0 рекомендаций, кэш очищен",
-                fid,
+            # Источник остаётся в очереди — его подберёт обычный тик
+            logger.info("recommendation prime: film_id=%s — TMDB error, оставляем тику", film_id)
+            return False
+        async with session_factory() as session:
+            await FilmRecommendationCacheRepository(session).replace_for_source(
+                film_id, recs[:max_per_source]
             )
-        await asyncio.sleep(delay_between_requests_sec)
+            await session.commit()
+    metrics.incr("recommendation_prime.updated")
+    logger.info("recommendation prime: film_id=%s — %s рекомендаций", film_id, len(recs))
+    return True
 
-    logger.info(
-        "recommendation cache refresh finished: updated=%s failed_tmdb=%s skipped_non_tmdb=%s",
-        ok,
-        failed,
-        skipped_non_tmdb,
+
+async def store_recommendations(
+    session: AsyncSession,
+    film_id: int,
+    recommendations: list[FilmSearchResult],
+    *,
+    max_per_source: int = MAX_RECOMMENDATIONS_PER_SOURCE,
+) -> None:
+    """Записать список, уже полученный вместе с деталями фильма, — без запроса к TMDB."""
+    await FilmRecommendationCacheRepository(session).replace_for_source(
+        film_id, recommendations[:max_per_source]
+    )
+    await session.commit()
+    metrics.incr("recommendation_prime.bundled")
+
+
+def schedule_recommendation_prime(film_id: int, tasks: BackgroundTasks | None = None) -> bool:
+    """Запустить prime_recommendations в фоне (одна задача на фильм одновременно)."""
+    from app.config import get_settings
+    from app.db.database import async_session_maker
+    from app.services.providers import get_tmdb_search
+
+    global _prime_semaphore
+    settings = get_settings()
+    if _prime_semaphore is None:
+        _prime_semaphore = asyncio.Semaphore(max(1, settings.recommendation_prime_concurrency))
+    return (tasks or background_tasks).spawn(
+        prime_recommendations(
+            async_session_maker,
+            get_tmdb_search(),
+            film_id,
+            pages=settings.recommendation_pages,
+            max_per_source=settings.recommendation_max_per_source,
+            semaphore=_prime_semaphore,
+        ),
+        key=("recommendations_prime", film_id),
+        name=f"recommendations-prime-{film_id}",
     )
-    return ok, failed
@@ -1,5 +1,6 @@
 """Подборка «похожих» по кэшу TMDB recommendations и просмотренным в группе."""
 
+import asyncio
 import logging
 from enum import Enum
 
@@ -30,9 +31,18 @@ class RelativeOutcome(BaseModel):
 
 
 class RecommendationService:
-    def __init__(self, session: AsyncSession, search: BaseFilmSearchProvider) -> None:
+    def __init__(
+        self,
+        session: AsyncSession,
+        search: BaseFilmSearchProvider,
+        *,
+        hydration_concurrency: int = 4,
+        hydration_timeout_sec: float = 4.0,
+    ) -> None:
         self._session = session
         self._search = search
+        self._hydration_concurrency = max(1, hydration_concurrency)
+        self._hydration_timeout_sec = hydration_timeout_sec
         self._cache = FilmRecommendationCacheRepository(session)
         self._group_films = GroupFilmRepository(session)
 
@@ -43,8 +53,8 @@ class RecommendationService:
         if not watched_ids:
             return RelativeOutcome(kind=RelativeOutcomeKind.NO_WATCHED)
 
-        rows = await self._cache.list_for_source_film_ids(watched_ids)
-        if not rows:
+        lists = await self._cache.lists_for_source_film_ids(watched_ids)
+        if not any(lists.values()):
             return RelativeOutcome(kind=RelativeOutcomeKind.CACHE_EMPTY)
 
         media_list = await self._group_films.watched_film_media_types(group_id)
@@ -59,13 +69,11 @@ class RecommendationService:
 
         def _aggregate(filter_types: set[str] | None) -> dict[tuple[str, str], int]:
             acc: dict[tuple[str, str], int] = {}
-            for r in rows:
-                mt = (r.recommended_media_type or "movie").strip() or "movie"
-                if filter_types is not None and mt not in filter_types:
-                    continue
-                key = (r.recommended_external_id, mt)
-                pos = getattr(r, "position", 0) or 0
-                acc[key] = acc.get(key, 0) + _recommendation_row_weight(pos)
+            for recs in lists.values():
+                for pos, key in enumerate(recs):
+                    if filter_types is not None and key[1] not in filter_types:
+                        continue
+                    acc[key] = acc.get(key, 0) + _recommendation_row_weight(pos)
             return acc
 
         scores = _aggregate(allowed_types)
@@ -78,16 +86,74 @@ class RecommendationService:
             key=lambda kv: (-kv[1], kv[0][0], kv[0][1]),
         )
         ordered_keys = [k for k, _ in ranked if k not in in_group]
+        # Карточки лежат рядом с кэшем — читаем только для верхушки рейтинга;
+        # сеть нужна лишь кандидатам без карточки
+        cards = await self._cache.cards_for(ordered_keys[: 2 * limit])
 
-        results: list[FilmSearchResult] = []
-        for ext_id, media_type in ordered_keys:
-            if len(results) >= limit:
-                break
-            detail = await self._search.get_details(ext_id, media_type)
-            if detail:
-                results.append(detail)
+        results = await self._hydrate(ordered_keys, cards, limit)
 
         if not results:
             return RelativeOutcome(kind=RelativeOutcomeKind.NO_CANDIDATES)
 
         return RelativeOutcome(kind=RelativeOutcomeKind.OK, results=results)
+
+    async def _hydrate(
+        self,
+        ordered_keys: list[tuple[str, str]],
+        cards: dict[tuple[str, str], FilmSearchResult],
+        limit: int,
+    ) -> list[FilmSearchResult]:
+        """
+        Первые `limit` кандидатов в порядке ранжирования. Кандидатов без карточки
+        догружаем параллельно (не больше hydration_concurrency) с запасом 2×limit —
+        на случай ошибок TMDB; по истечении общего дедлайна берём то, что успело.
+        """
+        candidates: list[tuple[str, str]] = []
+        with_card = 0
+        for key in ordered_keys[: 2 * limit]:
+            candidates.append(key)
+            if key in cards:
+                with_card += 1
+                if with_card >= limit:
+                    break
+
+        semaphore = asyncio.Semaphore(self._hydration_concurrency)
+
+        async def fetch(ext_id: str, media_type: str) -> FilmSearchResult | None:
+            async with semaphore:
+                return await self._search.get_details(ext_id, media_type)
+
+        tasks = {
+            key: asyncio.create_task(fetch(*key)) for key in candidates if key not in cards
+        }
+        if tasks:
+            done, pending = await asyncio.wait(
+                tasks.values(), timeout=self._hydration_timeout_sec
+            )
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                logger.warning(
+                    "relative: %s из %s карточек не успели за %.1fs — отдаём без них",
+                    len(pending),
+                    len(tasks),
+                    self._hydration_timeout_sec,
+                )
+
+        results: list[FilmSearchResult] = []
+        for key in candidates:
+            if len(results) >= limit:
+                break
+            detail = cards.get(key)
+            task = tasks.get(key)
+            if detail is None and task is not None and task.done() and not task.cancelled():
+                if task.exception() is not None:
+                    logger.warning(
+                        "relative: get_details %s/%s: %s", key[1], key[0], task.exception()
+                    )
+                else:
+                    detail = task.result()
+            if detail:
+                results.append(detail)
+        return results
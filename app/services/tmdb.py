@@ -1,11 +1,18 @@
 """TMDB film search provider."""
 
+import asyncio
 import logging
 from typing import Optional, Any
 import httpx
 
 from app.services.base import BaseFilmSearchProvider
-from app.services.dto import FilmSearchResult
+from app.services.dto import FilmBundle, FilmSearchResult
+from app.services.http_clients import get_http_clients
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.rate_limiter import TokenBucketLimiter
+from app.utils.retry import RetryPolicy
+from app.utils.single_flight import SingleFlight
+from app.utils.tmdb_images import TMDB_IMAGE_BASE_URL
 from app.config import get_settings
 
 
@@ -16,27 +23,101 @@ class TMDBFilmSearch(BaseFilmSearchProvider):
     """TMDB API film search provider."""
     
     BASE_URL = "https://api.themoviedb.org/3"
-    IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
+    IMAGE_BASE_URL = TMDB_IMAGE_BASE_URL
+    # Язык карточек get_details (часть ключа кэша film_details_cache)
+    DETAILS_LANGUAGE = "ru"
     
-    def __init__(self):
-        """Initialize TMDB search provider."""
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        limiter: Optional[TokenBucketLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retry_policies: Optional[dict[str, RetryPolicy]] = None,
+    ):
+        """Initialize TMDB search provider.
+
+        Args:
+            client: Pooled HTTP client; defaults to the shared TMDB pool
+            limiter: Process-wide TMDB rate limiter (None — без ограничения)
+            breaker: Circuit breaker (None — без него); при открытой цепи
+                методы сразу возвращают None, как при ошибке API
+            retry_policies: Повторы временных сбоев по виду запроса
+                ("search", "details", "recommendations"); нет политики — одна попытка
+        """
         settings = get_settings()
         self.api_key = settings.tmdb_api_key
-        self.proxy_url = settings.proxy_url
+        self._client = client
+        self._limiter = limiter
+        self._breaker = breaker
+        self._retry_policies = retry_policies or {}
+        # Одновременные одинаковые запросы (несколько участников жмут одно и то же)
+        # ждут один ответ TMDB
+        self._flight: SingleFlight[tuple, Any] = SingleFlight("tmdb")
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "accept": "application/json"
         }
-        
-        if self.proxy_url:
-            logger.info(f"TMDB will use proxy: {self.proxy_url}")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Long-lived pooled client (keep-alive, proxy from settings)."""
+        return self._client or get_http_clients().tmdb
     
+    @property
+    def breaker(self) -> Optional[CircuitBreaker]:
+        return self._breaker
+
+    async def _get(
+        self,
+        url: str,
+        params: dict[str, Any],
+        endpoint: str = "default",
+    ) -> httpx.Response:
+        """GET через общий пул с повторами по политике эндпоинта (если задана).
+
+        Повторы идут поверх circuit breaker: при разомкнутой цепи CircuitOpenError
+        не повторяется, так что во время аварии нагрузка не умножается.
+        """
+        policy = self._retry_policies.get(endpoint)
+        if policy is None:
+            return await self._attempt(url, params)
+        return await policy.run(lambda: self._attempt(url, params))
+
+    async def _attempt(self, url: str, params: dict[str, Any]) -> httpx.Response:
+        """Одна попытка; с лимитером — в пределах квоты и полосы приоритета.
+
+        С circuit breaker: при открытой цепи — CircuitOpenError без запроса;
+        сетевые ошибки и 5xx считаются сбоями апстрима.
+        """
+        if self._breaker is None:
+            return await self._send(url, params)
+        self._breaker.before_call()
+        try:
+            response = await self._send(url, params)
+        except httpx.TransportError:
+            self._breaker.record_failure()
+            raise
+        except BaseException:
+            self._breaker.record_ignored()
+            raise
+        if response.status_code >= 500:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+        return response
+
+    async def _send(self, url: str, params: dict[str, Any]) -> httpx.Response:
+        if self._limiter is None:
+            return await self.client.get(url, params=params, headers=self.headers)
+        async with self._limiter.acquire():
+            return await self.client.get(url, params=params, headers=self.headers)
+
     async def search(
         self, 
         query: str, 
         language: str = "ru"
     ) -> Optional[list[FilmSearchResult]]:
-        """Search films in TMDB.
+        """Search films in TMDB (concurrent identical queries share one request).
         
         Args:
             query: Search query
@@ -45,43 +126,51 @@ class TMDBFilmSearch(BaseFilmSearchProvider):
         Returns:
             List of up to 5 search results, or None if API error occurred
         """
+        return await self._flight.do(
+            ("search", query, language),
+            lambda: self._search(query, language),
+        )
+
+    async def _search(
+        self,
+        query: str,
+        language: str = "ru"
+    ) -> Optional[list[FilmSearchResult]]:
+        """Single /search/multi request (see search)."""
         try:
             logger.debug(f"TMDB search request: query={query}, language={language}")
             logger.debug(f"TMDB URL: {self.BASE_URL}/search/multi")
             
-            # Создаем клиент с прокси если указан
-            client_kwargs = {"timeout": 10.0}
-            if self.proxy_url:
-                client_kwargs["proxy"] = self.proxy_url
+            response = await self._get(
+                f"{self.BASE_URL}/search/multi",
+                params={
+                    "query": query,
+                    "language": language,
+                    "include_adult": "false"
+                },
+                endpoint="search",
+            )
             
-            async with httpx.AsyncClient(**client_kwargs) as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/search/multi",
-                    params={
-                        "query": query,
-                        "language": language,
-                        "include_adult": "false"
-                    },
-                    headers=self.headers
-                )
-                
-                logger.debug(f"TMDB response status: {response.status_code}")
-                response.raise_for_status()
-                data = response.json()
-                
-                results = []
-                for item in data.get("results", [])[:5]:
-                    # Only process movies and TV shows
-                    if item.get("media_type") not in ["movie", "tv"]:
-                        continue
-                    
-                    result = self._parse_search_result(item)
-                    if result:
-                        results.append(result)
+            logger.debug(f"TMDB response status: {response.status_code}")
+            response.raise_for_status()
+            data = response.json()
+
+            results = []
+            for item in data.get("results", [])[:5]:
+                # Only process movies and TV shows
+                if item.get("media_type") not in ["movie", "tv"]:
+                    continue
                 
-                logger.info(f"TMDB search found {len(results)} results")
-                return results
+                result = self._parse_search_result(item)
+                if result:
+                    results.append(result)
+
+            logger.info(f"TMDB search found {len(results)} results")
+            return results
                 
+        except CircuitOpenError as e:
+            logger.info(f"TMDB search skipped: {e}")
+            return None
         except httpx.ConnectError as e:
             logger.error(f"TMDB connection error (check network/DNS): {e}")
             return None
@@ -103,7 +192,7 @@ class TMDBFilmSearch(BaseFilmSearchProvider):
         external_id: str,
         media_type: str
     ) -> Optional[FilmSearchResult]:
-        """Get film details from TMDB.
+        """Get film details from TMDB (concurrent calls for one film share one request).
         
         Args:
             external_id: TMDB ID
@@ -112,32 +201,40 @@ class TMDBFilmSearch(BaseFilmSearchProvider):
         Returns:
             Film details or None
         """
+        return await self._flight.do(
+            ("details", external_id, media_type),
+            lambda: self._get_details(external_id, media_type),
+        )
+
+    async def _get_details(
+        self,
+        external_id: str,
+        media_type: str
+    ) -> Optional[FilmSearchResult]:
+        """Single /movie|tv/{id} request with credits (see get_details)."""
         try:
             endpoint = f"{self.BASE_URL}/{media_type}/{external_id}"
             logger.debug(f"TMDB get details: {endpoint}")
             
-            # Создаем клиент с прокси если указан
-            client_kwargs = {"timeout": 10.0}
-            if self.proxy_url:
-                client_kwargs["proxy"] = self.proxy_url
+            response = await self._get(
+                endpoint,
+                params={
+                    "language": self.DETAILS_LANGUAGE,
+                    # Подтягиваем кредиты, чтобы вытащить режиссёра
+                    "append_to_response": "credits",
+                },
+                endpoint="details",
+            )
             
-            async with httpx.AsyncClient(**client_kwargs) as client:
-                response = await client.get(
-                    endpoint,
-                    params={
-                        "language": "ru",
-                        # Подтягиваем кредиты, чтобы вытащить режиссёра
-                        "append_to_response": "credits",
-                    },
-                    headers=self.headers,
-                )
-                
-                logger.debug(f"TMDB details response status: {response.status_code}")
-                response.raise_for_status()
-                data = response.json()
-                
-                return self._parse_details(data, media_type)
+            logger.debug(f"TMDB details response status: {response.status_code}")
+            response.raise_for_status()
+            data = response.json()
+
+            return self._parse_details(data, media_type)
                 
+        except CircuitOpenError as e:
+            logger.info(f"TMDB get details skipped: {e}")
+            return None
         except httpx.ConnectError as e:
             logger.error(f"TMDB connection error (check network/DNS): {e}")
             return None
@@ -158,40 +255,38 @@ class TMDBFilmSearch(BaseFilmSearchProvider):
         self,
         external_id: str,
         media_type: str,
-    ) -> Optional[list[tuple[str, str]]] | str:
+        page: int = 1,
+    ) -> Optional[tuple[list[FilmSearchResult], int]] | str:
         """
-        Один запрос к /movie|tv/{id}/recommendations.
+        Один запрос к /movie|tv/{id}/recommendations?page=N.
 
         Returns:
-            список (в т.ч. пустой) при 200;
+            (карточки, total_pages) при 200 — media_type берём по эндпоинту;
             "not_found" при 404 (часто неверный movie vs tv);
             None при прочей ошибке.
         """
         endpoint = f"{self.BASE_URL}/{media_type}/{external_id}/recommendations"
         try:
-            client_kwargs = {"timeout": 10.0}
-            if self.proxy_url:
-                client_kwargs["proxy"] = self.proxy_url
-            async with httpx.AsyncClient(**client_kwargs) as client:
-                response = await client.get(
-                    endpoint,
-                    params={
-                        "api_key": self.api_key,
-                        "language": "ru-RU",
-                        "page": 1,
-                    },
-                    headers=self.headers,
-                )
-                if response.status_code == 404:
-                    return "not_found"
-                response.raise_for_status()
-                data = response.json()
-            out: list[tuple[str, str]] = []
-            for item in data.get("results") or []:
-                rid = item.get("id")
-                if rid is not None:
-                    out.append((str(rid), media_type))
-            return out
+            response = await self._get(
+                endpoint,
+                params={
+                    "api_key": self.api_key,
+                    "language": "ru-RU",
+                    "page": page,
+                },
+                endpoint="recommendations",
+            )
+            if response.status_code == 404:
+                return "not_found"
+            response.raise_for_status()
+            data = response.json()
+            return (
+                self._parse_recommendations(data.get("results"), media_type),
+                int(data.get("total_pages") or 1),
+            )
+        except CircuitOpenError as e:
+            logger.debug("TMDB fetch_recommendations skipped: %s", e)
+            return None
         except httpx.HTTPStatusError as e:
             logger.error(
                 "TMDB fetch_recommendations HTTP %s для %s: %s",
@@ -211,24 +306,199 @@ class TMDBFilmSearch(BaseFilmSearchProvider):
         self,
         external_id: str,
         media_type: str,
-    ) -> Optional[list[tuple[str, str]]]:
-        """Первая страница recommendations; при 404 пробуем противоположный тип (tv↔movie)."""
+        pages: int = 1,
+    ) -> Optional[list[FilmSearchResult]]:
+        """До `pages` страниц recommendations; одновременные вызовы по одному фильму — один запрос."""
+        return await self._flight.do(
+            ("recommendations", external_id, media_type, pages),
+            lambda: self._fetch_recommendations(external_id, media_type, pages),
+        )
+
+    async def _fetch_recommendations(
+        self,
+        external_id: str,
+        media_type: str,
+        pages: int = 1,
+    ) -> Optional[list[FilmSearchResult]]:
+        """
+        Первая страница (при 404 пробуем противоположный тип tv↔movie), затем
+        страницы 2..pages параллельно. Ошибка на дальних страницах не роняет результат —
+        отдаём то, что пришло, без дублей и в порядке страниц.
+        """
         first = await self._fetch_recommendations_page(external_id, media_type)
-        if isinstance(first, list):
-            return first
-        if first != "not_found":
+        if first == "not_found":
+            alt = "tv" if media_type == "movie" else "movie"
+            first = await self._fetch_recommendations_page(external_id, alt)
+            if isinstance(first, tuple):
+                logger.info(
+                    "TMDB recommendations: external_id=%s в БД как %s, ответ TMDB по эндпоинту %s",
+                    external_id,
+                    media_type,
+                    alt,
+                )
+                media_type = alt
+        if not isinstance(first, tuple):
+            return None
+
+        results, total_pages = first
+        return await self._extend_recommendations(
+            external_id, media_type, results, total_pages, pages
+        )
+
+    async def _extend_recommendations(
+        self,
+        external_id: str,
+        media_type: str,
+        results: list[FilmSearchResult],
+        total_pages: int,
+        pages: int,
+    ) -> list[FilmSearchResult]:
+        """Дописать к первой странице страницы 2..pages (параллельно, без дублей)."""
+        last_page = min(max(1, pages), total_pages)
+        if last_page > 1:
+            rest = await asyncio.gather(
+                *(
+                    self._fetch_recommendations_page(external_id, media_type, page)
+                    for page in range(2, last_page + 1)
+                )
+            )
+            seen = {r.external_id for r in results}
+            for page_result in rest:
+                if not isinstance(page_result, tuple):
+                    continue
+                for rec in page_result[0]:
+                    if rec.external_id not in seen:
+                        seen.add(rec.external_id)
+                        results.append(rec)
+        return results
+
+    async def fetch_bundle(
+        self,
+        external_id: str,
+        media_type: Optional[str],
+        pages: int = 1,
+    ) -> Optional[FilmBundle]:
+        """Details, credits and recommendations in one append_to_response request.
+
+        Known media type: one request (on 404 — one more for the other type, as in
+        recommendations). Unknown (None): /movie and /tv are requested concurrently,
+        movie wins if both exist. Pages 2..pages of recommendations are fetched
+        concurrently afterwards.
+
+        Args:
+            external_id: TMDB ID
+            media_type: 'movie', 'tv' or None if unknown
+            pages: Recommendation pages to fetch
+
+        Returns:
+            Bundle or None on API error / not found
+        """
+        return await self._flight.do(
+            ("bundle", external_id, media_type, pages),
+            lambda: self._fetch_bundle(external_id, media_type, pages),
+        )
+
+    async def _fetch_bundle(
+        self,
+        external_id: str,
+        media_type: Optional[str],
+        pages: int = 1,
+    ) -> Optional[FilmBundle]:
+        """See fetch_bundle."""
+        if media_type in ("movie", "tv"):
+            bundle = await self._fetch_bundle_once(external_id, media_type)
+            if bundle == "not_found":
+                alt = "tv" if media_type == "movie" else "movie"
+                bundle = await self._fetch_bundle_once(external_id, alt)
+        else:
+            movie, tv = await asyncio.gather(
+                self._fetch_bundle_once(external_id, "movie"),
+                self._fetch_bundle_once(external_id, "tv"),
+            )
+            bundle = movie if isinstance(movie, FilmBundle) else tv
+        if not isinstance(bundle, FilmBundle):
             return None
-        alt = "tv" if media_type == "movie" else "movie"
-        second = await self._fetch_recommendations_page(external_id, alt)
-        if isinstance(second, list):
-            logger.info(
-                "TMDB recommendations: external_id=%s в БД как %s, ответ TMDB по эндпоинту %s",
+
+        if bundle.recommendations is not None and pages > 1:
+            await self._extend_recommendations(
                 external_id,
-                media_type,
-                alt,
+                bundle.details.media_type,
+                bundle.recommendations,
+                bundle.recommendation_pages,
+                pages,
             )
-            return second
-        return None
+        return bundle
+
+    async def _fetch_bundle_once(
+        self,
+        external_id: str,
+        media_type: str,
+    ) -> Optional[FilmBundle] | str:
+        """
+        Один запрос /movie|tv/{id}?append_to_response=credits,recommendations.
+
+        Returns:
+            FilmBundle при 200; "not_found" при 404; None при прочей ошибке.
+        """
+        endpoint = f"{self.BASE_URL}/{media_type}/{external_id}"
+        try:
+            response = await self._get(
+                endpoint,
+                params={
+                    "language": self.DETAILS_LANGUAGE,
+                    "append_to_response": "credits,recommendations",
+                },
+                endpoint="details",
+            )
+            if response.status_code == 404:
+                return "not_found"
+            response.raise_for_status()
+            data = response.json()
+            details = self._parse_details(data, media_type)
+            if details is None:
+                return None
+            recommendations = data.get("recommendations")
+            if not isinstance(recommendations, dict):
+                return FilmBundle(details=details)
+            return FilmBundle(
+                details=details,
+                recommendations=self._parse_recommendations(
+                    recommendations.get("results"), media_type
+                ),
+                recommendation_pages=int(recommendations.get("total_pages") or 1),
+            )
+        except CircuitOpenError as e:
+            logger.info("TMDB fetch_bundle skipped: %s", e)
+            return None
+        except httpx.HTTPStatusError as e:
+            logger.error(
+                "TMDB fetch_bundle HTTP %s для %s: %s",
+                e.response.status_code,
+                endpoint,
+                (e.response.text or "")[:400],
+            )
+            return None
+        except httpx.HTTPError as e:
+            logger.error("TMDB fetch_bundle HTTP error: %s", e)
+            return None
+        except Exception as e:
+            logger.error("TMDB fetch_bundle: %s", e, exc_info=True)
+            return None
+
+    def _parse_recommendations(
+        self,
+        items: Optional[list[dict[str, Any]]],
+        media_type: str,
+    ) -> list[FilmSearchResult]:
+        """Карточки recommendations; media_type берём по эндпоинту."""
+        out: list[FilmSearchResult] = []
+        for item in items or []:
+            if item.get("id") is None:
+                continue
+            parsed = self._parse_search_result({**item, "media_type": media_type})
+            if parsed is not None:
+                out.append(parsed)
+        return out
 
     def _parse_search_result(self, item: dict[str, Any]) -> Optional[FilmSearchResult]:
         """Parse search result item.
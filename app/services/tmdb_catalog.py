@@ -0,0 +1,139 @@
+"""Загрузка ежедневных выгрузок id TMDB в локальный каталог tmdb_catalog.
+
+Выгрузки — gzip JSON Lines (по объекту на строку):
+movie_ids_MM_DD_YYYY.json.gz: {"id", "original_title", "popularity", "adult", "video"}
+tv_series_ids_MM_DD_YYYY.json.gz: {"id", "original_name", "popularity"}
+Файл читается построчно, в памяти — не больше одной пачки.
+"""
+
+import gzip
+import json
+import logging
+import time
+from collections.abc import Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.repositories import TmdbCatalogRepository
+
+logger = logging.getLogger(__name__)
+
+# Предел колонки original_title
+_TITLE_MAX_LEN = 500
+
+
+class CatalogIngestReport(BaseModel):
+    """Итог загрузки выгрузки."""
+
+    rows: int = 0
+    skipped: int = 0
+    batches: int = 0
+    duration_sec: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.duration_sec if self.duration_sec > 0 else 0.0
+
+
+def media_type_from_filename(path: Path) -> str | None:
+    """movie_ids_*.json.gz → movie, tv_series_ids_*.json.gz → tv."""
+    name = path.name
+    if name.startswith("movie_ids"):
+        return "movie"
+    if name.startswith("tv_series_ids"):
+        return "tv"
+    return None
+
+
+class TMDBCatalogIngest:
+    """Потоковый разбор выгрузки и пакетный upsert: по транзакции на пачку."""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        batch_size: int = 5000,
+    ) -> None:
+        self._session_factory = session_factory
+        self._batch_size = max(1, batch_size)
+
+    async def ingest_file(self, path: Path, media_type: str) -> CatalogIngestReport:
+        started = time.monotonic()
+        report = CatalogIngestReport()
+        updated_at = datetime.utcnow()
+        batch: list[dict[str, Any]] = []
+
+        async with self._session_factory() as session:
+            repo = TmdbCatalogRepository(session)
+            for line in self._iter_lines(path):
+                row = self._parse_line(line, media_type, updated_at)
+                if row is None:
+                    report.skipped += 1
+                    continue
+                batch.append(row)
+                if len(batch) >= self._batch_size:
+                    await self._flush(session, repo, batch, report)
+                    batch = []
+            if batch:
+                await self._flush(session, repo, batch, report)
+
+        report.duration_sec = time.monotonic() - started
+        logger.info(
+            "TMDB catalog ingest %s (%s): rows=%s skipped=%s batches=%s duration=%.1fs "
+            "throughput=%.0f rows/s",
+            path.name,
+            media_type,
+            report.rows,
+            report.skipped,
+            report.batches,
+            report.duration_sec,
+            report.rows_per_sec,
+        )
+        return report
+
+    async def _flush(
+        self,
+        session: AsyncSession,
+        repo: TmdbCatalogRepository,
+        batch: list[dict[str, Any]],
+        report: CatalogIngestReport,
+    ) -> None:
+        # В одной пачке id может повториться — upsert одного запроса этого не допускает
+        unique = list({row["tmdb_id"]: row for row in batch}.values())
+        await repo.upsert_many(unique)
+        await session.commit()
+        report.rows += len(unique)
+        report.skipped += len(batch) - len(unique)
+        report.batches += 1
+
+    @staticmethod
+    def _iter_lines(path: Path) -> Iterator[str]:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as fh:
+            yield from fh
+
+    @staticmethod
+    def _parse_line(line: str, media_type: str, updated_at: datetime) -> dict[str, Any] | None:
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            item = json.loads(line)
+            tmdb_id = int(item["id"])
+        except (ValueError, KeyError, TypeError):
+            logger.debug("TMDB catalog ingest: пропущена строка %r", line[:200])
+            return None
+        title = item.get("original_title") or item.get("original_name")
+        if not title:
+            return None
+        return {
+            "tmdb_id": tmdb_id,
+            "media_type": media_type,
+            "original_title": str(title)[:_TITLE_MAX_LEN],
+            "popularity": float(item.get("popularity") or 0.0),
+            "adult": bool(item.get("adult", False)),
+            "updated_at": updated_at,
+        }
@@ -0,0 +1,154 @@
+"""Кэш результатов поиска раздач в БД (torrent_search_cache).
+
+Ключ — нормализованный запрос «название год», как его строит ProwlarrService.search_torrents,
+так что «Скачать» у разных участников и после перезапуска бота попадает в одну запись.
+Пустые результаты не кэшируются: раздача может появиться в любой момент.
+
+Опционально поиск запускается заранее — в фоне сразу после добавления фильма в список
+(schedule_torrent_prefetch), и кнопка «Скачать» отвечает из кэша.
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repositories import TorrentSearchCacheRepository
+from app.services.dto import TorrentResult
+from app.services.metrics import metrics
+from app.services.prowlarr import ProwlarrService
+from app.services.readiness import ensure_ready
+from app.utils.background import BackgroundTasks, background_tasks
+from app.utils.query import normalize_search_query
+
+logger = logging.getLogger(__name__)
+
+# Одновременных фоновых поисков; создаётся при первом запуске (размер — из настроек)
+_prefetch_semaphore: asyncio.Semaphore | None = None
+
+
+def torrent_search_key(title: str, year: Optional[int]) -> str:
+    return normalize_search_query(f"{title} {year}" if year else title)
+
+
+class TorrentSearchCache:
+    """Свежие (моложе ttl) списки раздач по запросу; каждая операция — своя сессия."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        ttl: timedelta,
+    ) -> None:
+        self._session_factory = session_factory
+        self._ttl = ttl
+
+    async def get(
+        self, title: str, year: Optional[int]
+    ) -> Optional[tuple[list[TorrentResult], timedelta]]:
+        """(раздачи, возраст записи) или None — записи нет или она старше ttl."""
+        async with self._session_factory() as session:
+            row = await TorrentSearchCacheRepository(session).get(torrent_search_key(title, year))
+            if row is None:
+                metrics.incr("torrent_cache.miss")
+                return None
+            age = datetime.utcnow() - row.fetched_at
+            if age > self._ttl:
+                metrics.incr("torrent_cache.expired")
+                return None
+            metrics.incr("torrent_cache.hit")
+            return TorrentSearchCacheRepository.to_results(row), age
+
+    async def store(self, title: str, year: Optional[int], torrents: list[TorrentResult]) -> None:
+        if not torrents:
+            return
+        async with self._session_factory() as session:
+            try:
+                await TorrentSearchCacheRepository(session).upsert(
+                    torrent_search_key(title, year), torrents
+                )
+                await session.commit()
+            except IntegrityError:
+                # Параллельный поиск того же фильма уже записал свой список
+                await session.rollback()
+
+
+def torrent_prefetch_key(title: str, year: Optional[int]) -> tuple[str, str]:
+    return ("torrent_prefetch", torrent_search_key(title, year))
+
+
+async def prefetch_torrent_search(
+    prowlarr: ProwlarrService,
+    cache: TorrentSearchCache,
+    title: str,
+    year: Optional[int],
+    semaphore: asyncio.Semaphore,
+) -> int:
+    """Найти раздачи заранее и положить в кэш; свежая запись в кэше — без поиска.
+
+    Returns:
+        Сколько раздач записано (0 — ничего не искали или не нашли)
+    """
+    async with semaphore:
+        if await cache.get(title, year) is not None:
+            return 0
+        # Prowlarr недоступен — не копим таймауты; поиск по кнопке пойдёт как обычно
+        if not await ensure_ready("prowlarr"):
+            metrics.incr("torrent_prefetch.skipped_not_ready")
+            return 0
+        torrents = await prowlarr.search_torrents(title, year, limit=10)
+        await cache.store(title, year, torrents)
+    metrics.incr("torrent_prefetch.completed")
+    logger.info("torrent prefetch: %r (%s) — %s раздач", title, year, len(torrents))
+    return len(torrents)
+
+
+def schedule_torrent_prefetch(
+    group_id: int,
+    title: str,
+    year: Optional[int],
+    tasks: BackgroundTasks | None = None,
+) -> bool:
+    """Запустить prefetch_torrent_search в фоне, если он включён для группы.
+
+    Один поиск на запрос одновременно; False — выключено или уже идёт.
+    """
+    from app.config import get_settings
+    from app.services.providers import get_prowlarr_service, get_torrent_search_cache
+
+    global _prefetch_semaphore
+    settings = get_settings()
+    if not settings.torrent_prefetch_enabled:
+        return False
+    if settings.torrent_prefetch_download_group_only and group_id != settings.download_group_id:
+        return False
+    if _prefetch_semaphore is None:
+        _prefetch_semaphore = asyncio.Semaphore(max(1, settings.torrent_prefetch_concurrency))
+    return (tasks or background_tasks).spawn(
+        prefetch_torrent_search(
+            get_prowlarr_service(),
+            get_torrent_search_cache(),
+            title,
+            year,
+            _prefetch_semaphore,
+        ),
+        key=torrent_prefetch_key(title, year),
+        name=f"torrent-prefetch-{torrent_search_key(title, year)}",
+    )
+
+
+async def wait_for_torrent_prefetch(
+    title: str,
+    year: Optional[int],
+    tasks: BackgroundTasks | None = None,
+) -> bool:
+    """Дождаться идущего фонового поиска того же запроса. False — такого нет."""
+    task = (tasks or background_tasks).get(torrent_prefetch_key(title, year))
+    if task is None:
+        return False
+    # asyncio.wait не отменяет задачу, если отменят ожидающий хендлер
+    await asyncio.wait({task})
+    return True
@@ -0,0 +1,192 @@
+"""Кэш .torrent-файлов по info-hash.
+
+Повторная отправка той же раздачи не качает файл из Prowlarr и не загружает его
+в Telegram заново: после первой отправки запоминаем file_id документа (он общий
+для всех чатов бота), дальше — send_document(file_id). Байты лежат на диске
+(<info_hash>.torrent) с общим пределом объёма и вытеснением давно не нужных (LRU
+по mtime) — на случай, если Telegram отверг file_id. Ссылка скачивания Prowlarr
+привязана к info-hash в БД, так что хэш известен ещё до скачивания.
+Метрики: torrent_files.file_id_hit / disk_hit / miss, gauge torrent_files.disk_bytes.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repositories import TorrentFileRepository
+from app.services.metrics import metrics
+from app.utils.bencode import torrent_info_hash
+
+logger = logging.getLogger(__name__)
+
+_INFO_HASH_RE = re.compile(r"[0-9a-f]{40}")
+
+
+@dataclass(frozen=True, slots=True)
+class CachedTorrent:
+    """Известный кэшу .torrent: file_id — если уже отправляли в Telegram."""
+
+    info_hash: str
+    file_id: Optional[str] = None
+
+
+class TorrentFileCache:
+    """.torrent по info-hash: file_id Telegram в БД, байты на диске (не больше max_bytes)."""
+
+    def __init__(
+        self,
+        directory: Path | str,
+        max_bytes: int,
+        session_factory: Callable[[], AsyncSession],
+    ) -> None:
+        """
+        Args:
+            directory: Каталог для .torrent (создаётся при первой записи)
+            max_bytes: Предел объёма каталога; сверх него удаляются давно не нужные файлы
+            session_factory: Фабрика сессий БД
+        """
+        self._dir = Path(directory)
+        self._max_bytes = max_bytes
+        self._session_factory = session_factory
+        # info_hash → размер; порядок — от давно не нужных к недавним
+        self._index: Optional[OrderedDict[str, int]] = None
+        self._bytes = 0
+
+    @property
+    def disk_bytes(self) -> int:
+        return self._bytes
+
+    async def lookup(
+        self, download_url: str, info_hash: Optional[str] = None
+    ) -> Optional[CachedTorrent]:
+        """Что известно о файле раздачи: по info-hash из Prowlarr или по ссылке скачивания."""
+        async with self._session_factory() as session:
+            repo = TorrentFileRepository(session)
+            row = None
+            if info_hash:
+                row = await repo.get(info_hash.lower())
+            if row is None:
+                row = await repo.get_by_url(download_url)
+        if row is None:
+            metrics.incr("torrent_files.miss")
+            return None
+        if row.telegram_file_id:
+            metrics.incr("torrent_files.file_id_hit")
+        return CachedTorrent(row.info_hash, row.telegram_file_id)
+
+    async def read(self, info_hash: str) -> Optional[bytes]:
+        """Байты с диска (и отметка «нужен недавно»); None — файл вытеснен или не сохранялся."""
+        path = self._path(info_hash)
+        if path is None:
+            return None
+        try:
+            data = await asyncio.to_thread(_read_and_touch, path)
+        except FileNotFoundError:
+            return None
+        index = await self._get_index()
+        if info_hash in index:
+            index.move_to_end(info_hash)
+        metrics.incr("torrent_files.disk_hit")
+        return data
+
+    async def store(
+        self, download_url: str, data: bytes, file_id: Optional[str] = None
+    ) -> CachedTorrent:
+        """Сохранить скачанный .torrent на диск и в БД.
+
+        Raises:
+            BencodeError: данные — не .torrent (info-hash не посчитать)
+        """
+        info_hash = torrent_info_hash(data)
+        await self._write(info_hash, data)
+        async with self._session_factory() as session:
+            repo = TorrentFileRepository(session)
+            try:
+                row = await repo.upsert(info_hash, len(data), download_url)
+                if file_id:
+                    row.telegram_file_id = file_id
+                file_id = row.telegram_file_id
+                await session.commit()
+            except IntegrityError:
+                # Ту же раздачу параллельно сохранил другой участник
+                await session.rollback()
+        return CachedTorrent(info_hash, file_id)
+
+    async def set_file_id(self, info_hash: str, file_id: Optional[str]) -> None:
+        """Запомнить file_id после отправки (None — Telegram его больше не принимает)."""
+        async with self._session_factory() as session:
+            await TorrentFileRepository(session).set_file_id(info_hash, file_id)
+            await session.commit()
+
+    def _path(self, info_hash: str) -> Optional[Path]:
+        if not _INFO_HASH_RE.fullmatch(info_hash):
+            return None
+        return self._dir / f"{info_hash}.torrent"
+
+    async def _get_index(self) -> OrderedDict[str, int]:
+        if self._index is None:
+            entries = await asyncio.to_thread(_scan, self._dir)
+            self._index = OrderedDict(entries)
+            self._bytes = sum(self._index.values())
+            self._publish()
+        return self._index
+
+    async def _write(self, info_hash: str, data: bytes) -> None:
+        index = await self._get_index()
+        await asyncio.to_thread(_write_atomic, self._path(info_hash), data)
+        self._bytes += len(data) - index.pop(info_hash, 0)
+        index[info_hash] = len(data)
+        # Только что записанный файл не вытесняем, даже если он один больше предела
+        stale = []
+        while self._bytes > self._max_bytes and len(index) > 1:
+            old_hash, size = index.popitem(last=False)
+            self._bytes -= size
+            stale.append(self._path(old_hash))
+        if stale:
+            await asyncio.to_thread(_remove_all, stale)
+            logger.info("torrent files: вытеснено с диска %d", len(stale))
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("torrent_files.disk_bytes", self._bytes)
+
+
+def _scan(directory: Path) -> list[tuple[str, int]]:
+    """(info_hash, размер) файлов каталога, от давно не нужных к недавним."""
+    if not directory.is_dir():
+        return []
+    entries = []
+    for path in directory.glob("*.torrent"):
+        if not _INFO_HASH_RE.fullmatch(path.stem):
+            continue
+        stat = path.stat()
+        entries.append((stat.st_mtime, path.stem, stat.st_size))
+    entries.sort()
+    return [(info_hash, size) for _, info_hash, size in entries]
+
+
+def _read_and_touch(path: Path) -> bytes:
+    data = path.read_bytes()
+    os.utime(path)
+    return data
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _remove_all(paths: list[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
@@ -0,0 +1,132 @@
+"""Списки раздач, на которые ссылаются кнопки «#N» под сообщением.
+
+В памяти — ограниченный LRU+TTL по (chat_id, message_id) с учётом примерного объёма
+(метрики torrent_lists.entries / torrent_lists.bytes). Опционально список пишется в БД
+(torrent_list_messages), и после перезапуска кнопка под старым сообщением продолжает работать.
+"""
+
+import logging
+import sys
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repositories import TorrentListRepository
+from app.services.dto import TorrentResult
+from app.services.metrics import metrics
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Поля TorrentResult, которые занимают память заметнее остальных
+_STR_FIELDS = ("guid", "title", "indexer", "magnet_url", "info_url", "search_query")
+# Объект модели, числа, список тегов — без строк
+_RESULT_OVERHEAD_BYTES = 400
+
+
+def estimate_torrents_bytes(torrents: list[TorrentResult]) -> int:
+    """Примерный объём списка в памяти процесса."""
+    total = sys.getsizeof(torrents)
+    for torrent in torrents:
+        total += _RESULT_OVERHEAD_BYTES
+        for field in _STR_FIELDS:
+            value = getattr(torrent, field)
+            if value:
+                total += sys.getsizeof(value)
+        total += sum(sys.getsizeof(tag) for tag in torrent.tags)
+    return total
+
+
+class TorrentListStore:
+    """O(1) поиск списка по сообщению; в памяти не больше maxsize списков."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: timedelta,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        persist_ttl: timedelta = timedelta(days=7),
+    ) -> None:
+        """
+        Args:
+            maxsize: Списков в памяти (дальше вытесняются давно не нужные)
+            ttl: Срок жизни списка в памяти
+            session_factory: Фабрика сессий для записи в БД (None — только память)
+            persist_ttl: Сколько хранить списки в БД
+        """
+        self._memory: TTLCache[tuple[int, int], list[TorrentResult]] = TTLCache(
+            maxsize=maxsize,
+            ttl=ttl.total_seconds(),
+            on_evict=self._on_evict,
+        )
+        self._sizes: dict[tuple[int, int], int] = {}
+        self._bytes = 0
+        self._session_factory = session_factory
+        self._persist_ttl = persist_ttl
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    async def put(
+        self,
+        chat_id: int,
+        message_id: int,
+        torrents: list[TorrentResult],
+        *,
+        persist: bool = True,
+    ) -> None:
+        """Запомнить список сообщения; persist=False — только память (промежуточный список)."""
+        key = (chat_id, message_id)
+        self._memory.purge_expired()
+        self._memory.set(key, torrents)
+        size = estimate_torrents_bytes(torrents)
+        self._sizes[key] = size
+        self._bytes += size
+        self._publish()
+        if persist and self._session_factory is not None:
+            await self._persist(chat_id, message_id, torrents)
+
+    async def get(self, chat_id: int, message_id: int) -> Optional[list[TorrentResult]]:
+        """Список сообщения: из памяти, иначе из БД (после перезапуска); None — нет или устарел."""
+        key = (chat_id, message_id)
+        torrents = self._memory.get(key)
+        if torrents is not None:
+            metrics.incr("torrent_lists.hit")
+            return torrents
+        if self._session_factory is None:
+            metrics.incr("torrent_lists.miss")
+            return None
+        async with self._session_factory() as session:
+            row = await TorrentListRepository(session).get(chat_id, message_id)
+            if row is None or datetime.utcnow() - row.created_at > self._persist_ttl:
+                metrics.incr("torrent_lists.miss")
+                return None
+            torrents = TorrentListRepository.to_results(row)
+        metrics.incr("torrent_lists.db_hit")
+        await self.put(chat_id, message_id, torrents, persist=False)
+        return torrents
+
+    async def _persist(self, chat_id: int, message_id: int, torrents: list[TorrentResult]) -> None:
+        async with self._session_factory() as session:
+            repo = TorrentListRepository(session)
+            try:
+                await repo.upsert(chat_id, message_id, torrents)
+                await repo.delete_older_than(datetime.utcnow() - self._persist_ttl)
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+
+    def _on_evict(self, key: tuple[int, int], _value: list[TorrentResult]) -> None:
+        self._bytes -= self._sizes.pop(key, 0)
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("torrent_lists.entries", len(self._memory))
+        metrics.set_gauge("torrent_lists.bytes", self._bytes)
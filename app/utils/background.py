@@ -0,0 +1,77 @@
+"""Фоновые задачи вне пути обработки апдейта.
+
+asyncio.create_task без сохранённой ссылки может быть собран GC, а исключение —
+потеряно; здесь задачи держатся до завершения, ошибки логируются, а ключ
+не даёт запустить вторую такую же задачу, пока первая ещё идёт.
+"""
+
+import asyncio
+import logging
+from collections.abc import Coroutine, Hashable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTasks:
+    """Реестр фоновых задач с дедупликацией по ключу."""
+
+    def __init__(self) -> None:
+        self._tasks: set[asyncio.Task] = set()
+        self._by_key: dict[Hashable, asyncio.Task] = {}
+
+    def spawn(
+        self,
+        coro: Coroutine[Any, Any, Any],
+        *,
+        key: Hashable | None = None,
+        name: str | None = None,
+    ) -> bool:
+        """Запустить корутину в фоне. False — задача с таким ключом уже выполняется."""
+        if key is not None and key in self._by_key:
+            coro.close()
+            return False
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        if key is not None:
+            self._by_key[key] = task
+        task.add_done_callback(lambda t: self._on_done(t, key))
+        return True
+
+    def is_running(self, key: Hashable) -> bool:
+        return key in self._by_key
+
+    def get(self, key: Hashable) -> asyncio.Task | None:
+        """Выполняющаяся задача с ключом (чтобы дождаться её, а не запускать вторую)."""
+        return self._by_key.get(key)
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def _on_done(self, task: asyncio.Task, key: Hashable | None) -> None:
+        self._tasks.discard(task)
+        if key is not None and self._by_key.get(key) is task:
+            del self._by_key[key]
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            logger.error(
+                "Фоновая задача %s завершилась с ошибкой",
+                task.get_name(),
+                exc_info=exc,
+            )
+
+    async def drain(self) -> None:
+        """Дождаться всех текущих задач (тесты, корректная остановка)."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def cancel_all(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await self.drain()
+
+
+background_tasks = BackgroundTasks()
@@ -0,0 +1,84 @@
+"""Разбор bencode (.torrent) ровно настолько, чтобы посчитать info-hash.
+
+info-hash — SHA-1 исходных байтов значения ключа "info" верхнего словаря. Значения
+не декодируются: сканер только проверяет структуру и находит границы элементов,
+поэтому хэш совпадает с тем, что считают торрент-клиенты, даже при нестандартном
+порядке ключей внутри info.
+"""
+
+import hashlib
+
+# Глубже вложенность в реальных .torrent не бывает; защита от рекурсии на мусоре
+_MAX_DEPTH = 64
+
+
+class BencodeError(ValueError):
+    """Данные — не корректный bencode / не .torrent."""
+
+
+def _int_end(data: bytes, pos: int, terminator: int) -> tuple[int, int]:
+    """Десятичное число с pos до terminator → (значение, позиция terminator)."""
+    end = data.find(terminator, pos)
+    if end == -1 or end == pos:
+        raise BencodeError(f"unterminated integer at {pos}")
+    digits = data[pos:end]
+    try:
+        return int(digits), end
+    except ValueError:
+        raise BencodeError(f"bad integer at {pos}") from None
+
+
+def _skip(data: bytes, pos: int, depth: int = 0) -> int:
+    """Позиция сразу за элементом, начинающимся в pos."""
+    if depth > _MAX_DEPTH:
+        raise BencodeError("nesting too deep")
+    if pos >= len(data):
+        raise BencodeError("unexpected end of data")
+    lead = data[pos]
+    if lead == ord("i"):
+        _, end = _int_end(data, pos + 1, ord("e"))
+        return end + 1
+    if lead in (ord("l"), ord("d")):
+        pos += 1
+        while pos < len(data) and data[pos] != ord("e"):
+            pos = _skip(data, pos, depth + 1)
+        if pos >= len(data):
+            raise BencodeError("unterminated list/dict")
+        return pos + 1
+    if ord("0") <= lead <= ord("9"):
+        length, colon = _int_end(data, pos, ord(":"))
+        end = colon + 1 + length
+        if length < 0 or end > len(data):
+            raise BencodeError(f"string out of bounds at {pos}")
+        return end
+    raise BencodeError(f"unexpected byte {lead!r} at {pos}")
+
+
+def _string_at(data: bytes, pos: int) -> tuple[bytes, int]:
+    if not ord("0") <= data[pos] <= ord("9"):
+        raise BencodeError(f"dict key is not a string at {pos}")
+    end = _skip(data, pos)
+    _, colon = _int_end(data, pos, ord(":"))
+    return data[colon + 1 : end], end
+
+
+def torrent_info_hash(data: bytes) -> str:
+    """Info-hash v1 (40 hex-символов в нижнем регистре).
+
+    Raises:
+        BencodeError: не bencode-словарь, нет "info" или мусор после словаря
+    """
+    if not data.startswith(b"d"):
+        raise BencodeError("torrent must be a bencoded dict")
+    if _skip(data, 0) != len(data):
+        raise BencodeError("trailing data after torrent dict")
+    pos = 1
+    while data[pos] != ord("e"):
+        key, pos = _string_at(data, pos)
+        value_end = _skip(data, pos, 1)
+        if key == b"info":
+            if data[pos] != ord("d"):
+                raise BencodeError("info is not a dict")
+            return hashlib.sha1(data[pos:value_end]).hexdigest()
+        pos = value_end
+    raise BencodeError("torrent has no info dict")
@@ -0,0 +1,69 @@
+"""Компактная ссылка на фильм в callback_data (лимит Telegram — 64 байта).
+
+Вместо названия (оно бывает длиннее лимита) в кнопку кладём TMDB id, тип и год:
+7 байт struct → 10 символов base64url без паддинга. Хендлер восстанавливает всё
+из payload и БД, серверное состояние между показом кнопки и нажатием не нужно —
+кнопки переживают перезапуск и не копятся в памяти.
+
+Формат (big-endian): флаги (1 байт: версия в старших 4 битах, бит 0 — tv),
+TMDB id (uint32), год (uint16, 0 — неизвестен).
+"""
+
+import base64
+import binascii
+import struct
+from dataclasses import dataclass
+from typing import Optional
+
+_FORMAT = struct.Struct(">BIH")
+_VERSION = 1
+_TV_FLAG = 0x01
+# Длина payload в символах base64url без паддинга
+PAYLOAD_LEN = len(base64.urlsafe_b64encode(b"\0" * _FORMAT.size).rstrip(b"="))
+
+
+@dataclass(frozen=True, slots=True)
+class FilmRef:
+    """TMDB-фильм/сериал, на который ссылается кнопка."""
+
+    tmdb_id: int
+    media_type: str = "movie"
+    year: Optional[int] = None
+
+    @property
+    def external_id(self) -> str:
+        return str(self.tmdb_id)
+
+
+def pack_film_ref(ref: FilmRef) -> str:
+    """FilmRef → строка из PAYLOAD_LEN символов [A-Za-z0-9_-].
+
+    Raises:
+        ValueError: id или год не помещаются в формат
+    """
+    if not 0 < ref.tmdb_id < 2**32:
+        raise ValueError(f"tmdb_id out of range: {ref.tmdb_id}")
+    year = ref.year or 0
+    if not 0 <= year < 2**16:
+        raise ValueError(f"year out of range: {ref.year}")
+    flags = (_VERSION << 4) | (_TV_FLAG if ref.media_type == "tv" else 0)
+    raw = _FORMAT.pack(flags, ref.tmdb_id, year)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def unpack_film_ref(payload: str) -> Optional[FilmRef]:
+    """Обратное к pack_film_ref; None — не наш формат (старая кнопка, мусор)."""
+    if len(payload) != PAYLOAD_LEN:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        flags, tmdb_id, year = _FORMAT.unpack(raw)
+    except (binascii.Error, ValueError, struct.error):
+        return None
+    if flags >> 4 != _VERSION or tmdb_id == 0:
+        return None
+    return FilmRef(
+        tmdb_id=tmdb_id,
+        media_type="tv" if flags & _TV_FLAG else "movie",
+        year=year or None,
+    )
@@ -0,0 +1,120 @@
+"""Circuit breaker для внешних API.
+
+closed — запросы идут, подряд идущие сбои считаются; после failure_threshold сбоев
+подряд → open: запросы сразу отклоняются (CircuitOpenError), не дожидаясь таймаута.
+Через reset_timeout_sec → half_open: пропускаем пробный запрос; успех закрывает
+цепь, сбой снова открывает её. Состояние — в логах и метриках circuit.<name>.*.
+"""
+
+import logging
+import time
+from collections.abc import Callable
+from enum import Enum
+
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+_STATE_GAUGE = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Запрос отклонён: цепь разомкнута, апстрим считается недоступным."""
+
+    def __init__(self, name: str, retry_in_sec: float) -> None:
+        super().__init__(f"circuit '{name}' is open, retry in {retry_in_sec:.1f}s")
+        self.name = name
+        self.retry_in_sec = retry_in_sec
+
+
+class CircuitBreaker:
+    """Счётчик сбоев подряд с тремя состояниями; вызывающий сам сообщает об исходе."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout_sec: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if failure_threshold <= 0 or half_open_max_calls <= 0:
+            raise ValueError("failure_threshold and half_open_max_calls must be positive")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_sec = reset_timeout_sec
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        metrics.set_gauge(f"circuit.{name}.state", _STATE_GAUGE[self._state])
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state is CircuitState.OPEN
+            and self._clock() - self._opened_at >= self.reset_timeout_sec
+        ):
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state is CircuitState.OPEN
+
+    def before_call(self) -> None:
+        """Разрешить запрос или сразу отклонить его (CircuitOpenError)."""
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return
+        if state is CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return
+        metrics.incr(f"circuit.{self.name}.rejected")
+        retry_in = max(0.0, self.reset_timeout_sec - (self._clock() - self._opened_at))
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self) -> None:
+        self._failures = 0
+        if self._state is not CircuitState.CLOSED:
+            self._transition(CircuitState.CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        metrics.incr(f"circuit.{self.name}.failures")
+        if self._state is CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._transition(CircuitState.OPEN)
+
+    def record_ignored(self) -> None:
+        """Запрос завершился без вердикта (отменён) — освобождаем пробный слот."""
+        if self._state is CircuitState.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def _transition(self, state: CircuitState) -> None:
+        previous = self._state
+        self._state = state
+        self._half_open_calls = 0
+        if state is CircuitState.OPEN:
+            self._opened_at = self._clock()
+            metrics.incr(f"circuit.{self.name}.opened")
+            logger.warning(
+                "circuit %s: %s → open после %s сбоев подряд, запросы отклоняются %.0fs",
+                self.name,
+                previous.value,
+                self._failures,
+                self.reset_timeout_sec,
+            )
+        elif state is CircuitState.CLOSED:
+            logger.info("circuit %s: %s → closed, апстрим снова доступен", self.name, previous.value)
+        else:
+            logger.info("circuit %s: open → half_open, пробный запрос", self.name)
+        metrics.set_gauge(f"circuit.{self.name}.state", _STATE_GAUGE[state])
@@ -0,0 +1,11 @@
+"""Нормализация поисковых запросов для ключей кэша."""
+
+import re
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_search_query(query: str) -> str:
+    """Регистр, ё→е и пробелы не влияют на ключ: «  Ёлки  2 » и «елки 2» совпадают."""
+    text = query.casefold().replace("ё", "е")
+    return _WHITESPACE_RE.sub(" ", text).strip()
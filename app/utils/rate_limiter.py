@@ -0,0 +1,123 @@
+"""Token bucket с ограничением параллелизма и двумя полосами приоритета.
+
+Интерактивные запросы (хендлеры) идут первыми: фоновая полоса ждёт, пока есть
+интерактивные ожидающие, и никогда не занимает все слоты параллелизма.
+Полоса задаётся контекстом: `with background_priority(): ...` — действует и на
+задачи, созданные внутри блока.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+_current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "rate_limit_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Запросы внутри блока (и порождённых задач) идут по фоновой полосе."""
+    token = _current_priority.set(Priority.BACKGROUND)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+class TokenBucketLimiter:
+    """rate токенов/с, ёмкость burst, не более max_concurrency запросов одновременно."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_concurrency: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0 or burst <= 0 or max_concurrency <= 0:
+            raise ValueError("rate, burst and max_concurrency must be positive")
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        # Один слот всегда остаётся интерактивным запросам
+        self.background_max_concurrency = max(1, max_concurrency - 1)
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._active = 0
+        self._active_background = 0
+        self._waiting = {Priority.INTERACTIVE: 0, Priority.BACKGROUND: 0}
+        self._cond = asyncio.Condition()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _can_start(self, priority: Priority) -> bool:
+        if self._tokens < 1 or self._active >= self.max_concurrency:
+            return False
+        if priority is Priority.BACKGROUND:
+            if self._waiting[Priority.INTERACTIVE] > 0:
+                return False
+            if self._active_background >= self.background_max_concurrency:
+                return False
+        return True
+
+    @asynccontextmanager
+    async def acquire(self, priority: Priority | None = None) -> AsyncIterator[None]:
+        prio = current_priority() if priority is None else priority
+        await self._start(prio)
+        try:
+            yield
+        finally:
+            await self._finish(prio)
+
+    async def _start(self, priority: Priority) -> None:
+        async with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    if self._can_start(priority):
+                        break
+                    timeout = None
+                    if self._tokens < 1:
+                        timeout = (1 - self._tokens) / self.rate
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout)
+                    except TimeoutError:
+                        pass
+                self._tokens -= 1
+                self._active += 1
+                if priority is Priority.BACKGROUND:
+                    self._active_background += 1
+            finally:
+                self._waiting[priority] -= 1
+                # Фоновые ожидающие могли разблокироваться (интерактивных стало меньше)
+                self._cond.notify_all()
+
+    async def _finish(self, priority: Priority) -> None:
+        async with self._cond:
+            self._active -= 1
+            if priority is Priority.BACKGROUND:
+                self._active_background -= 1
+            self._cond.notify_all()
@@ -0,0 +1,244 @@
+"""Разбор названий релизов и ранжирование раздач.
+
+Все теги (разрешение, кодек, HDR, звук, язык, источник) вынимаются одним проходом
+одного скомпилированного регулярного выражения по названию в верхнем регистре:
+каждая альтернатива — именованная группа, тег берётся из `match.lastgroup`.
+Битрейт оценивается по размеру и длительности (если она неизвестна — по типичной).
+
+Оценка — взвешенная сумма, веса в ReleaseScoring (настраиваются через настройки).
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from pydantic import BaseModel
+
+# Граница тега: не буква/цифра (латиница и кириллица) — разделители ".", "_", " ", "-", "[" ...
+_L = r"(?<![0-9A-ZА-ЯЁ])"
+_R = r"(?![0-9A-ZА-ЯЁ])"
+
+# Порядок альтернатив важен: длинные теги раньше их префиксов (HDR10+ раньше HDR).
+_TAGS: tuple[tuple[str, str], ...] = (
+    ("res_2160p", r"2160P|4K|UHD"),
+    ("res_1080p", r"1080[PI]|FULL ?HD|FHD|1920X1080"),
+    ("res_720p", r"720P|1280X720"),
+    ("res_480p", r"480P|576P|SD|DVD(?:RIP|5|9)?"),
+    ("hdr_dv", r"DV|DOVI|DOLBY ?VISION"),
+    ("hdr_hdr10plus", r"HDR10\+|HDR10PLUS"),
+    ("hdr_hdr", r"HDR10|HDR"),
+    ("codec_hevc", r"HEVC|[HX]\.?265"),
+    ("codec_av1", r"AV1"),
+    ("codec_avc", r"AVC|[HX]\.?264"),
+    ("audio_atmos", r"ATMOS"),
+    ("audio_truehd", r"TRUEHD"),
+    ("audio_dts", r"DTS(?:-?HD(?: ?MA)?|-?X)?"),
+    ("audio_ddp", r"DDP(?:5\.1|7\.1)?|E-?AC-?3|DD\+"),
+    ("audio_ac3", r"AC-?3|DD ?5\.1"),
+    ("audio_aac", r"AAC"),
+    # iTunes — источник, а не язык; «.RU» после слова — домен трекера (KINOZAL.RU)
+    ("lang_rus", r"RUS|(?<![A-ZА-ЯЁ]\.)RU|ДУБЛЯЖ|DUB|MVO|DVO|ЛИЦЕНЗИЯ"),
+    ("lang_eng", r"ENG|EN|ORIGINAL"),
+    ("src_remux", r"B[DR]-?REMUX|REMUX"),
+    ("src_bluray", r"BLU-?RAY|BD-?RIP|BD"),
+    ("src_web", r"WEB-?DL(?:RIP)?|WEB-?RIP|WEB"),
+    ("src_hdtv", r"HDTV(?:RIP)?|SATRIP|TVRIP"),
+    ("src_cam", r"CAMRIP|CAM|TS|TELESYNC|HDTS|TC"),
+)
+
+# Опережающая проверка начала слова отсекает позиции внутри слов до перебора альтернатив
+_TAG_RE = re.compile(
+    _L
+    + "(?=[0-9A-ZА-ЯЁ])(?:"
+    + "|".join(f"(?P<{name}>{pattern})" for name, pattern in _TAGS)
+    + ")"
+    + _R
+)
+
+# Точное разрешение (1080p, 1920x1080) важнее «словесного» (UHD, 4K, FullHD, DVD)
+_EXPLICIT_RES_RE = re.compile(r"\d{3,4}[PI]|\d{3,4}X\d{3,4}")
+
+RESOLUTION_RANK = {"2160p": 3, "1080p": 2, "720p": 1, "480p": 0}
+
+# Типичная длительность, если фильм не знаем: для оценки битрейта по размеру
+DEFAULT_RUNTIME_MIN = 110
+
+
+@dataclass(frozen=True, slots=True)
+class ReleaseInfo:
+    """Что удалось вынуть из названия релиза (None — тега нет)."""
+
+    resolution: Optional[str] = None
+    codec: Optional[str] = None
+    hdr: Optional[str] = None
+    audio: frozenset[str] = frozenset()
+    languages: frozenset[str] = frozenset()
+    source: Optional[str] = None
+    bitrate_mbps: Optional[float] = None
+
+    @property
+    def tags(self) -> list[str]:
+        """Короткие метки для списка раздач: HEVC · HDR · Atmos · WEB."""
+        labels = []
+        if self.codec:
+            labels.append(self.codec.upper())
+        if self.hdr:
+            labels.append(self.hdr)
+        for audio in ("atmos", "truehd", "dts"):
+            if audio in self.audio:
+                labels.append(_AUDIO_LABELS[audio])
+                break
+        if self.source:
+            labels.append(_SOURCE_LABELS[self.source])
+        return labels
+
+
+_AUDIO_LABELS = {"atmos": "Atmos", "truehd": "TrueHD", "dts": "DTS"}
+_SOURCE_LABELS = {
+    "remux": "Remux",
+    "bluray": "BluRay",
+    "web": "WEB",
+    "hdtv": "HDTV",
+    "cam": "CAM",
+}
+_SOURCE_PRIORITY = {"cam": 0, "hdtv": 1, "web": 2, "bluray": 3, "remux": 4}
+_HDR_LABELS = {"dv": "DV", "hdr10plus": "HDR10+", "hdr": "HDR"}
+
+
+def parse_release(
+    title: str,
+    size_bytes: int = 0,
+    runtime_min: Optional[int] = None,
+) -> ReleaseInfo:
+    """Разобрать название релиза за один проход регулярного выражения.
+
+    Разрешение — первый точный тег (1080p), иначе первый словесный (UHD, FullHD); кодек —
+    первый найденный тег (в названии он обычно один), источник —
+    самый «сильный» (Remux > BluRay > WEB > HDTV > CAM), звук и языки собираются все.
+    Битрейт — по размеру и длительности.
+    """
+    resolution = codec = hdr = source = None
+    resolution_explicit = False
+    audio: set[str] = set()
+    languages: set[str] = set()
+    for match in _TAG_RE.finditer(title.upper()):
+        kind, _, value = match.lastgroup.partition("_")
+        if kind == "res":
+            # «WEB-DL FullHD 1080p» / «4K remaster 1080p»: точный тег перекрывает словесный
+            explicit = _EXPLICIT_RES_RE.fullmatch(match.group()) is not None
+            if resolution is None or (explicit and not resolution_explicit):
+                resolution = value
+                resolution_explicit = explicit
+        elif kind == "codec":
+            codec = codec or value
+        elif kind == "hdr":
+            # DV и HDR10+ важнее простого HDR, если указаны оба
+            if hdr is None or hdr == "hdr":
+                hdr = value
+        elif kind == "audio":
+            audio.add(value)
+        elif kind == "lang":
+            languages.add(value)
+        elif kind == "src":
+            # «UHD.BluRay.REMUX» — это Remux; CAM не перекрывает «настоящий» источник
+            if source is None or _SOURCE_PRIORITY[value] > _SOURCE_PRIORITY[source]:
+                source = value
+
+    bitrate = None
+    if size_bytes > 0:
+        seconds = (runtime_min or DEFAULT_RUNTIME_MIN) * 60
+        bitrate = round(size_bytes * 8 / seconds / 1_000_000, 2)
+
+    return ReleaseInfo(
+        resolution=resolution,
+        codec=codec,
+        hdr=_HDR_LABELS.get(hdr) if hdr else None,
+        audio=frozenset(audio),
+        languages=frozenset(languages),
+        source=source,
+        bitrate_mbps=bitrate,
+    )
+
+
+class ReleaseScoring(BaseModel):
+    """Веса оценки раздачи; больше — выше в списке.
+
+    В настройках задаётся JSON-ом (RELEASE_SCORING='{"prefer_resolution": "2160p"}'),
+    незаданные поля берутся по умолчанию.
+    """
+
+    min_resolution: str = "720p"
+    prefer_resolution: str = "1080p"
+    # За каждую ступень разрешения от предпочтительного
+    resolution_step_penalty: float = 15.0
+    resolution_match_bonus: float = 40.0
+    unknown_resolution_bonus: float = 10.0
+    codec_bonus: dict[str, float] = {"hevc": 5.0, "av1": 3.0, "avc": 0.0}
+    hdr_bonus: float = 3.0
+    audio_bonus: dict[str, float] = {
+        "atmos": 3.0,
+        "truehd": 3.0,
+        "dts": 2.0,
+        "ddp": 1.0,
+        "ac3": 0.5,
+    }
+    russian_audio_bonus: float = 15.0
+    # Remux — исходный диск без пережатия, выше BDRip; за объём отвечают
+    # max_size_gb / oversize_penalty, а не заниженный бонус источника
+    source_bonus: dict[str, float] = {
+        "remux": 10.0,
+        "bluray": 8.0,
+        "web": 6.0,
+        "hdtv": 0.0,
+        "cam": -100.0,
+    }
+    # log2(1 + сиды): 1→10, 7→30, 63→60 — сотня сидов не перевешивает качество
+    seeders_weight: float = 10.0
+    no_seeders_penalty: float = 30.0
+    # Битрейт ниже минимума для разрешения — пережатый рип
+    min_bitrate_mbps: dict[str, float] = {"2160p": 10.0, "1080p": 3.0, "720p": 1.5}
+    low_bitrate_penalty: float = 20.0
+    max_size_gb: float = 80.0
+    oversize_penalty: float = 25.0
+
+    def accepts(self, info: ReleaseInfo) -> bool:
+        """Отсеять раздачи ниже минимального разрешения и экранки.
+
+        Без распознанного разрешения раздача остаётся: это может быть и HD.
+        """
+        if info.source == "cam":
+            return False
+        if info.resolution is None:
+            return True
+        return RESOLUTION_RANK[info.resolution] >= RESOLUTION_RANK.get(self.min_resolution, 1)
+
+    def score(self, info: ReleaseInfo, seeders: int, size_bytes: int) -> float:
+        total = 0.0
+        if info.resolution is None:
+            total += self.unknown_resolution_bonus
+        else:
+            steps = abs(
+                RESOLUTION_RANK[info.resolution] - RESOLUTION_RANK.get(self.prefer_resolution, 2)
+            )
+            total += self.resolution_match_bonus - steps * self.resolution_step_penalty
+            min_bitrate = self.min_bitrate_mbps.get(info.resolution)
+            if min_bitrate and info.bitrate_mbps is not None and info.bitrate_mbps < min_bitrate:
+                total -= self.low_bitrate_penalty
+        if info.codec:
+            total += self.codec_bonus.get(info.codec, 0.0)
+        if info.hdr:
+            total += self.hdr_bonus
+        if info.audio:
+            total += max(self.audio_bonus.get(a, 0.0) for a in info.audio)
+        if "rus" in info.languages:
+            total += self.russian_audio_bonus
+        if info.source:
+            total += self.source_bonus.get(info.source, 0.0)
+        if seeders > 0:
+            total += self.seeders_weight * math.log2(1 + seeders)
+        else:
+            total -= self.no_seeders_penalty
+        if size_bytes > self.max_size_gb * 1024**3:
+            total -= self.oversize_penalty
+        return round(total, 2)
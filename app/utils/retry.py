@@ -0,0 +1,143 @@
+"""Повтор идемпотентных GET-запросов при временных сбоях.
+
+Повторяем сетевые ошибки и ответы 429/502/503/504. Паузы — decorrelated jitter
+(min(cap, U(base, 3·prev))), для 429/503 с Retry-After — столько, сколько просит
+сервер. Общий дедлайн ограничивает суммарное время: если следующая попытка не
+успевает, возвращаем последний ответ / пробрасываем последнюю ошибку.
+Метрики: retry.<name>.retried / .recovered / .exhausted.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+def parse_retry_after(value: str | None, now: datetime | None = None) -> float | None:
+    """Retry-After в секундах: число секунд или HTTP-дата; None — заголовка нет или он битый."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    current = now or datetime.now(timezone.utc)
+    return max(0.0, (when - current).total_seconds())
+
+
+class RetryPolicy:
+    """Настройки повторов для одного вида запросов (эндпоинта)."""
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 3,
+        base_delay_sec: float = 0.3,
+        max_delay_sec: float = 5.0,
+        deadline_sec: float = 15.0,
+        retry_on_timeout: bool = True,
+        retry_statuses: frozenset[int] = RETRY_STATUSES,
+        *,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        rng: random.Random | None = None,
+    ) -> None:
+        if max_attempts <= 0:
+            raise ValueError("max_attempts must be positive")
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay_sec = base_delay_sec
+        self.max_delay_sec = max_delay_sec
+        self.deadline_sec = deadline_sec
+        self.retry_on_timeout = retry_on_timeout
+        self.retry_statuses = retry_statuses
+        self._sleep = sleep
+        self._clock = clock
+        self._rng = rng or random.Random()
+
+    def _is_retryable_error(self, error: Exception) -> bool:
+        if isinstance(error, httpx.TimeoutException):
+            return self.retry_on_timeout
+        return isinstance(error, httpx.TransportError)
+
+    def _backoff(self, previous: float) -> float:
+        upper = max(self.base_delay_sec, previous * 3)
+        return min(self.max_delay_sec, self._rng.uniform(self.base_delay_sec, upper))
+
+    async def run(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """Выполнить send() с повторами; возвращает последний ответ (в т.ч. неуспешный)."""
+        started = self._clock()
+        delay = self.base_delay_sec
+        attempt = 1
+        while True:
+            error: Exception | None = None
+            response: httpx.Response | None = None
+            try:
+                response = await send()
+            except Exception as e:
+                if not self._is_retryable_error(e) or attempt >= self.max_attempts:
+                    if attempt > 1:
+                        metrics.incr(f"retry.{self.name}.exhausted")
+                    raise
+                error = e
+            if response is not None:
+                if response.status_code not in self.retry_statuses:
+                    if attempt > 1:
+                        metrics.incr(f"retry.{self.name}.recovered")
+                    return response
+                if attempt >= self.max_attempts:
+                    metrics.incr(f"retry.{self.name}.exhausted")
+                    return response
+
+            delay = self._backoff(delay)
+            wait = delay
+            if response is not None:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is not None:
+                    wait = retry_after
+                reason = f"HTTP {response.status_code}"
+            else:
+                reason = type(error).__name__
+
+            remaining = self.deadline_sec - (self._clock() - started)
+            if wait >= remaining:
+                metrics.incr(f"retry.{self.name}.exhausted")
+                logger.warning(
+                    "retry %s: %s, пауза %.1fs не укладывается в дедлайн — сдаёмся после попыток: %s",
+                    self.name,
+                    reason,
+                    wait,
+                    attempt,
+                )
+                if response is not None:
+                    return response
+                raise error
+            metrics.incr(f"retry.{self.name}.retried")
+            logger.info(
+                "retry %s: %s, попытка %s/%s через %.2fs",
+                self.name,
+                reason,
+                attempt + 1,
+                self.max_attempts,
+                wait,
+            )
+            await self._sleep(wait)
+            attempt += 1
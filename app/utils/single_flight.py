@@ -0,0 +1,59 @@
+"""Single-flight: одновременные одинаковые вызовы ждут один запрос вместо N параллельных."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+from app.services.metrics import metrics
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class SingleFlight(Generic[K, V]):
+    """Группа вызовов по ключу: первый выполняет запрос, остальные ждут его результат.
+
+    Результат не кэшируется — после завершения следующий вызов снова идёт в апстрим.
+    Метрики: singleflight.<name>.executed / singleflight.<name>.coalesced.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._inflight: dict[K, asyncio.Future[V]] = {}
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        existing = self._inflight.get(key)
+        if existing is not None:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+            # shield: отмена ожидающего не должна отменять общий запрос
+            try:
+                return await asyncio.shield(existing)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not existing.cancelled() or (task is not None and task.cancelling()):
+                    raise
+                # Отменили лидера, а не нас — выполняем запрос сами
+                return await self.do(key, fn)
+
+        future: asyncio.Future[V] = asyncio.get_running_loop().create_future()
+        # Исключение может никто не прочитать (нет ожидающих) — не шумим в лог asyncio
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        metrics.incr(f"singleflight.{self.name}.executed")
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
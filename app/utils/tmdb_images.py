@@ -0,0 +1,26 @@
+"""Адреса постеров TMDB: общий базовый URL для сервисов и репозиториев."""
+
+from typing import Optional
+
+TMDB_IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
+# Длина recommended_film_cards.poster_path
+POSTER_PATH_MAX_LEN = 100
+
+
+def tmdb_poster_path(url: Optional[str]) -> Optional[str]:
+    """Полный URL постера TMDB → путь (/abc.jpg); чужой или слишком длинный URL → None."""
+    if not url or not url.startswith(TMDB_IMAGE_BASE_URL):
+        return None
+    path = url[len(TMDB_IMAGE_BASE_URL):]
+    if not path.startswith("/") or len(path) > POSTER_PATH_MAX_LEN:
+        return None
+    return path
+
+
+def poster_url(poster_path: Optional[str]) -> Optional[str]:
+    """Путь TMDB (/abc.jpg) → полный URL; уже полный URL возвращается как есть."""
+    if not poster_path:
+        return None
+    if poster_path.startswith("http"):
+        return poster_path
+    return f"{TMDB_IMAGE_BASE_URL}{poster_path}"
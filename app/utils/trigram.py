@@ -0,0 +1,28 @@
+"""Триграммное сходство строк — то же, что similarity() из pg_trgm.
+
+Используется как in-process замена pg_trgm на SQLite: слова дополняются
+двумя пробелами слева и одним справа, сходство — доля общих триграмм.
+"""
+
+import re
+
+from app.utils.query import normalize_search_query
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+
+def trigrams(text: str) -> frozenset[str]:
+    words = _NON_WORD_RE.sub(" ", normalize_search_query(text)).split()
+    out: set[str] = set()
+    for word in words:
+        padded = f"  {word} "
+        out.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(out)
+
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    """Сходство двух наборов триграмм (0..1)."""
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
@@ -0,0 +1,93 @@
+"""Ограниченный по размеру in-memory кэш с LRU-вытеснением и TTL на запись."""
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """LRU + TTL: при переполнении вытесняется давно не читанная запись, просроченные — при обращении.
+
+    on_evict(key, value) вызывается для каждой ушедшей записи (вытеснение, истечение,
+    замена, pop, clear) — для учёта памяти снаружи. Не потокобезопасен — рассчитан на один event loop.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+        on_evict: Callable[[K, V], None] | None = None,
+    ) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._on_evict = on_evict
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> V | None:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= self._clock():
+            del self._data[key]
+            self._evicted(key, value)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        previous = self._data.get(key)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        if previous is not None:
+            self._evicted(key, previous[1])
+        while len(self._data) > self.maxsize:
+            old_key, (_, old_value) = self._data.popitem(last=False)
+            self._evicted(old_key, old_value)
+
+    def pop(self, key: K) -> V | None:
+        item = self._data.pop(key, None)
+        if item is None:
+            return None
+        self._evicted(key, item[1])
+        return item[1]
+
+    def clear(self) -> None:
+        items = list(self._data.items())
+        self._data.clear()
+        for key, (_, value) in items:
+            self._evicted(key, value)
+
+    def purge_expired(self) -> int:
+        """Удалить все просроченные записи (O(n)); сколько удалено."""
+        now = self._clock()
+        expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            _, value = self._data.pop(key)
+            self._evicted(key, value)
+        return len(expired)
+
+    def _evicted(self, key: K, value: V) -> None:
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+
+    def __contains__(self, key: object) -> bool:
+        item = self._data.get(key)  # type: ignore[arg-type]
+        return item is not None and item[0] > self._clock()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,95 @@
+"""Micro-benchmark: release-title parsing and ranking of Prowlarr results.
+
+Usage:
+    python bench_release_parser.py
+    python bench_release_parser.py --releases 500 --rounds 200
+
+Compares the compiled single-pass parser (app.utils.release) with the former
+resolution-only parser and with per-tag re.search calls over the same tag set,
+on the title corpus in tests/data/release_titles.txt.
+"""
+
+import argparse
+import random
+import re
+import time
+from pathlib import Path
+
+from app.utils.release import _TAGS, ReleaseScoring, parse_release
+
+CORPUS = Path(__file__).parent / "tests" / "data" / "release_titles.txt"
+
+
+def legacy_resolution(title: str) -> str | None:
+    """Former ProwlarrService._extract_resolution: up to four uncompiled searches."""
+    title_upper = title.upper()
+    if re.search(r'\b(2160P|4K|UHD)\b', title_upper):
+        return '2160p'
+    if re.search(r'\b(1080P|FULLHD|FHD|1920X1080)\b', title_upper):
+        return '1080p'
+    if re.search(r'\b(720P|HD|1280X720)\b', title_upper):
+        return '720p'
+    if re.search(r'\b(480P|SD|DVD)\b', title_upper):
+        return '480p'
+    return None
+
+
+def per_tag_search(title: str) -> list[str]:
+    """The same tags as parse_release, one re.search per tag (the former style)."""
+    title_upper = title.upper()
+    return [name for name, pattern in _TAGS if re.search(rf"\b({pattern})\b", title_upper)]
+
+
+def bench(name: str, fn, releases: list[tuple[str, int, int]], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(releases)
+    elapsed = time.perf_counter() - started
+    per_search_ms = elapsed / rounds * 1000
+    per_release_us = elapsed / (rounds * len(releases)) * 1_000_000
+    print(f"{name:<28} {per_search_ms:8.3f} ms/search  {per_release_us:7.2f} µs/release")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--releases", type=int, default=300, help="Releases per search")
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+
+    titles = [line for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    rng = random.Random(42)
+    releases = [
+        (rng.choice(titles), rng.randint(1, 80) * 1024**3, rng.randint(0, 300))
+        for _ in range(args.releases)
+    ]
+    scoring = ReleaseScoring()
+
+    def legacy(batch):
+        parsed = [(title, legacy_resolution(title), seeders) for title, _, seeders in batch]
+        return sorted(parsed, key=lambda r: r[2], reverse=True)[:10]
+
+    def per_tag(batch):
+        return [per_tag_search(title) for title, _, _ in batch]
+
+    def parse_only(batch):
+        return [parse_release(title, size) for title, size, _ in batch]
+
+    def parse_and_rank(batch):
+        scored = []
+        for title, size, seeders in batch:
+            info = parse_release(title, size)
+            if scoring.accepts(info):
+                scored.append((scoring.score(info, seeders, size), seeders, title))
+        scored.sort(reverse=True)
+        return scored[:10]
+
+    print(f"{len(titles)} distinct titles, {args.releases} releases/search, {args.rounds} rounds")
+    bench("legacy resolution + sort", legacy, releases, args.rounds)
+    bench("per-tag re.search, all tags", per_tag, releases, args.rounds)
+    bench("parse_release (single pass)", parse_only, releases, args.rounds)
+    bench("parse_release + score + rank", parse_and_rank, releases, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
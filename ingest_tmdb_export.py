@@ -0,0 +1,60 @@
+"""Load a TMDB daily ID export (movie_ids / tv_series_ids .json.gz) into tmdb_catalog.
+
+Usage:
+    python ingest_tmdb_export.py movie_ids_05_15_2025.json.gz
+    python ingest_tmdb_export.py export.json.gz --media-type tv --batch-size 10000
+
+--batch-size is rows per transaction; each INSERT is split into chunks that stay
+under the Postgres limit of 32767 bind parameters per statement.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import get_settings
+from app.services.tmdb_catalog import TMDBCatalogIngest, media_type_from_filename
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def ingest(path: Path, media_type: str, batch_size: int) -> None:
+    """Ingest one export file and log throughput."""
+    settings = get_settings()
+    engine = create_async_engine(settings.database_url, echo=False)
+    try:
+        session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        report = await TMDBCatalogIngest(session_factory, batch_size=batch_size).ingest_file(
+            path, media_type
+        )
+        print(
+            f"{path.name}: {report.rows} rows, {report.skipped} skipped, "
+            f"{report.duration_sec:.1f}s, {report.rows_per_sec:.0f} rows/sec"
+        )
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path, help="Export file (.json.gz or plain .json)")
+    parser.add_argument("--media-type", choices=["movie", "tv"], default=None)
+    parser.add_argument("--batch-size", type=int, default=settings.tmdb_catalog_batch_size)
+    args = parser.parse_args()
+
+    media_type = args.media_type or media_type_from_filename(args.path)
+    if media_type is None:
+        logger.error("Cannot infer media type from %s, pass --media-type", args.path.name)
+        return 2
+    asyncio.run(ingest(args.path, media_type, args.batch_size))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
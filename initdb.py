@@ -2,18 +2,70 @@
 
 import asyncio
 import logging
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import text
+from sqlalchemy import func, text
+from sqlalchemy.dialects import postgresql
 
 from app.config import get_settings
-from app.db.models import Base
+from app.db.models import Base, FilmRecommendationSource
+from app.db.repositories.recommendation_cache import encode_media_types
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+async def _migrate_legacy_recommendation_cache(conn: AsyncConnection) -> None:
+    """Перенести film_recommendation_cache (строка на рекомендацию) в film_recommendation_sources
+    (массив id + битовая маска типов) и удалить старую таблицу.
+
+    Переносятся только источники, у которых списка в новом формате ещё нет; время
+    загрузки сохраняется, так что обычный TTL-тик обновит их в свой черёд, а не все сразу.
+    """
+    exists = await conn.scalar(text("SELECT to_regclass('film_recommendation_cache') IS NOT NULL"))
+    if not exists:
+        return
+    rows = await conn.execute(text(
+        "SELECT source_film_id, recommended_external_id, recommended_media_type, fetched_at "
+        "FROM film_recommendation_cache ORDER BY source_film_id, position, id"
+    ))
+    lists: dict[int, list[tuple[int, str]]] = defaultdict(list)
+    fetched: dict[int, datetime] = {}
+    for source_film_id, external_id, media_type, fetched_at in rows:
+        if not str(external_id).isdigit():
+            continue
+        lists[source_film_id].append((int(external_id), media_type))
+        if fetched_at and (source_film_id not in fetched or fetched_at > fetched[source_film_id]):
+            fetched[source_film_id] = fetched_at
+
+    table = FilmRecommendationSource.__table__
+    for film_id, recs in lists.items():
+        values = {
+            "recommended_ids": [external_id for external_id, _ in recs],
+            "recommended_tv_mask": encode_media_types([media_type for _, media_type in recs]),
+        }
+        stmt = postgresql.insert(table).values(
+            film_id=film_id, fetched_at=fetched.get(film_id), **values
+        )
+        await conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["film_id"],
+                set_={
+                    **values,
+                    "fetched_at": func.coalesce(table.c.fetched_at, stmt.excluded.fetched_at),
+                },
+                where=table.c.recommended_ids.is_(None),
+            )
+        )
+    await conn.execute(text("DROP TABLE film_recommendation_cache"))
+    logger.info(
+        "film_recommendation_cache: перенесено источников: %d, старая таблица удалена", len(lists)
+    )
+
+
 async def init_database():
     """Initialize database: create tables if they don't exist."""
     settings = get_settings()
@@ -35,8 +87,29 @@ async def init_database():
                 END $$;
             """))
             
+            # pg_trgm нужен для GIN-индексов нечёткого поиска по названиям
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
             # Создаем все таблицы из моделей
             await conn.run_sync(Base.metadata.create_all)
+
+            # create_all не добавляет колонки и индексы в уже существующие таблицы
+            await conn.execute(text(
+                "ALTER TABLE film_recommendation_sources "
+                "ADD COLUMN IF NOT EXISTS recommended_ids INTEGER[], "
+                "ADD COLUMN IF NOT EXISTS recommended_tv_mask BYTEA, "
+                "ADD COLUMN IF NOT EXISTS failure_count INTEGER NOT NULL DEFAULT 0, "
+                "ADD COLUMN IF NOT EXISTS retry_at TIMESTAMP WITHOUT TIME ZONE"
+            ))
+            await _migrate_legacy_recommendation_cache(conn)
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_films_title_trgm "
+                "ON films USING gin (title gin_trgm_ops)"
+            ))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_films_title_original_trgm "
+                "ON films USING gin (title_original gin_trgm_ops)"
+            ))
             
             logger.info("Database schema is ready!")
             
@@ -58,6 +58,17 @@ async def db_session(db_engine):
         await session.rollback()
 
 
+@pytest.fixture
+def required_env(monkeypatch):
+    """Set the env vars Settings requires so get_settings() works in tests.
+
+    Args:
+        monkeypatch: pytest monkeypatch fixture
+    """
+    for name in ("BOT_TOKEN", "TMDB_API_KEY", "PROWLARR_URL", "PROWLARR_API_KEY", "DATABASE_URL"):
+        monkeypatch.setenv(name, "http://x")
+
+
 @pytest.fixture
 def mock_tmdb_search_results():
     """Mock TMDB search results."""
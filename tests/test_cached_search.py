@@ -0,0 +1,144 @@
+"""Тесты CachedFilmSearch: кэш поиска в памяти и карточек TMDB в БД."""
+
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import FilmDetailsCache
+from app.services.cached_search import CachedFilmSearch
+from app.services.dto import FilmSearchResult
+from app.utils.background import BackgroundTasks
+from app.utils.query import normalize_search_query
+
+
+def _details(title: str = "Бойцовский клуб") -> FilmSearchResult:
+    return FilmSearchResult(
+        external_id="550",
+        source="tmdb",
+        title=title,
+        title_original="Fight Club",
+        year=1999,
+        media_type="movie",
+        duration="02:19",
+        director="David Fincher",
+    )
+
+
+def _make(db_engine, inner, tasks=None) -> CachedFilmSearch:
+    return CachedFilmSearch(
+        inner,
+        async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False),
+        details_fresh_ttl=timedelta(hours=1),
+        details_stale_ttl=timedelta(days=1),
+        tasks=tasks,
+    )
+
+
+@pytest.mark.asyncio
+async def test_miss_fetches_and_stores_then_hits(db_engine, db_session: AsyncSession):
+    inner = AsyncMock()
+    inner.get_details = AsyncMock(return_value=_details())
+    cached = _make(db_engine, inner)
+
+    first = await cached.get_details("550", "movie")
+    second = await cached.get_details("550", "movie")
+
+    assert first.director == "David Fincher"
+    assert second == first
+    inner.get_details.assert_awaited_once_with("550", "movie")
+    rows = (await db_session.execute(select(FilmDetailsCache))).scalars().all()
+    assert len(rows) == 1
+    assert rows[0].language == "ru"
+
+
+@pytest.mark.asyncio
+async def test_stale_served_immediately_and_refreshed_in_background(
+    db_engine, db_session: AsyncSession
+):
+    db_session.add(
+        FilmDetailsCache(
+            source="tmdb",
+            external_id="550",
+            media_type="movie",
+            language="ru",
+            title="Старое название",
+            fetched_at=datetime.utcnow() - timedelta(hours=5),
+        )
+    )
+    await db_session.commit()
+
+    inner = AsyncMock()
+    inner.get_details = AsyncMock(return_value=_details("Новое название"))
+    tasks = BackgroundTasks()
+    cached = _make(db_engine, inner, tasks)
+
+    served = await cached.get_details("550", "movie")
+    assert served.title == "Старое название"
+
+    await tasks.drain()
+    inner.get_details.assert_awaited_once()
+    refreshed = await cached.get_details("550", "movie")
+    assert refreshed.title == "Новое название"
+    assert inner.get_details.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_used_when_provider_fails(db_engine, db_session: AsyncSession):
+    db_session.add(
+        FilmDetailsCache(
+            source="tmdb",
+            external_id="550",
+            media_type="movie",
+            language="ru",
+            title="Очень старое",
+            fetched_at=datetime.utcnow() - timedelta(days=30),
+        )
+    )
+    await db_session.commit()
+
+    inner = AsyncMock()
+    inner.get_details = AsyncMock(return_value=None)
+    served = await _make(db_engine, inner).get_details("550", "movie")
+
+    assert served is not None
+    assert served.title == "Очень старое"
+
+
+def test_normalize_search_query():
+    assert normalize_search_query("  Ёлки \t 2 ") == "елки 2"
+    assert normalize_search_query("FIGHT   Club") == "fight club"
+
+
+@pytest.mark.asyncio
+async def test_search_cached_by_normalized_query(db_engine, mock_tmdb_search_results):
+    inner = AsyncMock()
+    inner.search = AsyncMock(return_value=mock_tmdb_search_results)
+    cached = _make(db_engine, inner)
+
+    first = await cached.search("Бойцовский клуб", "ru")
+    second = await cached.search("  бойцовский   КЛУБ ", "ru")
+
+    assert first == second == mock_tmdb_search_results
+    inner.search.assert_awaited_once_with("Бойцовский клуб", "ru")
+
+    await cached.search("Бойцовский клуб", "en")
+    assert inner.search.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_search_caches_empty_but_not_errors(db_engine):
+    inner = AsyncMock()
+    inner.search = AsyncMock(return_value=[])
+    cached = _make(db_engine, inner)
+
+    assert await cached.search("фывапролд", "ru") == []
+    assert await cached.search("фывапролд", "ru") == []
+    assert inner.search.await_count == 1
+
+    inner.search = AsyncMock(return_value=None)
+    assert await cached.search("ошибка", "ru") is None
+    assert await cached.search("ошибка", "ru") is None
+    assert inner.search.await_count == 2
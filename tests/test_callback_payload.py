@@ -0,0 +1,72 @@
+"""Компактная ссылка на фильм в callback_data кнопки «Скачать»."""
+
+import pytest
+
+from app.keyboards.inline import (
+    CALLBACK_DATA_MAX_BYTES,
+    build_download_search_data,
+    parse_download_search_data,
+)
+from app.utils.callback_payload import (
+    PAYLOAD_LEN,
+    FilmRef,
+    pack_film_ref,
+    unpack_film_ref,
+)
+
+
+@pytest.mark.parametrize(
+    "ref",
+    [
+        FilmRef(603, "movie", 1999),
+        FilmRef(1399, "tv", 2011),
+        FilmRef(550, "movie", None),
+        FilmRef(2**32 - 1, "tv", 2**16 - 1),
+    ],
+)
+def test_round_trip(ref):
+    payload = pack_film_ref(ref)
+    assert len(payload) == PAYLOAD_LEN
+    assert unpack_film_ref(payload) == ref
+
+
+def test_payload_is_url_safe():
+    payload = pack_film_ref(FilmRef(2**32 - 1, "tv", 2**16 - 1))
+    assert all(c.isalnum() or c in "-_" for c in payload)
+
+
+@pytest.mark.parametrize("ref", [FilmRef(0), FilmRef(2**32), FilmRef(1, year=2**16)])
+def test_pack_rejects_out_of_range(ref):
+    with pytest.raises(ValueError):
+        pack_film_ref(ref)
+
+
+@pytest.mark.parametrize("payload", ["", "12345", "!!!!!!!!!!", "AAAAAAAAAA", "фильмфильм"])
+def test_unpack_rejects_foreign_payload(payload):
+    assert unpack_film_ref(payload) is None
+
+
+def test_download_callback_data_fits_telegram_limit():
+    data = build_download_search_data("4294967295", "tv", 2024, refresh=True)
+    assert data.startswith("download_refresh:")
+    assert len(data.encode()) <= CALLBACK_DATA_MAX_BYTES
+    assert parse_download_search_data(data) == FilmRef(4294967295, "tv", 2024)
+
+
+def test_parse_download_search_data_ignores_legacy_formats():
+    # Номер в старом кэше в памяти и title:year
+    assert parse_download_search_data("download_search:12345") is None
+    assert parse_download_search_data("download_search:Матрица:1999") is None
+
+
+def test_non_numeric_id_falls_back_to_title_year():
+    # Не-TMDB источник: клавиатура не падает, в кнопке прежний формат title:year
+    title = "Очень длинное название: фильм, которое не влезает в лимит кнопки Telegram"
+    data = build_download_search_data("kp-42", "movie", 2021, title)
+    assert data.startswith("download_search:")
+    assert data.endswith(":2021")
+    assert data.count(":") == 2
+    assert parse_download_search_data(data) is None
+    refresh = build_download_search_data("kp-42", "movie", None, title, refresh=True)
+    assert refresh.startswith("download_refresh:") and refresh.endswith(":0")
+    assert len(refresh.encode()) <= CALLBACK_DATA_MAX_BYTES
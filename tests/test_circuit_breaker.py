@@ -0,0 +1,58 @@
+"""Тесты circuit breaker."""
+
+import pytest
+
+from app.services.metrics import metrics
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    clock = FakeClock()
+    breaker = CircuitBreaker("t1", failure_threshold=3, reset_timeout_sec=10, clock=clock)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # успех сбрасывает счётчик
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+    assert metrics.get("circuit.t1.state") == 2
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.before_call()
+    assert exc.value.retry_in_sec == pytest.approx(10)
+    assert metrics.get("circuit.t1.rejected") >= 1
+
+
+def test_half_open_probe_closes_or_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker("t2", failure_threshold=1, reset_timeout_sec=5, clock=clock)
+    breaker.record_failure()
+    assert breaker.is_open
+
+    clock.now = 5
+    assert breaker.state is CircuitState.HALF_OPEN
+    breaker.before_call()  # единственный пробный запрос
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+
+    clock.now = 10
+    breaker.before_call()
+    breaker.record_ignored()  # проба отменена — слот освобождается
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state is CircuitState.CLOSED
+    assert metrics.get("circuit.t2.state") == 0
+    breaker.before_call()
@@ -1,11 +1,15 @@
 """Tests for FilmService."""
 
+import contextlib
+
 import pytest
 from unittest.mock import AsyncMock
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.services.film import FilmService
-from app.services.dto import FilmCreate
+from app.services.film import FilmService, enrich_film_details
+from app.db.repositories import FilmRecommendationCacheRepository
+from app.services.dto import FilmBundle, FilmCreate, FilmSearchResult
+from app.utils.trigram import similarity, trigrams
 
 
 @pytest.mark.asyncio
@@ -55,3 +59,152 @@ async def test_search_films(db_session: AsyncSession, mock_tmdb_search_results):
     assert len(results) == 1
     assert results[0].title == "Бойцовский клуб"
     mock_provider.search.assert_called_once_with("Fight Club", "ru")
+
+
+@pytest.mark.asyncio
+async def test_resolve_film_data_local_first(db_engine, db_session: AsyncSession):
+    """Known films are resolved from the DB; unknown ones with one bundled call."""
+    remote = FilmSearchResult(
+        external_id="551",
+        source="tmdb",
+        title="Remote",
+        media_type="movie",
+        duration="02:19",
+        director="David Fincher",
+    )
+    mock_provider = AsyncMock()
+    mock_provider.fetch_bundle.return_value = FilmBundle(
+        details=remote,
+        recommendations=[FilmSearchResult(external_id="600", title="Rec", media_type="movie")],
+    )
+    service = FilmService(db_session, mock_provider)
+
+    complete = await service.get_or_create_film(
+        FilmCreate(
+            external_id="550", source="tmdb", title="Local",
+            duration="02:19", director="David Fincher",
+        )
+    )
+    partial = await service.get_or_create_film(
+        FilmCreate(external_id="551", source="tmdb", title="Partial")
+    )
+    await db_session.commit()
+
+    resolved = await service.resolve_film_data("550", "movie")
+    assert resolved.film.title == "Local"
+    assert resolved.needs_enrichment is False
+    assert resolved.recommendations is None
+    mock_provider.fetch_bundle.assert_not_called()
+
+    resolved = await service.resolve_film_data("551", "movie")
+    assert resolved.film.title == "Partial"
+    assert resolved.needs_enrichment is True
+    mock_provider.fetch_bundle.assert_not_called()
+
+    resolved = await service.resolve_film_data("552", "movie")
+    assert resolved.film.title == "Remote"
+    assert resolved.needs_enrichment is False
+    assert [r.external_id for r in resolved.recommendations] == ["600"]
+    mock_provider.fetch_bundle.assert_awaited_once_with("552", "movie")
+
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    await enrich_film_details(factory, mock_provider, partial.id)
+    await enrich_film_details(factory, mock_provider, complete.id)
+    assert mock_provider.fetch_bundle.await_count == 2
+    mock_provider.get_details.assert_not_called()
+
+    # Сериалу режиссёр не нужен: TMDB не отдаёт его в crew, иначе enrich шёл бы при каждом confirm
+    await service.get_or_create_film(
+        FilmCreate(
+            external_id="553", source="tmdb", title="Show", media_type="tv", duration="00:45"
+        )
+    )
+    await db_session.commit()
+    resolved = await service.resolve_film_data("553", "tv")
+    assert resolved.needs_enrichment is False
+
+    await db_session.refresh(partial)
+    assert partial.title == "Partial"
+    assert partial.duration == "02:19"
+    assert partial.director == "David Fincher"
+    # Рекомендации пришли тем же запросом и уже лежат в кэше
+    lists = await FilmRecommendationCacheRepository(db_session).lists_for_source_film_ids([partial.id])
+    assert lists[partial.id] == [("600", "movie")]
+
+
+@pytest.mark.asyncio
+async def test_enrich_does_not_hold_session_during_provider_call(db_engine, db_session: AsyncSession):
+    """The DB session is closed while TMDB is queried; changes are written in a new one."""
+    service = FilmService(db_session, AsyncMock())
+    film = await service.get_or_create_film(
+        FilmCreate(external_id="560", source="tmdb", title="Partial")
+    )
+    await db_session.commit()
+    maker = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    open_sessions = 0
+
+    @contextlib.asynccontextmanager
+    async def factory():
+        nonlocal open_sessions
+        open_sessions += 1
+        try:
+            async with maker() as session:
+                yield session
+        finally:
+            open_sessions -= 1
+
+    async def fake_bundle(external_id, media_type, pages=1):
+        assert open_sessions == 0
+        return FilmBundle(
+            details=FilmSearchResult(
+                external_id="560", title="Remote", media_type="movie",
+                duration="01:30", director="Someone",
+            ),
+            recommendations=[],
+        )
+
+    provider = AsyncMock()
+    provider.fetch_bundle = AsyncMock(side_effect=fake_bundle)
+    await enrich_film_details(factory, provider, film.id)
+
+    await db_session.refresh(film)
+    assert (film.duration, film.director) == ("01:30", "Someone")
+
+
+@pytest.mark.asyncio
+async def test_search_local_fuzzy_ranking(db_session: AsyncSession):
+    """Local search ranks known films by trigram similarity without the provider."""
+    mock_provider = AsyncMock()
+    service = FilmService(db_session, mock_provider)
+    for external_id, title, original in [
+        ("550", "Бойцовский клуб", "Fight Club"),
+        ("551", "Клуб «Завтрак»", "The Breakfast Club"),
+        ("552", "Ёлки", None),
+    ]:
+        await service.get_or_create_film(
+            FilmCreate(external_id=external_id, source="tmdb", title=title, title_original=original)
+        )
+    await db_session.commit()
+
+    results, best = await service.search_local("бойцовский  клуб")
+    assert results[0].external_id == "550"
+    assert best == 1.0
+
+    results, best = await service.search_local("fight clb")
+    assert [r.external_id for r in results] == ["550"]
+    assert 0.3 <= best < 1.0
+
+    results, _ = await service.search_local("елки")
+    assert [r.external_id for r in results] == ["552"]
+
+    results, best = await service.search_local("Матрица")
+    assert results == []
+    assert best == 0.0
+    mock_provider.search.assert_not_called()
+
+
+def test_trigram_similarity_matches_pg_trgm():
+    """Same numbers as pg_trgm similarity()."""
+    assert similarity(trigrams("word"), trigrams("words")) == pytest.approx(4 / 7)
+    assert similarity(trigrams("Word"), trigrams("word")) == 1.0
+    assert similarity(trigrams(""), trigrams("word")) == 0.0
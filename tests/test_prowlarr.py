@@ -0,0 +1,178 @@
+"""Tests for ProwlarrService parallel search."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.prowlarr import ProwlarrService
+
+
+def _release(guid: str, seeders: int, indexer_id: int) -> dict:
+    return {
+        "guid": guid,
+        "indexerId": indexer_id,
+        "indexer": f"idx{indexer_id}",
+        "title": f"Film 2020 1080p {guid}",
+        "size": 1024**3,
+        "seeders": seeders,
+        "downloadUrl": f"http://p/dl/{guid}",
+    }
+
+
+@pytest.mark.asyncio
+async def test_progressive_search_streams_per_indexer():
+    """Results arrive per indexer; slow and failing indexers are skipped."""
+    searched: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/v1/indexer":
+            return httpx.Response(
+                200,
+                json=[
+                    {"id": 1, "name": "fast", "enable": True},
+                    {"id": 2, "name": "slower", "enable": True},
+                    {"id": 3, "name": "hung", "enable": True},
+                    {"id": 4, "name": "broken", "enable": True},
+                    {"id": 5, "name": "disabled", "enable": False},
+                ],
+                request=request,
+            )
+        indexer_id = request.url.params["indexerIds"]
+        searched.append(indexer_id)
+        if indexer_id == "1":
+            return httpx.Response(200, json=[_release("a", 5, 1)], request=request)
+        if indexer_id == "2":
+            await asyncio.sleep(0.05)
+            return httpx.Response(
+                200, json=[_release("b", 50, 2), _release("c", 1, 2)], request=request
+            )
+        if indexer_id == "3":
+            await asyncio.sleep(5)
+        return httpx.Response(500, request=request)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        prowlarr = ProwlarrService("http://p", "key", client=client, indexer_timeout_sec=0.3)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        snapshots = [
+            [t.guid for t in snapshot]
+            async for snapshot in prowlarr.search_torrents_progressive("Film", 2020, limit=2)
+        ]
+
+    assert loop.time() - started < 1.0
+    assert sorted(searched) == ["1", "2", "3", "4"]
+    assert snapshots == [["a"], ["b", "a"]]
+
+
+@pytest.mark.asyncio
+async def test_progressive_search_falls_back_to_aggregate():
+    """Without an indexer list one aggregate search is made."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/v1/indexer":
+            return httpx.Response(503, request=request)
+        assert "indexerIds" not in request.url.params
+        # Кандидатов запрашиваем с запасом — лимит показа применяется после ранжирования
+        assert request.url.params["limit"] == "100"
+        return httpx.Response(200, json=[_release("a", 5, 1)], request=request)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        prowlarr = ProwlarrService("http://p", "key", client=client)
+        snapshots = [s async for s in prowlarr.search_torrents_progressive("Film", limit=5)]
+
+    assert [[t.guid for t in s] for s in snapshots] == [["a"]]
+
+
+@pytest.mark.asyncio
+async def test_download_torrent_file_streams_with_size_cap():
+    """Bodies over max_torrent_bytes are aborted; magnet redirects are not followed."""
+    torrent = b"d8:announce3:url4:infod4:name4:filmee"
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/dl/small":
+            return httpx.Response(
+                200,
+                headers={"content-type": "application/x-bittorrent"},
+                content=torrent,
+                request=request,
+            )
+        if request.url.path == "/dl/magnet":
+            return httpx.Response(
+                302, headers={"Location": "magnet:?xt=urn:btih:abc"}, request=request
+            )
+        # Без Content-Length: предел срабатывает по мере чтения
+        async def body():
+            for _ in range(100):
+                yield b"d" * 1024
+
+        return httpx.Response(
+            200,
+            headers={"content-type": "application/x-bittorrent"},
+            content=body(),
+            request=request,
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    service = ProwlarrService("http://p", "key", client=client, max_torrent_bytes=10 * 1024)
+
+    assert await service.download_torrent_file("http://p/dl/small") == (torrent, None)
+    assert await service.download_torrent_file("http://p/dl/magnet") == (
+        None,
+        "magnet:?xt=urn:btih:abc",
+    )
+    assert await service.download_torrent_file("http://p/dl/huge") == (None, None)
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_progressive_search_survives_indexer_with_bad_body():
+    """A non-JSON or malformed answer of one indexer only drops that indexer."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/v1/indexer":
+            return httpx.Response(
+                200,
+                json=[{"id": 1, "name": "ok"}, {"id": 2, "name": "html"}, {"id": 3, "name": "odd"}],
+                request=request,
+            )
+        indexer_id = request.url.params["indexerIds"]
+        if indexer_id == "1":
+            return httpx.Response(200, json=[_release("a", 5, 1)], request=request)
+        if indexer_id == "2":
+            return httpx.Response(200, text="<html>captcha</html>", request=request)
+        return httpx.Response(200, json=[{"downloadUrl": "x", "seeders": "many"}], request=request)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        prowlarr = ProwlarrService("http://p", "key", client=client)
+        snapshots = [s async for s in prowlarr.search_torrents_progressive("Film", limit=5)]
+
+    assert [[t.guid for t in s] for s in snapshots] == [["a"]]
+
+
+@pytest.mark.asyncio
+async def test_progressive_search_coalesces_concurrent_searches():
+    """Two users searching the same film share one request per indexer."""
+    calls: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/v1/indexer":
+            return httpx.Response(200, json=[{"id": 1}, {"id": 2}], request=request)
+        indexer_id = request.url.params["indexerIds"]
+        calls.append(indexer_id)
+        await asyncio.sleep(0.05)
+        return httpx.Response(
+            200, json=[_release(f"r{indexer_id}", 5, int(indexer_id))], request=request
+        )
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        prowlarr = ProwlarrService("http://p", "key", client=client)
+        await prowlarr._get_indexers()
+
+        async def collect():
+            return [s async for s in prowlarr.search_torrents_progressive("Film", 2020, limit=5)]
+
+        first, second = await asyncio.gather(collect(), collect())
+
+    assert sorted(calls) == ["1", "2"]
+    assert sorted(t.guid for t in first[-1]) == sorted(t.guid for t in second[-1]) == ["r1", "r2"]
@@ -0,0 +1,73 @@
+"""Тесты TokenBucketLimiter: квота, параллелизм и приоритет интерактивных запросов."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.utils.rate_limiter import (
+    Priority,
+    TokenBucketLimiter,
+    background_priority,
+    current_priority,
+)
+
+
+@pytest.mark.asyncio
+async def test_burst_then_rate():
+    limiter = TokenBucketLimiter(rate=50.0, burst=3, max_concurrency=10)
+    started = time.monotonic()
+    for _ in range(6):
+        async with limiter.acquire():
+            pass
+    # 3 токена сразу, ещё 3 — по 20 мс
+    assert time.monotonic() - started >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap():
+    limiter = TokenBucketLimiter(rate=1000.0, burst=100, max_concurrency=2)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with limiter.acquire():
+            peak = max(peak, limiter.active)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(work() for _ in range(8)))
+    assert peak == 2
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_background_yields_to_interactive():
+    limiter = TokenBucketLimiter(rate=1000.0, burst=100, max_concurrency=2)
+    order: list[str] = []
+    gate = asyncio.Event()
+
+    async def hold():
+        async with limiter.acquire(Priority.INTERACTIVE):
+            await gate.wait()
+
+    async def job(name: str, priority: Priority):
+        async with limiter.acquire(priority):
+            order.append(name)
+
+    holders = [asyncio.create_task(hold()) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    bg = asyncio.create_task(job("background", Priority.BACKGROUND))
+    await asyncio.sleep(0.01)
+    fg = asyncio.create_task(job("interactive", Priority.INTERACTIVE))
+    await asyncio.sleep(0.01)
+    gate.set()
+    await asyncio.gather(bg, fg, *holders)
+
+    assert order == ["interactive", "background"]
+
+
+def test_background_priority_context():
+    assert current_priority() is Priority.INTERACTIVE
+    with background_priority():
+        assert current_priority() is Priority.BACKGROUND
+    assert current_priority() is Priority.INTERACTIVE
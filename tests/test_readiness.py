@@ -0,0 +1,76 @@
+"""Тесты фоновых проверок зависимостей."""
+
+import asyncio
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.metrics import metrics
+from app.services.readiness import Readiness, ensure_ready, run_startup_probes
+
+
+@pytest.mark.asyncio
+async def test_probes_run_concurrently_and_report_status():
+    settings = MagicMock(startup_probe_timeout_sec=0.2)
+
+    async def ok(_settings):
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    async def broken(_settings):
+        raise RuntimeError("HTTP 401")
+
+    async def hung(_settings):
+        await asyncio.sleep(10)
+
+    state = Readiness()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await run_startup_probes(
+        settings,
+        probes={"a": ok, "b": ok, "broken": broken, "hung": hung},
+        state=state,
+    )
+
+    # Параллельно и с пределом на каждую проверку
+    assert loop.time() - started < 0.5
+    assert state.is_ready("a") and state.is_ready("b")
+    assert not state.is_ready("broken")
+    assert "HTTP 401" in state.get("broken").detail
+    assert not state.is_ready("hung")
+    assert not state.is_ready("never-checked")
+    assert metrics.get("readiness.a") == 1
+    assert metrics.get("readiness.hung") == 0
+
+
+@pytest.mark.asyncio
+async def test_ensure_ready_gates_and_rechecks_after_interval():
+    settings = MagicMock(startup_probe_timeout_sec=0.2, readiness_recheck_sec=60)
+    calls = 0
+    healthy = False
+
+    async def flaky(_settings):
+        nonlocal calls
+        calls += 1
+        if not healthy:
+            raise RuntimeError("down")
+        return "ok"
+
+    state = Readiness()
+    probes = {"tmdb": flaky}
+    # Ещё не проверяли — не блокируем
+    assert await ensure_ready("tmdb", settings, probes=probes, state=state) is True
+
+    await run_startup_probes(settings, probes=probes, state=state)
+    checked_at = state.get("tmdb").checked_at
+    assert await ensure_ready(
+        "tmdb", settings, probes=probes, state=state, clock=lambda: checked_at + timedelta(seconds=10)
+    ) is False
+    assert calls == 1  # до интервала — без повторной проверки
+
+    healthy = True
+    later = checked_at + timedelta(seconds=61)
+    assert await ensure_ready("tmdb", settings, probes=probes, state=state, clock=lambda: later)
+    assert calls == 2
+    assert state.is_ready("tmdb")
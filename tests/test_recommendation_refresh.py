@@ -0,0 +1,230 @@
+"""Тесты фонового обновления кэша рекомендаций."""
+
+import asyncio
+import contextlib
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import Film, Group, GroupFilm, User
+from app.db.repositories import FilmRecommendationCacheRepository
+from app.db.repositories.recommendation_cache import (
+    decode_media_types,
+    encode_media_types,
+)
+from app.services.dto import FilmSearchResult
+from app.services.recommendation_refresh import (
+    FailureBackoff,
+    prime_recommendations,
+    refresh_due_recommendation_sources,
+    refresh_recommendation_cache_for_all_sources,
+)
+
+
+def _rec(external_id: str) -> FilmSearchResult:
+    return FilmSearchResult(external_id=external_id, source="tmdb", title=external_id, media_type="movie")
+
+
+async def _group_with_films(session: AsyncSession, films: list[Film]) -> None:
+    user = User(telegram_user_id=10, username="u")
+    session.add(user)
+    await session.flush()
+    group = Group(name="G", admin_user_id=user.id)
+    session.add(group)
+    session.add_all(films)
+    await session.flush()
+    for film in films:
+        session.add(GroupFilm(group_id=group.id, film_id=film.id, added_by_user_id=user.id))
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_refresh_parallel_batches_and_report(db_session: AsyncSession):
+    films = [
+        Film(external_id=str(100 + i), source="tmdb", title=f"F{i}", media_type="movie")
+        for i in range(6)
+    ]
+    films.append(Film(external_id="x", source="kinopoisk", title="Other", media_type="movie"))
+    await _group_with_films(db_session, films)
+
+    in_flight = 0
+    peak = 0
+
+    async def fake_recs(external_id: str, media_type: str, pages: int):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if external_id == "105":
+            return None
+        return [_rec(f"{external_id}{i}") for i in range(3)]
+
+    search = AsyncMock()
+    search.fetch_recommendations = AsyncMock(side_effect=fake_recs)
+
+    report = await refresh_recommendation_cache_for_all_sources(
+        db_session, search, concurrency=3, batch_size=2
+    )
+
+    assert report.total == 7
+    assert report.updated == 5
+    assert report.failed == 1
+    assert report.skipped_non_tmdb == 1
+    assert report.sources_per_sec > 0
+    assert peak == 3
+
+    lists = await FilmRecommendationCacheRepository(db_session).lists_for_source_film_ids(
+        [f.id for f in films]
+    )
+    assert len(lists) == 5
+    assert all(len(recs) == 3 for recs in lists.values())
+
+
+@pytest.mark.asyncio
+async def test_due_sources_order_and_incremental_tick(db_session: AsyncSession):
+    fresh = Film(external_id="1", source="tmdb", title="Fresh", media_type="movie")
+    stale = Film(external_id="2", source="tmdb", title="Stale", media_type="movie")
+    never = Film(external_id="3", source="tmdb", title="Never", media_type="movie")
+    requested = Film(external_id="4", source="tmdb", title="Requested", media_type="movie")
+    await _group_with_films(db_session, [fresh, stale, never, requested])
+
+    repo = FilmRecommendationCacheRepository(db_session)
+    now = datetime.utcnow()
+    await repo.replace_for_source(fresh.id, [_rec("10")], fetched_at=now)
+    await repo.replace_for_source(stale.id, [_rec("20")], fetched_at=now - timedelta(days=3))
+    await repo.replace_for_source(requested.id, [_rec("40")], fetched_at=now)
+    await repo.request_refresh(requested.id)
+    await db_session.commit()
+
+    due = await repo.due_source_films(stale_before=now - timedelta(days=1), limit=10)
+    assert [f.title for f in due] == ["Requested", "Never", "Stale"]
+
+    search = AsyncMock()
+    search.fetch_recommendations = AsyncMock(return_value=[])
+    report = await refresh_due_recommendation_sources(
+        db_session, search, ttl=timedelta(days=1), limit=2
+    )
+    assert report.updated == 2
+    called = {c.args[0] for c in search.fetch_recommendations.await_args_list}
+    assert called == {"4", "3"}
+
+    # Пустой ответ TMDB тоже фиксирует время — источник не крутится в очереди
+    due = await repo.due_source_films(stale_before=now - timedelta(days=1), limit=10)
+    assert [f.title for f in due] == ["Stale"]
+
+
+@pytest.mark.asyncio
+async def test_failing_sources_back_off_and_do_not_block_the_tick(db_session: AsyncSession):
+    broken = Film(external_id="404", source="tmdb", title="Broken", media_type="movie")
+    stale = Film(external_id="2", source="tmdb", title="Stale", media_type="movie")
+    await _group_with_films(db_session, [broken, stale])
+
+    repo = FilmRecommendationCacheRepository(db_session)
+    now = datetime.utcnow()
+    await repo.replace_for_source(stale.id, [_rec("20")], fetched_at=now - timedelta(days=3))
+    await repo.request_refresh(broken.id)
+    await db_session.commit()
+
+    async def fake_recs(external_id: str, media_type: str, pages: int):
+        return None if external_id == "404" else []
+
+    search = AsyncMock()
+    search.fetch_recommendations = AsyncMock(side_effect=fake_recs)
+    policy = FailureBackoff(
+        backoff=timedelta(hours=1), max_backoff=timedelta(hours=3), max_failures=2
+    )
+    report = await refresh_due_recommendation_sources(
+        db_session, search, ttl=timedelta(days=1), limit=1, failure_policy=policy
+    )
+    assert report.failed == 1
+
+    # На паузе источник не выбирается, и лимит тика достаётся остальным
+    due = await repo.due_source_films(stale_before=now - timedelta(days=1), limit=10)
+    assert [f.title for f in due] == ["Stale"]
+
+    # После паузы — снова в очереди, но после тех, что не падали
+    await repo.replace_for_source(stale.id, [_rec("20")], fetched_at=now - timedelta(days=3))
+    later = now + timedelta(hours=2)
+    due = await repo.due_source_films(stale_before=now - timedelta(days=1), limit=10, now=later)
+    assert [f.title for f in due] == ["Stale", "Broken"]
+
+    # Пауза удваивается (с потолком), после max_failures приоритет снимается
+    state = await repo.record_failure(
+        broken.id, backoff=policy.backoff, max_backoff=policy.max_backoff,
+        max_failures=policy.max_failures, failed_at=later,
+    )
+    assert state.failure_count == 2
+    assert state.retry_at == later + timedelta(hours=2)
+    assert state.requested_at is None
+    state = await repo.record_failure(
+        broken.id, backoff=policy.backoff, max_backoff=policy.max_backoff,
+        max_failures=policy.max_failures, failed_at=later,
+    )
+    assert state.retry_at == later + timedelta(hours=3)
+
+    # Удачная загрузка сбрасывает счётчик
+    await repo.replace_for_source(broken.id, [], fetched_at=later)
+    await db_session.commit()
+    await db_session.refresh(state)
+    assert state.failure_count == 0 and state.retry_at is None
+
+
+@pytest.mark.asyncio
+async def test_prime_fetches_once_for_uncached_film(db_engine, db_session: AsyncSession):
+    film = Film(external_id="77", source="tmdb", title="New", media_type="tv")
+    other = Film(external_id="x", source="kinopoisk", title="Other", media_type="movie")
+    await _group_with_films(db_session, [film, other])
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+    search = AsyncMock()
+    search.fetch_recommendations = AsyncMock(return_value=[_rec("770"), _rec("771")])
+
+    assert await prime_recommendations(factory, search, film.id) is True
+    search.fetch_recommendations.assert_awaited_once_with("77", "tv", 1)
+    lists = await FilmRecommendationCacheRepository(db_session).lists_for_source_film_ids([film.id])
+    assert lists == {film.id: [("770", "movie"), ("771", "movie")]}
+
+    # Уже в кэше и не-TMDB — без запросов
+    assert await prime_recommendations(factory, search, film.id) is False
+    assert await prime_recommendations(factory, search, other.id) is False
+    assert search.fetch_recommendations.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_prime_does_not_hold_session_during_tmdb_call(db_engine, db_session: AsyncSession):
+    film = Film(external_id="78", source="tmdb", title="New", media_type="movie")
+    await _group_with_films(db_session, [film])
+    maker = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    open_sessions = 0
+
+    @contextlib.asynccontextmanager
+    async def factory():
+        nonlocal open_sessions
+        open_sessions += 1
+        try:
+            async with maker() as session:
+                yield session
+        finally:
+            open_sessions -= 1
+
+    async def fake_recs(external_id: str, media_type: str, pages: int):
+        assert open_sessions == 0
+        return [_rec("780")]
+
+    search = AsyncMock()
+    search.fetch_recommendations = AsyncMock(side_effect=fake_recs)
+    assert await prime_recommendations(
+        factory, search, film.id, semaphore=asyncio.Semaphore(1)
+    ) is True
+    search.fetch_recommendations.assert_awaited_once()
+
+
+def test_media_type_bitmap_roundtrip():
+    types = ["movie", "tv"] * 10 + ["tv"]
+    mask = encode_media_types(types)
+    assert len(mask) == 3
+    assert decode_media_types(mask, len(types)) == types
+    assert decode_media_types(None, 2) == ["movie", "movie"]
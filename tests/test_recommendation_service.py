@@ -1,5 +1,6 @@
 """Тесты RecommendationService (/relative)."""
 
+import asyncio
 from unittest.mock import AsyncMock
 
 import pytest
@@ -7,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import (
     Film,
-    FilmRecommendationCache,
+    FilmRecommendationSource,
     Group,
     GroupFilm,
     GroupMember,
@@ -15,6 +16,7 @@ from app.db.models import (
     User,
     Watched,
 )
+from app.db.repositories import FilmRecommendationCacheRepository
 from app.services.dto import FilmSearchResult
 from app.services.recommendation_service import (
     RecommendationService,
@@ -22,6 +24,17 @@ from app.services.recommendation_service import (
 )
 
 
+def _cache_list(session: AsyncSession, film_id: int, external_ids: list[str]) -> None:
+    """Список рекомендаций источника без карточек кандидатов (только фильмы)."""
+    session.add(
+        FilmRecommendationSource(
+            film_id=film_id,
+            recommended_ids=[int(ext_id) for ext_id in external_ids],
+            recommended_tv_mask=bytes((len(external_ids) + 7) // 8),
+        )
+    )
+
+
 @pytest.mark.asyncio
 async def test_relative_no_watched(db_session: AsyncSession):
     user = User(telegram_user_id=1, username="u")
@@ -100,27 +113,8 @@ async def test_relative_ok_ranking(db_session: AsyncSession):
     db_session.add(Watched(group_film_id=gf2.id, marked_by_user_id=user.id))
 
     # 999 встречается дважды — должен быть первым
-    db_session.add(
-        FilmRecommendationCache(
-            source_film_id=f1.id,
-            recommended_external_id="999",
-            recommended_media_type="movie",
-        )
-    )
-    db_session.add(
-        FilmRecommendationCache(
-            source_film_id=f2.id,
-            recommended_external_id="999",
-            recommended_media_type="movie",
-        )
-    )
-    db_session.add(
-        FilmRecommendationCache(
-            source_film_id=f1.id,
-            recommended_external_id="888",
-            recommended_media_type="movie",
-        )
-    )
+    _cache_list(db_session, f1.id, ["999", "888"])
+    _cache_list(db_session, f2.id, ["999"])
     await db_session.commit()
 
     async def fake_details(ext_id: str, media_type: str):
@@ -165,16 +159,145 @@ async def test_relative_excludes_already_in_group(db_session: AsyncSession):
     await db_session.flush()
     db_session.add(Watched(group_film_id=gf_w.id, marked_by_user_id=user.id))
 
-    db_session.add(
-        FilmRecommendationCache(
-            source_film_id=watched.id,
-            recommended_external_id="300",
-            recommended_media_type="movie",
-        )
-    )
+    _cache_list(db_session, watched.id, ["300"])
     await db_session.commit()
 
     mock = AsyncMock()
     out = await RecommendationService(db_session, mock).build_relative_suggestions(group.id)
     assert out.kind == RelativeOutcomeKind.NO_CANDIDATES
     mock.get_details.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_relative_uses_stored_cards_without_network(db_session: AsyncSession):
+    user = User(telegram_user_id=5, username="u")
+    db_session.add(user)
+    await db_session.flush()
+    group = Group(name="G", admin_user_id=user.id)
+    db_session.add(group)
+    await db_session.flush()
+    db_session.add(GroupMember(group_id=group.id, user_id=user.id, role=RoleEnum.ADMIN))
+
+    src = Film(external_id="400", source="tmdb", title="Src", media_type="movie")
+    db_session.add(src)
+    await db_session.flush()
+    gf = GroupFilm(group_id=group.id, film_id=src.id, added_by_user_id=user.id)
+    db_session.add(gf)
+    await db_session.flush()
+    db_session.add(Watched(group_film_id=gf.id, marked_by_user_id=user.id))
+    await db_session.flush()
+
+    await FilmRecommendationCacheRepository(db_session).replace_for_source(
+        src.id,
+        [
+            FilmSearchResult(
+                external_id="501",
+                source="tmdb",
+                title="Card",
+                year=2021,
+                description="x" * 1000,
+                poster_url="https://image.tmdb.org/t/p/w500/p.jpg",
+                media_type="movie",
+            )
+        ],
+    )
+    # Кандидат без карточки — добираем через get_details
+    state = await db_session.get(FilmRecommendationSource, src.id)
+    state.recommended_ids = [501, 502]
+    state.recommended_tv_mask = b"\x00"
+    await db_session.commit()
+
+    mock = AsyncMock()
+    mock.get_details = AsyncMock(
+        return_value=FilmSearchResult(
+            external_id="502", source="tmdb", title="Fetched", media_type="movie"
+        )
+    )
+    out = await RecommendationService(db_session, mock).build_relative_suggestions(group.id)
+
+    assert out.kind == RelativeOutcomeKind.OK
+    assert [r.external_id for r in out.results] == ["501", "502"]
+    card = out.results[0]
+    assert card.title == "Card"
+    assert card.poster_url == "https://image.tmdb.org/t/p/w500/p.jpg"
+    assert len(card.description) == 400
+    mock.get_details.assert_awaited_once_with("502", "movie")
+
+
+@pytest.mark.asyncio
+async def test_relative_parallel_hydration_with_deadline(db_session: AsyncSession):
+    user = User(telegram_user_id=6, username="u")
+    db_session.add(user)
+    await db_session.flush()
+    group = Group(name="G", admin_user_id=user.id)
+    db_session.add(group)
+    await db_session.flush()
+    db_session.add(GroupMember(group_id=group.id, user_id=user.id, role=RoleEnum.ADMIN))
+
+    src = Film(external_id="600", source="tmdb", title="Src", media_type="movie")
+    db_session.add(src)
+    await db_session.flush()
+    gf = GroupFilm(group_id=group.id, film_id=src.id, added_by_user_id=user.id)
+    db_session.add(gf)
+    await db_session.flush()
+    db_session.add(Watched(group_film_id=gf.id, marked_by_user_id=user.id))
+    # Позиции 0..5 без карточек: 701 зависает, 702 падает
+    _cache_list(db_session, src.id, [str(700 + position) for position in range(6)])
+    await db_session.commit()
+
+    in_flight = 0
+    peak = 0
+
+    async def fake_details(ext_id: str, media_type: str):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            if ext_id == "701":
+                await asyncio.sleep(10)
+            await asyncio.sleep(0.01)
+            if ext_id == "702":
+                raise RuntimeError("TMDB 500")
+            return FilmSearchResult(
+                external_id=ext_id, source="tmdb", title=f"T{ext_id}", media_type=media_type
+            )
+        finally:
+            in_flight -= 1
+
+    mock = AsyncMock()
+    mock.get_details = AsyncMock(side_effect=fake_details)
+    service = RecommendationService(
+        db_session, mock, hydration_concurrency=2, hydration_timeout_sec=0.3
+    )
+    out = await service.build_relative_suggestions(group.id, limit=3)
+
+    assert out.kind == RelativeOutcomeKind.OK
+    assert [r.external_id for r in out.results] == ["700", "703", "704"]
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_card_keeps_only_tmdb_poster_path(db_session: AsyncSession):
+    src = Film(external_id="700", source="tmdb", title="Src", media_type="movie")
+    db_session.add(src)
+    await db_session.flush()
+    foreign = "https://cdn.example.com/" + "p" * 200 + ".jpg"
+    repo = FilmRecommendationCacheRepository(db_session)
+    await repo.replace_for_source(
+        src.id,
+        [
+            FilmSearchResult(
+                external_id="701",
+                source="tmdb",
+                title="TMDB",
+                poster_url="https://image.tmdb.org/t/p/w500/p.jpg",
+                media_type="movie",
+            ),
+            FilmSearchResult(
+                external_id="702", source="tmdb", title="Foreign", poster_url=foreign, media_type="movie"
+            ),
+        ],
+    )
+    cards = await repo.cards_for([("701", "movie"), ("702", "movie")])
+    assert cards[("701", "movie")].poster_url == "https://image.tmdb.org/t/p/w500/p.jpg"
+    assert cards[("702", "movie")].poster_url is None
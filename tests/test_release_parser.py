@@ -0,0 +1,95 @@
+"""Tests for release-title parsing and scoring."""
+
+from pathlib import Path
+
+import pytest
+
+from app.utils.release import ReleaseScoring, parse_release
+
+CORPUS = Path(__file__).parent / "data" / "release_titles.txt"
+
+
+@pytest.mark.parametrize(
+    ("title", "resolution", "codec", "hdr", "source"),
+    [
+        ("Dune.Part.Two.2024.2160p.UHD.BluRay.REMUX.DV.HDR.HEVC.TrueHD.Atmos.7.1-FGT", "2160p", "hevc", "DV", "remux"),
+        ("Dune.Part.Two.2024.1080p.BluRay.x264.DTS-HD.MA.7.1-FGT", "1080p", "avc", None, "bluray"),
+        ("Oppenheimer 2023 2160p AMZN WEB-DL DDP5.1 HDR10+ HEVC-FLUX", "2160p", "hevc", "HDR10+", "web"),
+        ("Дюна 2 (2024) HDTS 1080p | Звук с TS", "1080p", None, None, "cam"),
+        ("Inception 2010 FullHD 1920x1080 RUS ENG", "1080p", None, None, None),
+        ("Ёлки (2010) DVD9 | Лицензия", "480p", None, None, None),
+        ("Бойцовский клуб / Fight Club (1999) BDRip-AVC | D, P, A", None, "avc", None, "bluray"),
+        # Голое «HD» — не разрешение; словесный тег уступает точному
+        ("Film 2020 WEB-DL HD 1080p", "1080p", None, None, "web"),
+        ("Фильм (2020) HD | 1080p | Rus", "1080p", None, None, None),
+        ("Film 2020 4K Remastered 1080p BluRay", "1080p", None, None, "bluray"),
+        ("Film 2020 HD WEBRip", None, None, None, "web"),
+    ],
+)
+def test_parse_release_tags(title, resolution, codec, hdr, source):
+    info = parse_release(title)
+    assert (info.resolution, info.codec, info.hdr, info.source) == (resolution, codec, hdr, source)
+
+
+def test_parse_release_audio_language_and_bitrate():
+    info = parse_release(
+        "Дюна (2021) BDRemux 2160p | HDR | Dolby Vision | Atmos | Rus, Eng | Дубляж",
+        size_bytes=66 * 10**9,
+        runtime_min=110,
+    )
+    assert info.audio == {"atmos"}
+    assert info.languages == {"rus", "eng"}
+    assert info.bitrate_mbps == 80.0
+    assert info.tags == ["DV", "Atmos", "Remux"]
+
+
+@pytest.mark.parametrize(
+    ("title", "languages"),
+    [
+        ("Film 2020 1080p iTunes WEB-DL", set()),
+        ("Film 2020 1080p iTunes WEB-DL | Rus, Eng", {"rus", "eng"}),
+        ("Film (2020) WEB-DL 1080p [Kinozal.RU]", set()),
+        ("Фильм (2020) WEB-DL 1080p | RU | Дубляж", {"rus"}),
+    ],
+)
+def test_parse_release_languages(title, languages):
+    assert parse_release(title).languages == languages
+
+
+def test_scoring_prefers_quality_over_raw_seeders():
+    scoring = ReleaseScoring()
+    gb = 1024**3
+    good = parse_release("Film (2020) WEB-DL 1080p HEVC | Дубляж", 8 * gb)
+    starved = parse_release("Film.2020.1080p.WEB-DL.x265", 8 * gb)
+    crushed = parse_release("Film 2020 1080p WEBRip x264", gb // 2)
+    cam = parse_release("Film 2020 CAMRip")
+    low = parse_release("Film 2020 DVDRip")
+
+    assert not scoring.accepts(cam)
+    assert not scoring.accepts(low)
+    assert scoring.score(good, 20, 8 * gb) > scoring.score(crushed, 200, gb // 2)
+    # Нет сидов — раздачу не скачать, несмотря на качество
+    assert scoring.score(starved, 0, 8 * gb) < scoring.score(crushed, 5, gb // 2)
+
+    uhd = parse_release("Film 2020 2160p WEB-DL HEVC | Дубляж", 20 * gb)
+    assert scoring.score(good, 20, 8 * gb) > scoring.score(uhd, 20, 20 * gb)
+    prefer_uhd = ReleaseScoring.model_validate({"prefer_resolution": "2160p"})
+    assert prefer_uhd.score(uhd, 20, 20 * gb) > prefer_uhd.score(good, 20, 8 * gb)
+
+
+def test_corpus_parses():
+    titles = [t for t in CORPUS.read_text(encoding="utf-8").splitlines() if t.strip()]
+    infos = [parse_release(title, 10 * 1024**3) for title in titles]
+    assert len(infos) >= 50
+    assert sum(info.resolution is not None for info in infos) / len(infos) > 0.8
+
+
+def test_scoring_ranks_remux_above_reencode_of_same_disc():
+    scoring = ReleaseScoring()
+    gb = 1024**3
+    remux = parse_release("Film.2020.1080p.BluRay.REMUX.AVC.DTS-HD.MA-FGT", 30 * gb)
+    encode = parse_release("Film.2020.1080p.BluRay.x264.DTS-FGT", 12 * gb)
+    assert scoring.score(remux, 20, 30 * gb) > scoring.score(encode, 20, 12 * gb)
+    # Сверх max_size_gb remux проигрывает штрафом за объём
+    huge = parse_release("Film.2020.1080p.BluRay.REMUX.AVC.DTS-HD.MA-FGT", 90 * gb)
+    assert scoring.score(huge, 20, 90 * gb) < scoring.score(encode, 20, 12 * gb)
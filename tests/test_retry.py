@@ -0,0 +1,95 @@
+"""Тесты RetryPolicy: jitter, Retry-After, дедлайн, метрики."""
+
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from app.services.metrics import metrics
+from app.utils.retry import RetryPolicy, parse_retry_after
+
+_REQUEST = httpx.Request("GET", "https://api.example/x")
+
+
+class FakeTime:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def clock(self) -> float:
+        return self.now
+
+    async def sleep(self, sec: float) -> None:
+        self.sleeps.append(sec)
+        self.now += sec
+
+
+def _policy(name: str, t: FakeTime, **kwargs) -> RetryPolicy:
+    return RetryPolicy(name, sleep=t.sleep, clock=t.clock, rng=random.Random(1), **kwargs)
+
+
+def _sequence(*outcomes):
+    calls = []
+
+    async def send() -> httpx.Response:
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        return httpx.Response(status, headers=headers, request=_REQUEST)
+
+    return send, calls
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_with_jitter_then_recovers():
+    t = FakeTime()
+    send, calls = _sequence(httpx.ConnectError("down", request=_REQUEST), 503, 200)
+    response = await _policy("r1", t, base_delay_sec=0.5, max_delay_sec=2.0).run(send)
+
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert len(t.sleeps) == 2
+    assert all(0.5 <= s <= 2.0 for s in t.sleeps)
+    assert metrics.get("retry.r1.retried") == 2
+    assert metrics.get("retry.r1.recovered") == 1
+
+
+@pytest.mark.asyncio
+async def test_honours_retry_after_and_returns_last_response_when_exhausted():
+    t = FakeTime()
+    send, calls = _sequence((429, {"Retry-After": "3"}), (429, {"Retry-After": "3"}))
+    response = await _policy("r2", t, max_attempts=2, deadline_sec=10).run(send)
+
+    assert response.status_code == 429
+    assert t.sleeps == [3.0]
+    assert metrics.get("retry.r2.exhausted") == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_and_non_retryable_errors_stop_immediately():
+    t = FakeTime()
+    send, calls = _sequence((503, {"Retry-After": "60"}))
+    response = await _policy("r3", t, deadline_sec=5).run(send)
+    assert response.status_code == 503
+    assert t.sleeps == []
+
+    send, calls = _sequence(404)
+    assert (await _policy("r3", t).run(send)).status_code == 404
+    assert len(calls) == 1
+
+    send, calls = _sequence(httpx.ReadTimeout("slow", request=_REQUEST))
+    with pytest.raises(httpx.ReadTimeout):
+        await _policy("r3", t, retry_on_timeout=False).run(send)
+    assert len(calls) == 1
+
+
+def test_parse_retry_after():
+    now = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(format_datetime(now + timedelta(seconds=30), usegmt=True), now) == 30.0
+    assert parse_retry_after("garbage") is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,76 @@
+"""Тесты SingleFlight: склейка одновременных одинаковых запросов."""
+
+import asyncio
+
+import pytest
+
+from app.services.metrics import metrics
+from app.utils.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    metrics.reset()
+    flight: SingleFlight[str, int] = SingleFlight("test")
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return 42
+
+    tasks = [asyncio.create_task(flight.do("k", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == [42] * 5
+    assert calls == 1
+    assert flight.inflight == 0
+    assert metrics.get("singleflight.test.executed") == 1
+    assert metrics.get("singleflight.test.coalesced") == 4
+
+
+@pytest.mark.asyncio
+async def test_error_propagates_and_is_not_remembered():
+    flight: SingleFlight[str, int] = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def boom() -> int:
+        await release.wait()
+        raise RuntimeError("upstream down")
+
+    tasks = [asyncio.create_task(flight.do("k", boom)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def ok() -> int:
+        return 1
+
+    assert await flight.do("k", ok) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_fail_followers():
+    flight: SingleFlight[str, int] = SingleFlight("test")
+    started = asyncio.Event()
+
+    async def slow() -> int:
+        started.set()
+        await asyncio.sleep(10)
+        return 0
+
+    leader = asyncio.create_task(flight.do("k", slow))
+    await started.wait()
+
+    async def fast() -> int:
+        return 7
+
+    follower = asyncio.create_task(flight.do("k", fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == 7
@@ -0,0 +1,67 @@
+"""Тесты HTTP-клиента TMDB (TMDBFilmSearch)."""
+
+import httpx
+import pytest
+
+from app.services.tmdb import TMDBFilmSearch
+
+
+@pytest.mark.asyncio
+async def test_tmdb_recommendations_fetch_pages_concurrently(required_env):
+    requested_pages: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = request.url.params["page"]
+        requested_pages.append(page)
+        if page == "3":
+            return httpx.Response(500, request=request)
+        ids = {"1": [1, 2], "2": [2, 3], "3": [4]}[page]
+        return httpx.Response(
+            200,
+            json={"total_pages": 5, "results": [{"id": i, "title": f"T{i}"} for i in ids]},
+            request=request,
+        )
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        tmdb = TMDBFilmSearch(client=client)
+        recs = await tmdb.fetch_recommendations("10", "movie", pages=3)
+
+    assert sorted(requested_pages) == ["1", "2", "3"]
+    # Дубль со второй страницы отброшен, упавшая третья не роняет результат
+    assert [(r.external_id, r.media_type) for r in recs] == [("1", "movie"), ("2", "movie"), ("3", "movie")]
+
+
+@pytest.mark.asyncio
+async def test_tmdb_bundle_single_request_and_unknown_media_type(required_env):
+    requested: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        assert request.url.params["append_to_response"] == "credits,recommendations"
+        if request.url.path.endswith("/movie/20"):
+            return httpx.Response(404, request=request)
+        return httpx.Response(
+            200,
+            json={
+                "id": 20,
+                "name": "Series",
+                "first_air_date": "2011-04-17",
+                "credits": {"crew": [{"job": "Director", "name": "D"}]},
+                "recommendations": {"total_pages": 1, "results": [{"id": 21, "name": "Other"}]},
+            },
+            request=request,
+        )
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        tmdb = TMDBFilmSearch(client=client)
+        known = await tmdb.fetch_bundle("20", "tv")
+        assert requested == ["/3/tv/20"]
+
+        requested.clear()
+        unknown = await tmdb.fetch_bundle("20", None)
+
+    assert sorted(requested) == ["/3/movie/20", "/3/tv/20"]
+    for bundle in (known, unknown):
+        assert bundle.details.media_type == "tv"
+        assert bundle.details.director == "D"
+        assert [(r.external_id, r.media_type) for r in bundle.recommendations] == [("21", "tv")]
@@ -0,0 +1,102 @@
+"""Тесты загрузки выгрузок id TMDB в tmdb_catalog."""
+
+import gzip
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.repositories import TmdbCatalogRepository
+from app.db.repositories import tmdb_catalog as tmdb_catalog_repo
+from app.services.tmdb_catalog import TMDBCatalogIngest, media_type_from_filename
+
+
+def _write_export(path: Path, items: list[dict | str]) -> Path:
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        for item in items:
+            fh.write((item if isinstance(item, str) else json.dumps(item)) + "\n")
+    return path
+
+
+@pytest.mark.asyncio
+async def test_ingest_movie_export_batches_and_upserts(db_engine, tmp_path: Path):
+    path = _write_export(
+        tmp_path / "movie_ids_05_15_2025.json.gz",
+        [
+            {"adult": False, "id": 550, "original_title": "Fight Club", "popularity": 60.1, "video": False},
+            {"adult": False, "id": 551, "original_title": "Fight Night", "popularity": 1.5, "video": False},
+            "not json",
+            {"adult": False, "id": 552, "popularity": 0.1},
+            {"adult": False, "id": 603, "original_title": "The Matrix", "popularity": 80.0, "video": False},
+        ],
+    )
+    assert media_type_from_filename(path) == "movie"
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    ingest = TMDBCatalogIngest(factory, batch_size=2)
+
+    report = await ingest.ingest_file(path, "movie")
+    assert report.rows == 3
+    assert report.skipped == 2
+    assert report.batches == 2
+    assert report.rows_per_sec > 0
+
+    # Повторная загрузка обновляет строки, а не дублирует их
+    _write_export(
+        path,
+        [{"adult": False, "id": 550, "original_title": "Fight Club", "popularity": 99.0, "video": False}],
+    )
+    await ingest.ingest_file(path, "movie")
+
+    async with factory() as session:
+        repo = TmdbCatalogRepository(session)
+        assert await repo.count() == 3
+        found = await repo.search("fight", media_type="movie")
+        assert [(e.tmdb_id, e.popularity) for e in found] == [(550, 99.0), (551, 1.5)]
+        assert await repo.search("fight", media_type="tv") == []
+
+
+@pytest.mark.asyncio
+async def test_ingest_tv_export_uses_original_name(db_engine, tmp_path: Path):
+    path = _write_export(
+        tmp_path / "tv_series_ids_05_15_2025.json.gz",
+        [{"id": 1399, "original_name": "Game of Thrones", "popularity": 300.0}],
+    )
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    report = await TMDBCatalogIngest(factory).ingest_file(path, media_type_from_filename(path))
+    assert report.rows == 1
+
+    async with factory() as session:
+        found = await TmdbCatalogRepository(session).search("game of")
+        assert [(e.tmdb_id, e.media_type) for e in found] == [(1399, "tv")]
+
+
+@pytest.mark.asyncio
+async def test_upsert_many_splits_by_bind_param_limit(db_session, monkeypatch):
+    # 6 колонок на строку: при пределе 12 параметров — по 2 строки на INSERT
+    monkeypatch.setattr(tmdb_catalog_repo, "_MAX_BIND_PARAMS", 12)
+    statements = []
+    execute = db_session.execute
+
+    async def counting_execute(stmt, *args, **kwargs):
+        statements.append(stmt)
+        return await execute(stmt, *args, **kwargs)
+
+    monkeypatch.setattr(db_session, "execute", counting_execute)
+    rows = [
+        {
+            "tmdb_id": i,
+            "media_type": "movie",
+            "original_title": f"Film {i}",
+            "popularity": float(i),
+            "adult": False,
+            "updated_at": datetime(2025, 5, 15),
+        }
+        for i in range(1, 6)
+    ]
+    repo = TmdbCatalogRepository(db_session)
+    await repo.upsert_many(rows)
+    assert len(statements) == 3
+    monkeypatch.undo()
+    assert await repo.count() == 5
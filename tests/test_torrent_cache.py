@@ -0,0 +1,98 @@
+"""Тесты кэша результатов поиска раздач."""
+
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import TorrentSearchCache as TorrentSearchCacheRow
+from app.services import providers
+from app.services.dto import TorrentResult
+from app.services.torrent_cache import (
+    TorrentSearchCache,
+    prefetch_torrent_search,
+    schedule_torrent_prefetch,
+    wait_for_torrent_prefetch,
+)
+from app.utils.background import BackgroundTasks
+
+
+def _torrent(guid: str) -> TorrentResult:
+    return TorrentResult(
+        guid=guid,
+        indexer_id=1,
+        title=f"Ёлки 2010 1080p {guid}",
+        indexer="idx",
+        size=2 * 1024**3,
+        seeders=3,
+        magnet_url=f"magnet:?xt={guid}",
+        resolution="1080p",
+    )
+
+
+@pytest.mark.asyncio
+async def test_cache_roundtrip_ttl_and_normalized_key(db_engine):
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    cache = TorrentSearchCache(factory, ttl=timedelta(hours=1))
+
+    assert await cache.get("Ёлки", 2010) is None
+    await cache.store("Ёлки", 2010, [_torrent("a"), _torrent("b")])
+    await cache.store("Пусто", None, [])
+
+    hit = await cache.get("  елки ", 2010)
+    assert hit is not None
+    torrents, age = hit
+    assert [t.guid for t in torrents] == ["a", "b"]
+    assert torrents[0].size_gb == 2.0
+    assert age < timedelta(minutes=1)
+    assert await cache.get("Пусто", None) is None
+
+    async with factory() as session:
+        row = await session.get(TorrentSearchCacheRow, "елки 2010")
+        row.fetched_at = datetime.utcnow() - timedelta(hours=2)
+        await session.commit()
+    assert await cache.get("Ёлки", 2010) is None
+
+    # Повторный поиск заменяет устаревший список
+    await cache.store("Ёлки", 2010, [_torrent("c")])
+    torrents, _ = await cache.get("Ёлки", 2010)
+    assert [t.guid for t in torrents] == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_prefetch_fills_cache_once_and_can_be_awaited(db_engine, monkeypatch, required_env):
+    monkeypatch.setenv("TORRENT_PREFETCH_ENABLED", "true")
+    monkeypatch.setenv("DOWNLOAD_GROUP_ID", "7")
+
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    cache = TorrentSearchCache(factory, ttl=timedelta(hours=1))
+    release = asyncio.Event()
+
+    async def search_torrents(title, year, limit=10):
+        await release.wait()
+        return [_torrent("a")]
+
+    prowlarr = AsyncMock()
+    prowlarr.search_torrents = AsyncMock(side_effect=search_torrents)
+    monkeypatch.setattr(providers, "get_prowlarr_service", lambda: prowlarr)
+    monkeypatch.setattr(providers, "get_torrent_search_cache", lambda: cache)
+
+    tasks = BackgroundTasks()
+    assert not schedule_torrent_prefetch(8, "Ёлки", 2010, tasks)  # не группа загрузок
+    assert schedule_torrent_prefetch(7, "Ёлки", 2010, tasks)
+    assert not schedule_torrent_prefetch(7, "ёлки ", 2010, tasks)  # тот же поиск уже идёт
+
+    waiter = asyncio.create_task(wait_for_torrent_prefetch("елки", 2010, tasks))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    release.set()
+    assert await waiter is True
+    assert await wait_for_torrent_prefetch("Ёлки", 2010, tasks) is False
+
+    torrents, _ = await cache.get("Ёлки", 2010)
+    assert [t.guid for t in torrents] == ["a"]
+    # Свежий кэш — повторный prefetch не ищет
+    assert await prefetch_torrent_search(prowlarr, cache, "Ёлки", 2010, asyncio.Semaphore(1)) == 0
+    prowlarr.search_torrents.assert_awaited_once()
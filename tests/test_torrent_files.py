@@ -0,0 +1,106 @@
+"""Тесты кэша .torrent по info-hash."""
+
+import hashlib
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.services.torrent_files import TorrentFileCache
+from app.utils.bencode import BencodeError, torrent_info_hash
+
+
+def _torrent(name: str, padding: int = 0) -> tuple[bytes, bytes]:
+    """(.torrent, байты словаря info) — ключи info не по алфавиту, как бывает в природе."""
+    name_bytes = name.encode()
+    pieces = b"x" * (20 + padding)
+    info = (
+        b"d4:name" + str(len(name_bytes)).encode() + b":" + name_bytes
+        + b"12:piece lengthi262144e"
+        + b"6:pieces" + str(len(pieces)).encode() + b":" + pieces
+        + b"6:lengthi1024ee"
+    )
+    data = b"d8:announce14:http://tracker13:creation datei1700000000e4:info" + info + b"e"
+    return data, info
+
+
+def test_info_hash_is_sha1_of_raw_info_dict():
+    data, info = _torrent("Film.2020.1080p")
+    assert torrent_info_hash(data) == hashlib.sha1(info).hexdigest()
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"<html>login</html>",
+        b"d8:announce3:urle",  # нет info
+        b"d4:infoli1eee",  # info — не словарь
+        b"d4:infod1:ai1eee" + b"junk",  # мусор после словаря
+        b"d4:infod1:ai1e",  # обрыв
+        b"d4:infod1:a99:xee",  # строка за границей
+        b"l" * 100 + b"e" * 100,  # не словарь
+        b"d4:info" + b"l" * 100 + b"e" * 101,  # слишком глубоко
+    ],
+)
+def test_info_hash_rejects_garbage(data):
+    with pytest.raises(BencodeError):
+        torrent_info_hash(data)
+
+
+@pytest.mark.asyncio
+async def test_store_lookup_and_file_id(db_engine, tmp_path):
+    session_factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    cache = TorrentFileCache(tmp_path, max_bytes=10_000, session_factory=session_factory)
+    data, info = _torrent("Film")
+    info_hash = hashlib.sha1(info).hexdigest()
+
+    assert await cache.lookup("http://p/dl/1") is None
+    stored = await cache.store("http://p/dl/1", data)
+    assert stored.info_hash == info_hash and stored.file_id is None
+    assert (tmp_path / f"{info_hash}.torrent").read_bytes() == data
+
+    # По ссылке и по info-hash из Prowlarr (в любом регистре) — одна запись
+    assert (await cache.lookup("http://p/dl/1")).info_hash == info_hash
+    assert (await cache.lookup("http://other", info_hash.upper())).info_hash == info_hash
+    assert await cache.read(info_hash) == data
+
+    await cache.set_file_id(info_hash, "BQACAgIAAx")
+    assert (await cache.lookup("http://p/dl/1")).file_id == "BQACAgIAAx"
+
+    # Тот же файл с другого индексатора: file_id сохраняется, ссылка привязывается
+    again = await cache.store("http://p/dl/2", data)
+    assert again.file_id == "BQACAgIAAx"
+    assert (await cache.lookup("http://p/dl/2")).file_id == "BQACAgIAAx"
+
+
+@pytest.mark.asyncio
+async def test_disk_size_cap_evicts_least_recently_used(db_engine, tmp_path):
+    session_factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    files = {name: _torrent(name, padding=400)[0] for name in ("a", "b", "c")}
+    size = len(files["a"])
+    cache = TorrentFileCache(tmp_path, max_bytes=size * 2, session_factory=session_factory)
+
+    hashes = {}
+    for name in ("a", "b"):
+        hashes[name] = (await cache.store(f"http://p/{name}", files[name])).info_hash
+    assert await cache.read(hashes["a"]) is not None  # a нужен недавно, b — давно
+    hashes["c"] = (await cache.store("http://p/c", files["c"])).info_hash
+
+    assert await cache.read(hashes["b"]) is None
+    assert await cache.read(hashes["a"]) == files["a"]
+    assert await cache.read(hashes["c"]) == files["c"]
+    assert cache.disk_bytes == size * 2
+    # Байты вытеснены, но запись (и file_id) в БД остаётся
+    assert (await cache.lookup("http://p/b")).info_hash == hashes["b"]
+
+    # Индекс восстанавливается с диска после перезапуска
+    restarted = TorrentFileCache(tmp_path, max_bytes=size * 2, session_factory=session_factory)
+    assert await restarted.read(hashes["c"]) == files["c"]
+    assert restarted.disk_bytes == size * 2
+
+
+@pytest.mark.asyncio
+async def test_read_rejects_non_hash_names(db_engine, tmp_path):
+    session_factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    cache = TorrentFileCache(tmp_path, max_bytes=10_000, session_factory=session_factory)
+    assert await cache.read("../../etc/passwd") is None
@@ -0,0 +1,80 @@
+"""Тесты хранилища списков раздач под сообщениями."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import TorrentListMessage
+from app.services.dto import TorrentResult
+from app.services.metrics import metrics
+from app.services.torrent_lists import TorrentListStore, estimate_torrents_bytes
+from app.utils.ttl_cache import TTLCache
+
+
+def _torrents(prefix: str, count: int = 3) -> list[TorrentResult]:
+    return [
+        TorrentResult(
+            guid=f"{prefix}-{i}",
+            indexer_id=1,
+            title=f"Film 2020 1080p {prefix}-{i}",
+            indexer="idx",
+            size=1024**3,
+            magnet_url=f"magnet:?xt=urn:btih:{prefix}{i}",
+        )
+        for i in range(count)
+    ]
+
+
+def test_ttl_cache_reports_every_eviction():
+    now = [0.0]
+    evicted: list[str] = []
+    cache: TTLCache[str, int] = TTLCache(
+        maxsize=2, ttl=10, clock=lambda: now[0], on_evict=lambda k, _v: evicted.append(k)
+    )
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 3)  # замена
+    cache.set("c", 4)  # вытесняет b
+    now[0] = 11
+    assert cache.purge_expired() == 2
+    assert evicted == ["a", "b", "a", "c"]
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_is_bounded_and_accounted():
+    store = TorrentListStore(maxsize=2, ttl=timedelta(hours=1))
+    await store.put(1, 10, _torrents("a"))
+    await store.put(1, 11, _torrents("b"))
+    await store.put(2, 10, _torrents("c"))
+
+    assert len(store) == 2
+    assert await store.get(1, 10) is None  # вытеснен
+    assert [t.guid for t in await store.get(2, 10)] == ["c-0", "c-1", "c-2"]
+    expected = estimate_torrents_bytes(_torrents("b")) + estimate_torrents_bytes(_torrents("c"))
+    assert store.memory_bytes == expected
+    assert metrics.get("torrent_lists.bytes") == expected
+
+    # Тот же message_id в другом чате — другой список
+    assert await store.get(2, 11) is None
+
+
+@pytest.mark.asyncio
+async def test_lists_survive_restart_via_db(db_engine):
+    factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    store = TorrentListStore(maxsize=10, ttl=timedelta(hours=1), session_factory=factory)
+    await store.put(5, 100, _torrents("x"))
+    await store.put(5, 101, _torrents("pending"), persist=False)
+
+    restarted = TorrentListStore(maxsize=10, ttl=timedelta(hours=1), session_factory=factory)
+    assert [t.guid for t in await restarted.get(5, 100)] == ["x-0", "x-1", "x-2"]
+    assert await restarted.get(5, 101) is None
+    assert len(restarted) == 1
+
+    async with factory() as session:
+        row = await session.get(TorrentListMessage, (5, 100))
+        row.created_at = datetime.utcnow() - timedelta(days=30)
+        await session.commit()
+    fresh = TorrentListStore(maxsize=10, ttl=timedelta(hours=1), session_factory=factory)
+    assert await fresh.get(5, 100) is None